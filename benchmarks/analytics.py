@@ -0,0 +1,120 @@
+"""
+Compares the vectorized corpus analytics in shell_parser.analytics with
+the same aggregates computed by walking the parsed Command objects.
+
+Requires NumPy. Run from the repository root with
+``python -m benchmarks.analytics``.
+"""
+
+import argparse
+import time
+from collections import Counter
+from typing import Callable, Dict, List
+
+from shell_parser import analytics
+from shell_parser.ast import Command, File
+from shell_parser.parser import Parser
+from shell_parser.table import CommandTable
+
+from .corpus import CorpusGenerator
+from .suite import iter_commands
+
+
+def naive_command_name_counts(statements: List[Command]) -> Dict[str, int]:
+    return dict(Counter(
+        cmd.command.word
+        for first_cmd in statements
+        for cmd in iter_commands(first_cmd)
+    ))
+
+
+def naive_pipeline_length_histogram(statements: List[Command]) -> Dict[int, int]:
+    lengths: Counter = Counter()
+    for first_cmd in statements:
+        piped_to = set()
+        cmds = list(iter_commands(first_cmd))
+        for cmd in cmds:
+            if cmd.pipe_command is not None:
+                piped_to.add(id(cmd.pipe_command))
+        for cmd in cmds:
+            if id(cmd) in piped_to:
+                continue
+            length = 1
+            while cmd.pipe_command is not None:
+                cmd = cmd.pipe_command
+                length += 1
+            lengths[length] += 1
+    return dict(lengths)
+
+
+def naive_redirect_target_counts(statements: List[Command]) -> Dict[str, int]:
+    targets: Counter = Counter()
+    for first_cmd in statements:
+        for cmd in iter_commands(first_cmd):
+            for descriptor in cmd.descriptors.descriptors.values():
+                file_descriptor = getattr(descriptor, "descriptor", None)
+                if file_descriptor is not None and isinstance(file_descriptor.target, File):
+                    targets[file_descriptor.target.name] += 1
+    return dict(targets)
+
+
+def naive_operator_counts(statements: List[Command]) -> Dict[str, int]:
+    counts = {"&&": 0, "||": 0, "&": 0}
+    for first_cmd in statements:
+        for cmd in iter_commands(first_cmd):
+            if cmd.next_command_operator is not None:
+                counts[str(cmd.next_command_operator)] += 1
+            if cmd.asynchronous:
+                counts["&"] += 1
+    return counts
+
+
+AGGREGATES = (
+    ("command names", naive_command_name_counts, analytics.command_name_counts),
+    ("pipeline lengths", naive_pipeline_length_histogram, analytics.pipeline_length_histogram),
+    ("redirect targets", naive_redirect_target_counts, analytics.redirect_target_counts),
+    ("operators", naive_operator_counts, analytics.operator_counts),
+)
+
+
+def timed(func: Callable[[], object], repeat: int):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def run(lines: int, seed: int, repeat: int):
+    parser = Parser(spans=False)
+    statements = [parser.parse(line) for line in CorpusGenerator(seed=seed).lines(lines)]
+    table = CommandTable()
+    for first_cmd in statements:
+        table.append(first_cmd)
+
+    print("{0} lines, {1} commands".format(lines, table.rows))
+    print("{0:<20}{1:>14}{2:>14}".format("aggregate", "object walk", "vectorized"))
+    for name, naive, vectorized in AGGREGATES:
+        expected, naive_time = timed(lambda: naive(statements), repeat)
+        result, vectorized_time = timed(lambda: vectorized(table), repeat)
+        if result != expected:
+            raise AssertionError("{0} differ".format(name))
+        print("{0:<20}{1:>11.2f} ms{2:>11.2f} ms  x{3:.1f}".format(
+            name, naive_time * 1e3, vectorized_time * 1e3, naive_time / vectorized_time,
+        ))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--lines", type=int, default=100000)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+    run(args.lines, args.seed, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Compares the memory kept alive per command by a list of parsed Command
+object graphs and by a CommandTable holding the same statements, and the
+time it takes to fill the table and to materialize commands from it.
+
+Run from the repository root with ``python -m benchmarks.command_table``.
+"""
+
+import argparse
+import time
+import tracemalloc
+from typing import Callable, Tuple
+
+from shell_parser.parser import Parser
+from shell_parser.table import CommandTable
+
+from .corpus import CorpusGenerator
+
+
+def retained(build: Callable[[], object]) -> Tuple[object, int]:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return result, size
+
+
+def run(lines: int, seed: int, spans: bool):
+    parser = Parser(spans=spans)
+    corpus = list(CorpusGenerator(seed=seed).lines(lines))
+
+    graphs, graph_size = retained(lambda: [parser.parse(line) for line in corpus])
+
+    def fill() -> CommandTable:
+        table = CommandTable()
+        for cmd in graphs:
+            table.append(cmd)
+        return table
+
+    table, table_size = retained(fill)
+    rows = table.rows
+    print("{0} lines, {1} commands, spans {2}".format(lines, rows, "on" if spans else "off"))
+    print("{0:<24}{1:>14}{2:>16}".format("", "total", "per command"))
+    print("{0:<24}{1:>12} B{2:>14} B".format("object graph", graph_size, graph_size // rows))
+    print("{0:<24}{1:>12} B{2:>14} B".format("command table", table_size, table_size // rows))
+    print("{0:<24}{1:>12} B{2:>14} B".format("  columns and strings", table.memory_usage(), table.memory_usage() // rows))
+    del graphs
+
+    start = time.perf_counter()
+    fill_table = CommandTable()
+    fill_table.add_statements(corpus, parser, workers=1)
+    elapsed = time.perf_counter() - start
+    print()
+    print("{0:<24}{1:>12.2f} us per statement".format("parse and fill", elapsed / lines * 1e6))
+    start = time.perf_counter()
+    for _ in table:
+        pass
+    elapsed = time.perf_counter() - start
+    print("{0:<24}{1:>12.2f} us per statement".format("materialize", elapsed / lines * 1e6))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--lines", type=int, default=20000)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--no-spans", dest="spans", action="store_false")
+    args = arg_parser.parse_args()
+    run(args.lines, args.seed, args.spans)
+
+
+if __name__ == "__main__":
+    main()
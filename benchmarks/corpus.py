@@ -0,0 +1,294 @@
+"""
+Generates a reproducible corpus of synthetic command lines for benchmarking
+and fuzzing, one statement per line, using every part of the grammar the
+parser supports: quoting styles, escapes, numbered redirects, descriptor
+duplication and closing, pipelines, and ``;``, ``&``, ``&&`` and ``||``
+chains. A chosen fraction of the lines is deliberately malformed.
+
+The same seed and settings always produce the same corpus. Output is written
+as a stream, so corpora larger than memory can be generated:
+
+    python -m benchmarks.corpus --size 2G --malformed-rate 0.05 -o corpus.txt
+
+Frequencies can be tuned with ``--weight name=value``; see ``DEFAULT_WEIGHTS``.
+"""
+
+import argparse
+import random
+import sys
+from typing import Dict, IO, Iterator, List, Optional, Set, Tuple
+
+
+# Probabilities of the optional parts of a statement. The "more_*" entries
+# are the chance of adding one more of something, so lengths are geometric.
+DEFAULT_WEIGHTS: Dict[str, float] = {
+    "more_args": 0.6,
+    "single_quoted": 0.08,
+    "double_quoted": 0.06,
+    "escaped": 0.04,
+    "more_redirects": 0.2,
+    "numbered_fd": 0.3,
+    "dup": 0.15,
+    "close": 0.05,
+    "append": 0.25,
+    "input": 0.2,
+    "no_space": 0.5,
+    "more_pipes": 0.25,
+    "more_statements": 0.2,
+    "and": 0.35,
+    "or": 0.15,
+    "background": 0.1,
+    "trailing_semicolon": 0.05,
+    "tab": 0.02,
+}
+
+COMMANDS = (
+    "ls", "cat", "grep", "awk", "sed", "sort", "uniq", "head", "tail", "wc", "find", "xargs", "cut", "tr",
+    "git", "make", "docker", "kubectl", "python3", "ssh", "scp", "rsync", "tar", "curl", "echo", "printf",
+    "cd", "cp", "mv", "rm", "mkdir", "chmod", "systemctl", "journalctl", "npm", "cargo", "go", "vim",
+)
+
+ARGUMENTS = (
+    "-l", "-la", "-rn", "-v", "-f", "-n", "20", "-j8", "--color=auto", "--verbose", "--help", "-u", "-c",
+    "status", "commit", "push", "pull", "build", "run", "test", "install", "logs", "get", "pods", "all",
+    "/var/log/syslog", "/tmp", "./src", "../build", "~/notes.txt", "*.py", "main.go", "Cargo.toml",
+    "user@host.example.com:/srv/backup", "origin", "main", "HEAD~3", "1", "42", "{print $1}", "%s\\n",
+)
+
+PHRASES = (
+    "some search pattern", "fix the flaky test", "hello world", "two  spaces", "it's done",
+    "path with spaces/file name.txt", "multi word value", "$HOME/bin", "a;b|c&d", "<not> a redirect",
+)
+
+FILES = (
+    "out.txt", "err.log", "/dev/null", "input.csv", "build.log", "/tmp/result.json", "report.html",
+    "dump.sql", "../shared/config.yaml", "output-2024.txt",
+)
+
+MALFORMATIONS = (
+    "unclosed_quote",
+    "leading_terminator",
+    "double_operator",
+    "trailing_operator",
+    "empty_redirect",
+    "append_dup",
+    "ambiguous_dup",
+    "bad_descriptor",
+    "redirect_only",
+)
+
+
+class CorpusGenerator(object):
+    """
+    Builds random command lines from the parser's grammar. Valid lines always
+    parse; malformed lines always fail to parse.
+
+    :param seed: The seed for the random number generator.
+    :param weights: Overrides for any of the :data:`DEFAULT_WEIGHTS`.
+    :param malformed_rate: The fraction of lines to make malformed.
+    """
+
+    def __init__(self, seed: int = 0, weights: Optional[Dict[str, float]] = None, malformed_rate: float = 0.0):
+        unknown = set(weights or ()) - set(DEFAULT_WEIGHTS)
+        if unknown:
+            raise ValueError("Unknown weights: {0}".format(", ".join(sorted(unknown))))
+        self.weights = dict(DEFAULT_WEIGHTS)
+        self.weights.update(weights or {})
+        self.malformed_rate = malformed_rate
+        self._rng = random.Random(seed)
+
+    def _chance(self, name: str) -> bool:
+        return self._rng.random() < self.weights[name]
+
+    def _space(self) -> str:
+        return "\t" if self._chance("tab") else " "
+
+    def _argument(self) -> str:
+        rng = self._rng
+        if self._chance("single_quoted"):
+            return "'" + rng.choice(PHRASES).replace("'", "") + "'"
+        if self._chance("double_quoted"):
+            phrase = rng.choice(PHRASES)
+            for char in ("\\", '"', "$"):
+                phrase = phrase.replace(char, "\\" + char)
+            return '"' + phrase + '"'
+        if self._chance("escaped"):
+            phrase = rng.choice(PHRASES)
+            for char in ("\\", " ", "'", '"', ";", "|", "&", "<", ">"):
+                phrase = phrase.replace(char, "\\" + char)
+            return phrase
+        argument = rng.choice(ARGUMENTS)
+        if argument[0] in "%{$":
+            return "'" + argument + "'"
+        return argument
+
+    def _redirect(self, open_fds: Set[int]) -> str:
+        rng = self._rng
+        gap = "" if self._chance("no_space") else " "
+        if self._chance("close"):
+            fd = rng.choice((1, 2, 3, 4))
+            open_fds.discard(fd)
+            return ">&-" if fd == 1 else "{0}>&-".format(fd)
+        if self._chance("dup") and open_fds:
+            src_fd = rng.choice(sorted(open_fds))
+            fd = rng.choice((0, 1, 2, 3, 4))
+            open_fds.add(fd)
+            return "{0}{1}&{2}".format(fd, "<" if rng.random() < 0.2 else ">", src_fd)
+        if self._chance("input"):
+            fd, op = 0, "<"
+        else:
+            fd, op = 1, ">>" if self._chance("append") else ">"
+        prefix = ""
+        if self._chance("numbered_fd"):
+            fd = rng.choice((0, 1, 2, 3, 4, 5)) if op == "<" else rng.choice((1, 2, 2, 2, 3, 4))
+            prefix = str(fd)
+        open_fds.add(fd)
+        return prefix + op + gap + rng.choice(FILES)
+
+    def _command(self) -> str:
+        parts = [self._rng.choice(COMMANDS)]
+        while self._chance("more_args"):
+            parts.append(self._argument())
+        open_fds = {0, 1, 2}
+        while self._chance("more_redirects"):
+            parts.append(self._redirect(open_fds))
+        return self._space().join(parts)
+
+    def _pipeline(self) -> str:
+        commands = [self._command()]
+        while self._chance("more_pipes"):
+            commands.append(self._command())
+        return " | ".join(commands)
+
+    def _operator(self) -> str:
+        rng = self._rng
+        value = rng.random()
+        if value < self.weights["and"]:
+            return " && "
+        value -= self.weights["and"]
+        if value < self.weights["or"]:
+            return " || "
+        value -= self.weights["or"]
+        if value < self.weights["background"]:
+            return " & "
+        return "; "
+
+    def statement(self) -> str:
+        """
+        :returns: A valid command line.
+        """
+        parts = [self._pipeline()]
+        while self._chance("more_statements"):
+            parts.append(self._operator())
+            parts.append(self._pipeline())
+        if self._chance("trailing_semicolon"):
+            parts.append(";")
+        return "".join(parts)
+
+    def malformed(self) -> Tuple[str, str]:
+        """
+        :returns: A command line that fails to parse, and the name of the
+                  mistake made in it, one of :data:`MALFORMATIONS`.
+        """
+        rng = self._rng
+        kind = rng.choice(MALFORMATIONS)
+        line = self.statement().rstrip(";")
+        if kind == "unclosed_quote":
+            line += " " + rng.choice(("'", '"')) + rng.choice(PHRASES).replace("'", "").replace('"', "")
+        elif kind == "leading_terminator":
+            line = rng.choice((";", "&", "|", "&&", "||")) + " " + line
+        elif kind == "double_operator":
+            line += rng.choice((" && && ", " ; ; ", " | | ", " || ; ")) + self._pipeline()
+        elif kind == "trailing_operator":
+            line += rng.choice((" &&", " ||", " |"))
+        elif kind == "empty_redirect":
+            line += " " + rng.choice((">", ">>", "<", "2>")) + rng.choice((";", " ;", " |", " && x"))
+        elif kind == "append_dup":
+            line += " >>&" + rng.choice(("1", "2", "-"))
+        elif kind == "ambiguous_dup":
+            line += " " + rng.choice((">&", "2>&", "<&")) + rng.choice(FILES)
+        elif kind == "bad_descriptor":
+            line += " 2>&" + str(rng.choice((6, 7, 8, 9)))
+        else:
+            line += "; " + self._redirect({0, 1, 2})
+        return line, kind
+
+    def lines(self, count: Optional[int] = None) -> Iterator[str]:
+        """
+        :param count: The number of lines to generate, or ``None`` for no
+                      limit.
+        :returns: An iterator of command lines, a fraction
+                  ``malformed_rate`` of which are malformed.
+        """
+        rng = self._rng
+        malformed_rate = self.malformed_rate
+        produced = 0
+        while count is None or produced < count:
+            if malformed_rate and rng.random() < malformed_rate:
+                yield self.malformed()[0]
+            else:
+                yield self.statement()
+            produced += 1
+
+    def write(self, stream: IO[str], count: Optional[int] = None, size: Optional[int] = None) -> int:
+        """
+        Writes lines to ``stream`` until ``count`` lines or at least ``size``
+        characters have been written, whichever comes first.
+
+        :returns: The number of lines written.
+        """
+        written = 0
+        lines_written = 0
+        batch: List[str] = []
+        for line in self.lines(count):
+            batch.append(line)
+            written += len(line) + 1
+            if len(batch) == 1000:
+                batch.append("")
+                stream.write("\n".join(batch))
+                lines_written += len(batch) - 1
+                batch = []
+            if size is not None and written >= size:
+                break
+        if batch:
+            batch.append("")
+            stream.write("\n".join(batch))
+            lines_written += len(batch) - 1
+        return lines_written
+
+
+def parse_size(value: str) -> int:
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    value = value.strip().upper().rstrip("B")
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
+def parse_weight(value: str) -> Tuple[str, float]:
+    name, _, weight = value.partition("=")
+    return name, float(weight)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("-o", "--output", help="The file to write to, instead of standard output.")
+    arg_parser.add_argument("--count", type=int, help="The number of lines to write.")
+    arg_parser.add_argument("--size", type=parse_size, help="The amount of text to write, such as 500M or 2G.")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--malformed-rate", type=float, default=0.0)
+    arg_parser.add_argument("--weight", type=parse_weight, action="append", default=[], metavar="NAME=VALUE")
+    args = arg_parser.parse_args()
+    if args.count is None and args.size is None:
+        arg_parser.error("one of --count or --size is required")
+
+    generator = CorpusGenerator(seed=args.seed, weights=dict(args.weight), malformed_rate=args.malformed_rate)
+    if args.output is None:
+        generator.write(sys.stdout, args.count, args.size)
+    else:
+        with open(args.output, "w", buffering=1024 * 1024) as stream:
+            generator.write(stream, args.count, args.size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Measures the allocations saved by sharing the default descriptor table
+between commands until one of them redirects, duplicates or closes a
+descriptor.
+
+The eager baseline gives every builder its own table of freshly built
+default descriptors, which is what every command used to pay for. The same
+is measured for whole statements, with and without redirections.
+
+Run from the repository root with ``python -m benchmarks.descriptor_tables``.
+"""
+
+import argparse
+import time
+import tracemalloc
+from typing import Callable, List, Tuple
+
+from shell_parser.ast import CommandDescriptor, CommandDescriptorsBuilder, CommandFileDescriptor, DefaultFile
+from shell_parser.ast import DescriptorRead, DescriptorWrite, RedirectionInput, RedirectionOutput
+from shell_parser.ast import StdinTarget, StdoutTarget, StderrTarget
+from shell_parser.parser import Parser
+
+
+STATEMENTS = {
+    "plain": "grep -v foo | sort -u | head -n 5",
+    "redirecting": "grep -v foo < in.txt 2>&1 | sort -u > out.txt",
+}
+
+
+def eager_builder() -> CommandDescriptorsBuilder:
+    return CommandDescriptorsBuilder(descriptors={
+        0: CommandDescriptor(
+            mode=DescriptorRead(),
+            descriptor=CommandFileDescriptor(target=DefaultFile(target=StdinTarget()), operator=RedirectionInput()),
+        ),
+        1: CommandDescriptor(
+            mode=DescriptorWrite(),
+            descriptor=CommandFileDescriptor(target=DefaultFile(target=StdoutTarget()), operator=RedirectionOutput()),
+        ),
+        2: CommandDescriptor(
+            mode=DescriptorWrite(),
+            descriptor=CommandFileDescriptor(target=DefaultFile(target=StderrTarget()), operator=RedirectionOutput()),
+        ),
+    })
+
+
+def measure(func: Callable[[], object], number: int) -> Tuple[int, int, float]:
+    # Returns the blocks and bytes kept alive by each result, and the time
+    # taken per call.
+    func()
+    results: List[object] = []
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for _ in range(number):
+        results.append(func())
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    differences = after.compare_to(before, "filename")
+    blocks = sum(difference.count_diff for difference in differences)
+    size = sum(difference.size_diff for difference in differences)
+    del results
+
+    start = time.perf_counter()
+    for _ in range(number):
+        func()
+    elapsed = time.perf_counter() - start
+    return blocks // number, size // number, elapsed / number
+
+
+def print_row(name: str, blocks: int, size: int, elapsed: float):
+    print("{0:<28}{1:>8}{2:>10} B{3:>11.2f} us".format(name, blocks, size, elapsed * 1e6))
+
+
+def run(number: int):
+    parser = Parser()
+    print("{0:<28}{1:>8}{2:>12}{3:>14}".format("", "blocks", "retained", "time"))
+    print_row("shared create", *measure(lambda: CommandDescriptorsBuilder().create(), number))
+    print_row("eager create", *measure(lambda: eager_builder().create(), number))
+    for name, line in STATEMENTS.items():
+        print_row("parse " + name, *measure(lambda: parser.parse(line), number))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--number", type=int, default=5000)
+    args = arg_parser.parse_args()
+    run(args.number)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Compares Parser.parse_with_diagnostics against calling Parser.parse and
+catching the exception, on a mix of valid and malformed statements.
+parse_with_diagnostics does more work on malformed statements, as it carries
+on after the first failure to report the rest, so it is expected to be the
+slower of the two.
+
+Run from the repository root with ``python -m benchmarks.diagnostics``.
+"""
+
+import argparse
+import random
+import time
+
+from shell_parser.parser import ENGINES, Parser, ParserFailure
+
+from .parser_engines import INPUTS
+
+
+MALFORMED_INPUTS = (
+    "cat access.log | grep -v healthcheck | | wc -l",
+    "make clean && && make all",
+    "echo 'unterminated quote",
+    "cmd >>& log.txt",
+    "; ls -la",
+    "tar czf backup.tgz /home > ; echo done",
+    "cd /tmp > ; rm -rf cache | ; ls >>& log",
+)
+
+
+def make_mix(size: int, malformed_ratio: float, seed: int):
+    rng = random.Random(seed)
+    valid = list(INPUTS.values())
+    return [
+        rng.choice(MALFORMED_INPUTS) if rng.random() < malformed_ratio else rng.choice(valid)
+        for _ in range(size)
+    ]
+
+
+def parse_catching(parser: Parser, lines):
+    failures = 0
+    for line in lines:
+        try:
+            parser.parse(line)
+        except ParserFailure:
+            failures += 1
+    return failures
+
+
+def parse_diagnostics(parser: Parser, lines):
+    failures = 0
+    for line in lines:
+        failures += len(parser.parse_with_diagnostics(line).diagnostics)
+    return failures
+
+
+def run(size: int, malformed_ratio: float, seed: int):
+    lines = make_mix(size, malformed_ratio, seed)
+    print("{0} statements, {1:.0f}% malformed".format(size, malformed_ratio * 100))
+    print("{0:<16}{1:>22}{2:>24}".format("engine", "parse + except", "parse_with_diagnostics"))
+    for engine in ENGINES:
+        parser = Parser(engine=engine)
+        start = time.perf_counter()
+        caught = parse_catching(parser, lines)
+        catching = time.perf_counter() - start
+        start = time.perf_counter()
+        reported = parse_diagnostics(parser, lines)
+        collecting = time.perf_counter() - start
+        print("{0:<16}{1:>14.0f} lines/s{2:>16.0f} lines/s".format(engine, size / catching, size / collecting))
+        print("{0:<16}{1:>15} errors{2:>17} errors".format("", caught, reported))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--size", type=int, default=50000)
+    arg_parser.add_argument("--malformed-ratio", type=float, default=0.3)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    args = arg_parser.parse_args()
+    run(args.size, args.malformed_ratio, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Measures filling a DiskParseCache, and the time to read statements back
+from it once reopened, compared with parsing them again. Also reports
+the size of the database.
+
+Run from the repository root with ``python -m benchmarks.disk_cache``.
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from shell_parser.disk_cache import DiskParseCache
+from shell_parser.parser import Parser
+
+from .corpus import CorpusGenerator
+
+
+def run(lines: int, seed: int, lookups: int):
+    parser = Parser()
+    corpus = list(CorpusGenerator(seed=seed).lines(lines))
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "cache.sqlite")
+        with DiskParseCache(path, max_entries=None) as cache:
+            cached_parser = Parser(cache=cache)
+            start = time.perf_counter()
+            for line in corpus:
+                cached_parser.parse(line)
+            fill_time = time.perf_counter() - start
+            stats = cache.stats()
+        db_size = sum(
+            os.path.getsize(os.path.join(directory, name))
+            for name in os.listdir(directory)
+        )
+
+        rng = random.Random(seed)
+        sample = [corpus[rng.randrange(lines)] for _ in range(lookups)]
+        with DiskParseCache(path, max_entries=None) as cache:
+            cached_parser = Parser(cache=cache)
+            start = time.perf_counter()
+            for line in sample:
+                cached_parser.parse(line)
+            hit_time = time.perf_counter() - start
+            hits = cache.hits
+
+        start = time.perf_counter()
+        for line in sample:
+            parser.parse(line)
+        parse_time = time.perf_counter() - start
+
+    print("{0} lines, {1} entries".format(lines, stats["entries"]))
+    print("{0:<24}{1:>12.2f} us per statement".format("parse and store", fill_time / lines * 1e6))
+    print("{0:<24}{1:>12} B ({2:.1f} B per entry)".format(
+        "keys and values", stats["size_bytes"], stats["size_bytes"] / stats["entries"],
+    ))
+    print("{0:<24}{1:>12} B".format("database files", db_size))
+    print("{0:<24}{1:>12.2f} us per statement ({2} hits)".format("cache hit", hit_time / lookups * 1e6, hits))
+    print("{0:<24}{1:>12.2f} us per statement".format("parse again", parse_time / lookups * 1e6))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--lines", type=int, default=20000)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--lookups", type=int, default=10000)
+    args = arg_parser.parse_args()
+    run(args.lines, args.seed, args.lookups)
+
+
+if __name__ == "__main__":
+    main()
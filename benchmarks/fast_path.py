@@ -0,0 +1,86 @@
+"""
+Measures how much time the fast path for statements without shell
+metacharacters saves, on a shell-history-like mix of plain commands and
+commands with quotes, redirects and operators.
+
+Run from the repository root with ``python -m benchmarks.fast_path``.
+"""
+
+import argparse
+import random
+import time
+
+from shell_parser.ast import Command
+from shell_parser.handler import ASTBuilder
+from shell_parser.parser import ENGINE_SCANNER, ENGINES, Parser
+
+from .parser_engines import INPUTS
+
+
+PLAIN_INPUTS = (
+    "git status",
+    "ls -la",
+    "cd /var/log",
+    "vim notes.txt",
+    "make -j8",
+    "docker ps -a",
+    "kubectl get pods -n kube-system",
+    "python3 manage.py runserver 0.0.0.0:8000",
+    "ssh -p 2222 deploy@build-01.example.com",
+    "tail -n 200 -f /var/log/syslog",
+)
+
+
+class FullParser(Parser):
+    # Sends every statement through the selected engine.
+    def _parse_plain(self, statement: str, lead: int) -> Command:
+        handler = ASTBuilder()
+        if self.engine == ENGINE_SCANNER:
+            self._parse_scanner(statement, lead, handler)
+        else:
+            self._parse_state_machine(statement, lead, handler)
+        return handler.result()
+
+
+def make_mix(size: int, plain_ratio: float, seed: int):
+    rng = random.Random(seed)
+    special = list(INPUTS.values())
+    return [
+        rng.choice(PLAIN_INPUTS) if rng.random() < plain_ratio else rng.choice(special)
+        for _ in range(size)
+    ]
+
+
+def timed(parser: Parser, lines) -> float:
+    start = time.perf_counter()
+    for line in lines:
+        parser.parse(line)
+    return time.perf_counter() - start
+
+
+def run(size: int, plain_ratio: float, seed: int):
+    lines = make_mix(size, plain_ratio, seed)
+    print("{0} statements, {1:.0f}% without metacharacters".format(size, plain_ratio * 100))
+    print("{0:<16}{1:>16}{2:>16}".format("engine", "full parse", "fast path"))
+    for engine in ENGINES:
+        full = timed(FullParser(engine=engine), lines)
+        fast = timed(Parser(engine=engine), lines)
+        print("{0:<16}{1:>10.0f} lines/s{2:>10.0f} lines/s  x{3:.2f}".format(
+            engine,
+            size / full,
+            size / fast,
+            full / fast,
+        ))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--size", type=int, default=50000)
+    arg_parser.add_argument("--plain-ratio", type=float, default=0.7)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    args = arg_parser.parse_args()
+    run(args.size, args.plain_ratio, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Compares walking statements with Parser.parse_events and a handler that only
+counts words against building the full AST with Parser.parse, in time and in
+peak memory allocated per statement.
+
+Run from the repository root with ``python -m benchmarks.handler``.
+"""
+
+import argparse
+import timeit
+import tracemalloc
+
+from shell_parser.handler import ParseHandler
+from shell_parser.parser import ENGINES, Parser
+
+from .parser_engines import INPUTS
+
+
+class WordCounter(ParseHandler):
+    def __init__(self):
+        self.words = 0
+
+    def on_word(self, word, span):
+        self.words += 1
+
+
+def peak_allocated(func, line: str) -> int:
+    func(line)
+    tracemalloc.start()
+    func(line)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def run(number: int, repeat: int):
+    for engine in ENGINES:
+        parser = Parser(engine=engine)
+        counter = WordCounter()
+
+        def count_words(line: str):
+            parser.parse_events(line, counter)
+
+        print(engine)
+        print("{0:<12}{1:>14}{2:>14}{3:>10}{4:>14}{5:>14}".format(
+            "input", "parse", "events", "", "parse peak", "events peak",
+        ))
+        for name, line in INPUTS.items():
+            parsing = min(timeit.repeat(lambda: parser.parse(line), number=number, repeat=repeat))
+            counting = min(timeit.repeat(lambda: count_words(line), number=number, repeat=repeat))
+            print("{0:<12}{1:>11.2f} us{2:>11.2f} us{3:>10}{4:>12} B{5:>12} B".format(
+                name,
+                parsing / number * 1e6,
+                counting / number * 1e6,
+                "x{0:.2f}".format(parsing / counting),
+                peak_allocated(parser.parse, line),
+                peak_allocated(count_words, line),
+            ))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--number", type=int, default=2000)
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+    run(args.number, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Times building, comparing, hashing, repr-ing and pickling very long
+statement chains and pipelines, none of which may hit the recursion limit.
+
+Run from the repository root with ``python -m benchmarks.long_chains``.
+"""
+
+import argparse
+import pickle
+import time
+
+from shell_parser.ast import CommandBuilder, OperatorAnd, Word
+from shell_parser.parser import ENGINE_SCANNER, Parser
+
+
+def make_builder(length: int, link: str) -> CommandBuilder:
+    first_builder = builder = CommandBuilder(words=[Word("cmd0"), Word("arg")])
+    for i in range(1, length):
+        next_builder = CommandBuilder(words=[Word("cmd{0}".format(i)), Word("arg")])
+        setattr(builder, link, next_builder)
+        if link == "next_command":
+            builder.next_command_operator = OperatorAnd()
+        builder = next_builder
+    return first_builder
+
+
+def timed(label: str, func):
+    start = time.perf_counter()
+    result = func()
+    print("  {0:<10}{1:>10.3f} s".format(label, time.perf_counter() - start))
+    return result
+
+
+def run(length: int, parse: bool):
+    for link, separator in (("next_command", " && "), ("pipe_command", " | ")):
+        print("{0} chain of {1} commands".format(link, length))
+        first_cmd = timed("create", make_builder(length, link).create)
+        other_cmd = make_builder(length, link).create()
+        timed("eq", lambda: first_cmd == other_cmd)
+        timed("hash", lambda: hash(first_cmd))
+        timed("repr", lambda: repr(first_cmd))
+        timed("pickle", lambda: pickle.loads(pickle.dumps(first_cmd, protocol=pickle.HIGHEST_PROTOCOL)))
+        if parse:
+            line = separator.join("cmd{0} arg".format(i) for i in range(length))
+            timed("parse", lambda: Parser(engine=ENGINE_SCANNER).parse(line))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--length", type=int, default=100000)
+    arg_parser.add_argument("--parse", action="store_true", help="Also time parsing the equivalent statement.")
+    args = arg_parser.parse_args()
+    run(args.length, args.parse)
+
+
+if __name__ == "__main__":
+    main()
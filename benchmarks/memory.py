@@ -0,0 +1,158 @@
+"""
+Measures the memory allocated by parsing and formatting each input shape
+with tracemalloc: the bytes each parsed command keeps alive, the peak
+allocated while parsing, and the source lines the retained memory was
+allocated from. The same is measured for formatting the parsed commands.
+
+With ``--budget``, the exit status is 1 if any input shape keeps more bytes
+alive per parsed command than the budget allows. Budgets can be given for
+all shapes (``--budget 4000``) or per shape (``--budget long_pipeline=3000``).
+
+Run from the repository root with ``python -m benchmarks.memory``, or with
+``make bench-memory``.
+"""
+
+import argparse
+import json
+import linecache
+import os
+import sys
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+import shell_parser
+from shell_parser.formatter import Formatter
+from shell_parser.parser import Parser
+
+from .suite import SUITE_INPUTS, iter_commands
+
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(shell_parser.__file__))
+
+
+def measure(func: Callable[[], object], number: int, top: int) -> Dict[str, object]:
+    # Reports the peak allocated during a single call, then runs func number
+    # times, keeping every result alive, and reports the memory still held
+    # per result and where it was allocated.
+    func()
+    tracemalloc.start(1)
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    results: List[object] = []
+    tracemalloc.start(1)
+    before = tracemalloc.take_snapshot()
+    for _ in range(number):
+        results.append(func())
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    package_filter = [tracemalloc.Filter(True, os.path.join(PACKAGE_DIR, "*"))]
+    differences = after.filter_traces(package_filter).compare_to(before.filter_traces(package_filter), "lineno")
+    total = sum(difference.size_diff for difference in after.compare_to(before, "filename"))
+    sources = []
+    for difference in differences[:top]:
+        if difference.size_diff <= 0:
+            continue
+        frame = difference.traceback[0]
+        sources.append({
+            "location": "{0}:{1}".format(os.path.relpath(frame.filename, PACKAGE_DIR), frame.lineno),
+            "code": linecache.getline(frame.filename, frame.lineno).strip(),
+            "bytes": difference.size_diff // number,
+            "blocks": difference.count_diff // number,
+        })
+    del results
+    return {"retained": total // number, "peak": peak, "sources": sources}
+
+
+def run(number: int, top: int) -> Dict[str, Dict[str, object]]:
+    parser = Parser()
+    formatter = Formatter()
+    report = {}
+    for name, line in SUITE_INPUTS.items():
+        first_cmd = parser.parse(line)
+        commands = sum(1 for _ in iter_commands(first_cmd))
+        parsing = measure(lambda: parser.parse(line), number, top)
+        formatting = measure(lambda: formatter.format_statements(first_cmd), number, top)
+        report[name] = {
+            "commands": commands,
+            "parse": parsing,
+            "parse_per_command": parsing["retained"] // commands,
+            "format": formatting,
+        }
+    return report
+
+
+def print_report(report: Dict[str, Dict[str, object]], show_sources: bool):
+    print("{0:<18}{1:>9}{2:>14}{3:>14}{4:>14}{5:>14}".format(
+        "input", "commands", "parse", "per command", "parse peak", "format",
+    ))
+    for name, entry in report.items():
+        print("{0:<18}{1:>9}{2:>12} B{3:>12} B{4:>12} B{5:>12} B".format(
+            name,
+            entry["commands"],
+            entry["parse"]["retained"],
+            entry["parse_per_command"],
+            entry["parse"]["peak"],
+            entry["format"]["retained"],
+        ))
+    if not show_sources:
+        return
+    for name, entry in report.items():
+        print()
+        print("{0}: retained by parse, per statement".format(name))
+        for source in entry["parse"]["sources"]:
+            print("  {0:>8} B{1:>5} blocks  {2:<16}{3}".format(
+                source["bytes"], source["blocks"], source["location"], source["code"][:60],
+            ))
+
+
+def parse_budget(value: str) -> Tuple[Optional[str], int]:
+    name, _, budget = value.rpartition("=")
+    return name or None, int(budget)
+
+
+def over_budget(report: Dict[str, Dict[str, object]], budgets: List[Tuple[Optional[str], int]]) -> List[str]:
+    default = None
+    per_shape = {}
+    for name, budget in budgets:
+        if name is None:
+            default = budget
+        else:
+            per_shape[name] = budget
+    failures = []
+    for name, entry in report.items():
+        budget = per_shape.get(name, default)
+        if budget is not None and entry["parse_per_command"] > budget:
+            failures.append("{0}: {1} B per command, budget {2} B".format(name, entry["parse_per_command"], budget))
+    return failures
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--number", type=int, default=200, help="Statements parsed per input shape.")
+    arg_parser.add_argument("--top", type=int, default=8, help="Source lines to report per input shape.")
+    arg_parser.add_argument("--sources", action="store_true", help="Print where the retained memory came from.")
+    arg_parser.add_argument("--budget", type=parse_budget, action="append", default=[], metavar="[INPUT=]BYTES",
+                            help="Maximum bytes retained per parsed command.")
+    arg_parser.add_argument("--output", help="Write the report to this JSON file.")
+    args = arg_parser.parse_args()
+
+    report = run(args.number, args.top)
+    print_report(report, args.sources)
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+    failures = over_budget(report, args.budget)
+    if failures:
+        print()
+        for failure in failures:
+            print("Over budget: " + failure)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Measures the memory taken by AST nodes: the size of a single instance of
+each node class, and the bytes per Command and per Word kept alive by a
+parsed corpus of generated command lines.
+
+Run from the repository root with ``python -m benchmarks.node_memory``.
+"""
+
+import argparse
+import sys
+import tracemalloc
+from typing import List
+
+from shell_parser.ast import Word, File, DefaultFile, CommandFileDescriptor, CommandDescriptor
+from shell_parser.ast import CommandDescriptors, Command, CommandBuilder, CommandDescriptorsBuilder
+from shell_parser.ast import RedirectionOutput, DescriptorWrite, StdoutTarget
+from shell_parser.parser import Parser
+
+from .corpus import CorpusGenerator
+from .suite import iter_commands
+
+
+def instance_size(obj: object) -> int:
+    # An instance without slots also pays for its __dict__.
+    size = sys.getsizeof(obj)
+    if hasattr(obj, "__dict__"):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+
+def sample_nodes():
+    word = Word("arg", (0, 3))
+    file_descriptor = CommandFileDescriptor(target=File("out.txt", (6, 13)), operator=RedirectionOutput())
+    descriptor = CommandDescriptor(mode=DescriptorWrite(), descriptor=file_descriptor)
+    return (
+        word,
+        file_descriptor.target,
+        DefaultFile(target=StdoutTarget()),
+        file_descriptor,
+        descriptor,
+        CommandDescriptors(descriptors={1: descriptor}),
+        Command(command=word, descriptors=CommandDescriptors(descriptors={}), span=(0, 13)),
+        CommandBuilder(),
+        CommandDescriptorsBuilder(),
+    )
+
+
+def run(lines: int, seed: int):
+    print("{0:<28}{1:>10}".format("node", "size"))
+    for node in sample_nodes():
+        print("{0:<28}{1:>8} B".format(node.__class__.__name__, instance_size(node)))
+
+    parser = Parser()
+    corpus = list(CorpusGenerator(seed=seed).lines(lines))
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    parsed: List[Command] = [parser.parse(line) for line in corpus]
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    commands = 0
+    words = 0
+    for first_cmd in parsed:
+        for cmd in iter_commands(first_cmd):
+            commands += 1
+            words += 1 + len(cmd.args)
+    print()
+    print("{0} lines, {1} commands, {2} words".format(lines, commands, words))
+    print("{0:<28}{1:>8} B".format("retained per command", retained // commands))
+    print("{0:<28}{1:>8} B".format("retained per word", retained // words))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--lines", type=int, default=20000)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    args = arg_parser.parse_args()
+    run(args.lines, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Compares parsing bytes input with Parser.parse_bytes against decoding each
+line first and parsing it with Parser.parse.
+
+Run from the repository root with ``python -m benchmarks.parse_bytes``.
+"""
+
+import argparse
+import timeit
+
+from shell_parser.parser import ENGINE_SCANNER, Parser
+
+from .parser_engines import INPUTS
+
+
+def run(number: int, repeat: int):
+    parser = Parser(engine=ENGINE_SCANNER)
+    inputs = dict(INPUTS)
+    inputs["non-ascii"] = "grep -rn 'café crème' ~/Téléchargements/notes.txt > résultats.txt"
+
+    print("{0:<12}{1:>18}{2:>18}".format("input", "decode + parse", "parse_bytes"))
+    for name, line in inputs.items():
+        data = line.encode("utf-8")
+        decoded = min(timeit.repeat(lambda: parser.parse(data.decode("utf-8")), number=number, repeat=repeat))
+        native = min(timeit.repeat(lambda: parser.parse_bytes(data), number=number, repeat=repeat))
+        print("{0:<12}{1:>15.2f} us{2:>15.2f} us  x{3:.2f}".format(
+            name,
+            decoded / number * 1e6,
+            native / number * 1e6,
+            decoded / native,
+        ))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--number", type=int, default=2000)
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+    run(args.number, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
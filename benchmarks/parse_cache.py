@@ -0,0 +1,58 @@
+"""
+Measures the effect of a ParseCache on shell-history-like traffic, where a
+small number of statements make up most of the input.
+
+Run from the repository root with ``python -m benchmarks.parse_cache``.
+"""
+
+import argparse
+import random
+import time
+
+from shell_parser.cache import ParseCache
+from shell_parser.parser import Parser
+
+from .parser_engines import INPUTS
+
+
+def make_traffic(size: int, distinct: int, seed: int):
+    rng = random.Random(seed)
+    templates = list(INPUTS.values())
+    statements = ["{0} # {1}".format(templates[i % len(templates)], i) for i in range(distinct)]
+    # Zipf-like popularity: a few statements account for most of the traffic.
+    weights = [1.0 / (rank + 1) for rank in range(distinct)]
+    return rng.choices(statements, weights=weights, k=size)
+
+
+def timed(parser: Parser, traffic) -> float:
+    start = time.perf_counter()
+    for statement in traffic:
+        parser.parse(statement)
+    return time.perf_counter() - start
+
+
+def run(size: int, distinct: int, max_entries: int, seed: int):
+    traffic = make_traffic(size, distinct, seed)
+    uncached = timed(Parser(), traffic)
+    cache = ParseCache(max_entries=max_entries)
+    cached = timed(Parser(cache=cache), traffic)
+
+    print("{0} statements, {1} distinct, max_entries={2}".format(size, distinct, max_entries))
+    print("uncached: {0:>10.0f} lines/s".format(size / uncached))
+    print("cached:   {0:>10.0f} lines/s  (x{1:.2f})".format(size / cached, uncached / cached))
+    for name, value in cache.stats().items():
+        print("  {0:<12}{1}".format(name, value))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--size", type=int, default=100000)
+    arg_parser.add_argument("--distinct", type=int, default=5000)
+    arg_parser.add_argument("--max-entries", type=int, default=1000)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    args = arg_parser.parse_args()
+    run(args.size, args.distinct, args.max_entries, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Measures Parser.parse_many throughput as the number of worker processes grows.
+
+Run from the repository root with ``python -m benchmarks.parse_many``.
+"""
+
+import argparse
+import os
+import time
+
+from shell_parser.parser import ENGINES, Parser
+
+from .parser_engines import INPUTS
+
+
+def run(size: int, engine: str, chunksize: int, max_workers: int):
+    lines = list(INPUTS.values())
+    corpus = [lines[i % len(lines)] for i in range(size)]
+    parser = Parser(engine=engine)
+
+    print("{0} statements, engine={1}, chunksize={2}".format(size, engine, chunksize))
+    print("{0:>8}{1:>16}{2:>10}".format("workers", "lines/s", "scaling"))
+    baseline = None
+    workers = 1
+    while workers <= max_workers:
+        start = time.perf_counter()
+        for _ in parser.parse_many(corpus, workers=workers, chunksize=chunksize):
+            pass
+        rate = size / (time.perf_counter() - start)
+        if baseline is None:
+            baseline = rate
+        print("{0:>8}{1:>16.0f}{2:>9.2f}x".format(workers, rate, rate / baseline))
+        workers *= 2
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--size", type=int, default=100000)
+    arg_parser.add_argument("--engine", choices=ENGINES, default=ENGINES[-1])
+    arg_parser.add_argument("--chunksize", type=int, default=512)
+    arg_parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = arg_parser.parse_args()
+    run(args.size, args.engine, args.chunksize, args.max_workers)
+
+
+if __name__ == "__main__":
+    main()
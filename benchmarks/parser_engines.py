@@ -0,0 +1,48 @@
+"""
+Compares the throughput of the available parser engines.
+
+Run from the repository root with ``python -m benchmarks.parser_engines``.
+"""
+
+import argparse
+import timeit
+
+from shell_parser.parser import ENGINES, Parser
+
+
+INPUTS = {
+    "short": "git status",
+    "arguments": "ls -la --color=auto /usr/local/share/applications /var/log/journal",
+    "quoted": "grep -rn 'some rather long search pattern with spaces' \"/path/to/a directory\" --include='*.py'",
+    "redirects": "cmd arg1 arg2 < input.txt > output.txt 2> errors.txt 3>&1 4<&0 5>&-",
+    "pipeline": "cat access.log | grep -v healthcheck | awk '{print $1}' | sort | uniq -c | sort -rn | head -n 20",
+    "chain": "make clean && make -j8 all && make test || echo 'build failed' ; make install && echo done",
+}
+
+
+def run(number: int, repeat: int):
+    print("{0:<12}{1}".format("input", "".join("{0:>18}".format(engine) for engine in ENGINES)))
+    for name, line in INPUTS.items():
+        timings = []
+        for engine in ENGINES:
+            parser = Parser(engine=engine)
+            best = min(timeit.repeat(lambda: parser.parse(line), number=number, repeat=repeat))
+            timings.append(best / number * 1e6)
+        speedup = timings[0] / timings[-1]
+        print("{0:<12}{1}  x{2:.2f}".format(
+            name,
+            "".join("{0:>15.2f} us".format(timing) for timing in timings),
+            speedup,
+        ))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--number", type=int, default=2000)
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+    run(args.number, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Reports the pickled size of parsed commands and the cost of a pickle
+round-trip, compared with parsing the statement again from scratch.
+
+Run from the repository root with ``python -m benchmarks.pickling``.
+"""
+
+import argparse
+import pickle
+import timeit
+
+from shell_parser.parser import Parser
+
+from .parser_engines import INPUTS
+
+
+def count_commands(first_cmd) -> int:
+    count = 0
+    stack = [first_cmd]
+    while stack:
+        cmd = stack.pop()
+        count += 1
+        if cmd.pipe_command is not None:
+            stack.append(cmd.pipe_command)
+        if cmd.next_command is not None:
+            stack.append(cmd.next_command)
+    return count
+
+
+def run(number: int, repeat: int):
+    parser = Parser()
+    protocol = pickle.HIGHEST_PROTOCOL
+    print("{0:<12}{1:>10}{2:>12}{3:>12}{4:>12}{5:>12}".format(
+        "input", "commands", "bytes/cmd", "dumps us", "loads us", "parse us",
+    ))
+    for name, line in INPUTS.items():
+        first_cmd = parser.parse(line)
+        data = pickle.dumps(first_cmd, protocol=protocol)
+        commands = count_commands(first_cmd)
+
+        dumps = min(timeit.repeat(lambda: pickle.dumps(first_cmd, protocol=protocol), number=number, repeat=repeat))
+        loads = min(timeit.repeat(lambda: pickle.loads(data), number=number, repeat=repeat))
+        parse = min(timeit.repeat(lambda: parser.parse(line), number=number, repeat=repeat))
+        print("{0:<12}{1:>10}{2:>12.1f}{3:>12.2f}{4:>12.2f}{5:>12.2f}".format(
+            name,
+            commands,
+            len(data) / commands,
+            dumps / number * 1e6,
+            loads / number * 1e6,
+            parse / number * 1e6,
+        ))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--number", type=int, default=2000)
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+    run(args.number, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Measures the throughput of converting parsed statements to and from JSON
+with shell_parser.serialization, one statement at a time and as an NDJSON
+stream, with pickle as a point of comparison.
+
+Run from the repository root with ``python -m benchmarks.serialization``.
+"""
+
+import argparse
+import io
+import pickle
+import time
+from typing import Callable
+
+from shell_parser.parser import Parser
+from shell_parser.serialization import NDJSONReader, NDJSONWriter, from_dict, from_json, to_dict, to_json
+
+from .corpus import CorpusGenerator
+
+
+def timed(func: Callable[[], object], repeat: int):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def run(lines: int, seed: int, spans: bool, repeat: int):
+    parser = Parser(spans=spans)
+    statements = [parser.parse(line) for line in CorpusGenerator(seed=seed).lines(lines)]
+
+    def write_ndjson() -> str:
+        stream = io.StringIO()
+        writer = NDJSONWriter(stream)
+        for first_cmd in statements:
+            writer.write(first_cmd)
+        return stream.getvalue()
+
+    dicts, to_dict_time = timed(lambda: [to_dict(first_cmd) for first_cmd in statements], repeat)
+    _, from_dict_time = timed(lambda: [from_dict(data) for data in dicts], repeat)
+    documents, to_json_time = timed(lambda: [to_json(first_cmd) for first_cmd in statements], repeat)
+    _, from_json_time = timed(lambda: [from_json(document) for document in documents], repeat)
+    text, write_time = timed(write_ndjson, repeat)
+    read, read_time = timed(lambda: list(NDJSONReader(io.StringIO(text))), repeat)
+    if read != statements:
+        raise AssertionError("NDJSON round trip differs")
+    pickles, dumps_time = timed(lambda: [pickle.dumps(first_cmd) for first_cmd in statements], repeat)
+    _, loads_time = timed(lambda: [pickle.loads(data) for data in pickles], repeat)
+
+    size = len(text)
+    print("{0} statements, spans {1}, {2:.1f} B of NDJSON per statement".format(
+        lines, "on" if spans else "off", size / lines,
+    ))
+    print("{0:<20}{1:>16}{2:>12}".format("", "statements/s", "MB/s"))
+    for name, elapsed, nbytes in (
+        ("to_dict", to_dict_time, None),
+        ("from_dict", from_dict_time, None),
+        ("to_json", to_json_time, size),
+        ("from_json", from_json_time, size),
+        ("NDJSON write", write_time, size),
+        ("NDJSON read", read_time, size),
+        ("pickle dumps", dumps_time, sum(len(data) for data in pickles)),
+        ("pickle loads", loads_time, sum(len(data) for data in pickles)),
+    ):
+        rate = "" if nbytes is None else "{0:.1f}".format(nbytes / elapsed / 1e6)
+        print("{0:<20}{1:>16.0f}{2:>12}".format(name, lines / elapsed, rate))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--lines", type=int, default=20000)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--no-spans", dest="spans", action="store_false")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+    run(args.lines, args.seed, args.spans, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
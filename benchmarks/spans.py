@@ -0,0 +1,64 @@
+"""
+Measures the memory and time cost of recording source spans, by parsing the
+same inputs with spans turned on and off.
+
+Run from the repository root with ``python -m benchmarks.spans``.
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+
+from shell_parser.parser import ENGINES, Parser
+
+from .parser_engines import INPUTS
+
+
+def measure(parser: Parser, lines):
+    # Time and memory are measured in separate passes, since tracing memory
+    # allocations slows parsing down considerably.
+    start = time.perf_counter()
+    for line in lines:
+        parser.parse(line)
+    elapsed = time.perf_counter() - start
+
+    gc.collect()
+    tracemalloc.start()
+    commands = [parser.parse(line) for line in lines]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del commands
+    return size, elapsed
+
+
+def run(copies: int):
+    lines = list(INPUTS.values()) * copies
+    print("{0} statements".format(len(lines)))
+    print("{0:<16}{1:>16}{2:>16}{3:>12}".format("engine", "spans off", "spans on", "overhead"))
+    for engine in ENGINES:
+        off_size, off_time = measure(Parser(engine=engine, spans=False), lines)
+        on_size, on_time = measure(Parser(engine=engine, spans=True), lines)
+        print("{0:<16}{1:>13.1f} MB{2:>13.1f} MB{3:>11.1f}%".format(
+            engine,
+            off_size / 1e6,
+            on_size / 1e6,
+            (on_size - off_size) / off_size * 100,
+        ))
+        print("{0:<16}{1:>13.0f} ms{2:>13.0f} ms{3:>11.1f}%".format(
+            "",
+            off_time * 1e3,
+            on_time * 1e3,
+            (on_time - off_time) / off_time * 100,
+        ))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--copies", type=int, default=500)
+    args = arg_parser.parse_args()
+    run(args.copies)
+
+
+if __name__ == "__main__":
+    main()
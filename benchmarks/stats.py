@@ -0,0 +1,49 @@
+"""
+Measures what collecting ParseStats costs, and prints the counters
+collected over the benchmark inputs.
+
+Run from the repository root with ``python -m benchmarks.stats``.
+"""
+
+import argparse
+import timeit
+
+from shell_parser.parser import ENGINES, Parser
+from shell_parser.stats import ParseStats
+
+from .parser_engines import INPUTS
+
+
+def run(number: int, repeat: int):
+    for engine in ENGINES:
+        parser = Parser(engine=engine)
+        stats = ParseStats()
+        instrumented = Parser(engine=engine, stats=stats)
+        print(engine)
+        print("{0:<12}{1:>14}{2:>14}{3:>10}".format("input", "stats off", "stats on", ""))
+        for name, line in INPUTS.items():
+            off = min(timeit.repeat(lambda: parser.parse(line), number=number, repeat=repeat))
+            on = min(timeit.repeat(lambda: instrumented.parse(line), number=number, repeat=repeat))
+            print("{0:<12}{1:>11.2f} us{2:>11.2f} us{3:>10}".format(
+                name, off / number * 1e6, on / number * 1e6, "x{0:.2f}".format(on / off),
+            ))
+
+    stats = ParseStats()
+    parser = Parser(stats=stats)
+    for line in INPUTS.values():
+        parser.parse(line)
+    print()
+    for name, value in stats.snapshot().items():
+        print("{0:<24}{1:>12}".format(name, value))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--number", type=int, default=2000)
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+    run(args.number, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
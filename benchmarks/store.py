@@ -0,0 +1,72 @@
+"""
+Measures writing parsed statements to a command store, the size of the
+store, how long it takes to open, and the time to materialize a random
+statement from it compared with parsing the statement again.
+
+Run from the repository root with ``python -m benchmarks.store``.
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from shell_parser.parser import Parser
+from shell_parser.store import CommandStore, CommandStoreWriter
+
+from .corpus import CorpusGenerator
+
+
+def run(lines: int, seed: int, lookups: int):
+    parser = Parser()
+    corpus = list(CorpusGenerator(seed=seed).lines(lines))
+    statements = [parser.parse(line) for line in corpus]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "commands.store")
+        start = time.perf_counter()
+        with CommandStoreWriter(path) as writer:
+            for first_cmd in statements:
+                writer.append(first_cmd)
+        write_time = time.perf_counter() - start
+        size = os.path.getsize(path)
+        text_size = sum(len(line.encode("utf-8")) + 1 for line in corpus)
+
+        start = time.perf_counter()
+        store = CommandStore(path)
+        open_time = time.perf_counter() - start
+
+        rng = random.Random(seed)
+        indexes = [rng.randrange(lines) for _ in range(lookups)]
+        start = time.perf_counter()
+        for index in indexes:
+            store[index]
+        lookup_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for index in indexes:
+            parser.parse(corpus[index])
+        parse_time = time.perf_counter() - start
+        store.close()
+
+    print("{0} lines".format(lines))
+    print("{0:<24}{1:>12.2f} us per statement".format("write", write_time / lines * 1e6))
+    print("{0:<24}{1:>12} B ({2:.1f} B per statement, {3:.2f}x the text)".format(
+        "store size", size, size / lines, size / text_size,
+    ))
+    print("{0:<24}{1:>12.2f} us".format("open", open_time * 1e6))
+    print("{0:<24}{1:>12.2f} us per statement".format("random access", lookup_time / lookups * 1e6))
+    print("{0:<24}{1:>12.2f} us per statement".format("parse again", parse_time / lookups * 1e6))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--lines", type=int, default=50000)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--lookups", type=int, default=10000)
+    args = arg_parser.parse_args()
+    run(args.lines, args.seed, args.lookups)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Times the main stages of turning a command line into objects and back:
+parsing with each engine, creating commands from builders, rendering
+descriptors and formatting statements. Results can be saved as JSON and
+compared against a saved baseline, in which case the exit status is 1 if
+anything got slower than the threshold allows.
+
+Run from the repository root with ``python -m benchmarks.suite``, or with
+``make bench`` and ``make bench-compare``.
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+import timeit
+from functools import partial
+from typing import Callable, Dict, Iterator, List
+
+from shell_parser.ast import Command, CommandBuilder, CommandDescriptors
+from shell_parser.formatter import Formatter
+from shell_parser.handler import ASTBuilder
+from shell_parser.parser import ENGINES, Parser
+
+from .parser_engines import INPUTS
+
+
+RESULTS_VERSION = 1
+
+SUITE_INPUTS = dict(INPUTS)
+SUITE_INPUTS.update({
+    "long_quoted": "printf '%s\\n' {0} \"{1}\" > out.txt".format(
+        " ".join("'quoted argument number {0} with spaces'".format(i) for i in range(20)),
+        "a double-quoted argument with \\\"escaped\\\" quotes and \\$dollars " * 10,
+    ),
+    "heavy_redirects": "cmd {0} < in.txt > out.txt 2>> err.txt".format(
+        " ".join("{0}> fd{0}.log {0}>&1 {0}>&-".format(fd) for fd in range(3, 40)),
+    ),
+    "long_pipeline": " | ".join("filter{0} --field {0} 'pattern {0}'".format(i) for i in range(50)),
+    "long_chain": " ; ".join(
+        "step{0} && check{0} || recover{0} 2> log{0}.txt".format(i) for i in range(30)
+    ),
+})
+
+
+def iter_commands(first_cmd: Command) -> Iterator[Command]:
+    stack = [first_cmd]
+    while stack:
+        cmd = stack.pop()
+        yield cmd
+        if cmd.next_command is not None:
+            stack.append(cmd.next_command)
+        if cmd.pipe_command is not None:
+            stack.append(cmd.pipe_command)
+
+
+def make_builder(line: str) -> CommandBuilder:
+    handler = ASTBuilder()
+    Parser().parse_events(line, handler)
+    return handler.first_command_builder
+
+
+def render_descriptors(descriptors: List[CommandDescriptors]) -> List[str]:
+    return [cmd_descriptors.command_line for cmd_descriptors in descriptors]
+
+
+def make_cases(inputs: Dict[str, str]) -> Dict[str, Callable[[], object]]:
+    cases: Dict[str, Callable[[], object]] = {}
+    formatter = Formatter()
+    for name, line in inputs.items():
+        for engine in ENGINES:
+            cases["parse.{0}/{1}".format(engine, name)] = partial(Parser(engine=engine).parse, line)
+        cases["create/{0}".format(name)] = make_builder(line).create
+        first_cmd = Parser().parse(line)
+        descriptors = [cmd.descriptors for cmd in iter_commands(first_cmd)]
+        cases["command_line/{0}".format(name)] = partial(render_descriptors, descriptors)
+        cases["format_statements/{0}".format(name)] = partial(formatter.format_statements, first_cmd)
+    return cases
+
+
+def measure(func: Callable[[], object], repeat: int, min_time: float) -> Dict[str, float]:
+    timer = timeit.Timer(func)
+    number = 1
+    while timer.timeit(number) < min_time:
+        number *= 2
+    timings = [elapsed / number for elapsed in timer.repeat(repeat=repeat, number=number)]
+    return {
+        "best": min(timings),
+        "median": statistics.median(timings),
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+def run(name_filter: str, repeat: int, min_time: float) -> dict:
+    results = {}
+    for name, func in make_cases(SUITE_INPUTS).items():
+        if name_filter not in name:
+            continue
+        results[name] = measure(func, repeat, min_time)
+        print("{0:<40}{1:>14.2f} us".format(name, results[name]["best"] * 1e6), file=sys.stderr)
+    return {
+        "version": RESULTS_VERSION,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "benchmarks": results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> List[str]:
+    # Returns the benchmarks whose best time grew by more than the threshold.
+    slower = []
+    print("{0:<40}{1:>14}{2:>14}{3:>10}".format("benchmark", "baseline", "current", "ratio"))
+    for name, result in current["benchmarks"].items():
+        base = baseline["benchmarks"].get(name)
+        if base is None:
+            print("{0:<40}{1:>14}{2:>11.2f} us{3:>10}".format(name, "-", result["best"] * 1e6, "new"))
+            continue
+        ratio = result["best"] / base["best"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  SLOWER"
+            slower.append(name)
+        elif ratio < 1 - threshold:
+            flag = "  faster"
+        print("{0:<40}{1:>11.2f} us{2:>11.2f} us{3:>9.2f}x{4}".format(
+            name, base["best"] * 1e6, result["best"] * 1e6, ratio, flag,
+        ))
+    return slower
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--output", help="Write the results to this JSON file.")
+    arg_parser.add_argument("--compare", metavar="BASELINE", help="Compare the results against this JSON file.")
+    arg_parser.add_argument("--current", help="Compare this JSON file instead of running the benchmarks.")
+    arg_parser.add_argument("--threshold", type=float, default=0.10,
+                            help="Fraction by which a benchmark may get slower before it is flagged.")
+    arg_parser.add_argument("--filter", default="", help="Only run benchmarks whose name contains this.")
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    arg_parser.add_argument("--min-time", type=float, default=0.05,
+                            help="Minimum duration in seconds of each timed repetition.")
+    args = arg_parser.parse_args()
+
+    if args.current is not None:
+        with open(args.current) as f:
+            current = json.load(f)
+    else:
+        current = run(args.filter, args.repeat, args.min_time)
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        slower = compare(baseline, current, args.threshold)
+        if slower:
+            print("{0} benchmark(s) slower than the baseline by more than {1:.0%}.".format(
+                len(slower), args.threshold,
+            ))
+            sys.exit(1)
+    elif args.output is None:
+        json.dump(current, sys.stdout, indent=2, sort_keys=True)
+        print()
+
+
+if __name__ == "__main__":
+    main()
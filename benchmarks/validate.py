@@ -0,0 +1,53 @@
+"""
+Compares checking statements with Parser.validate against parsing them with
+Parser.parse, in time and in peak memory allocated per statement.
+
+Run from the repository root with ``python -m benchmarks.validate``.
+"""
+
+import argparse
+import timeit
+import tracemalloc
+
+from shell_parser.parser import ENGINE_SCANNER, Parser
+
+from .parser_engines import INPUTS
+
+
+def peak_allocated(func, line: str) -> int:
+    func(line)
+    tracemalloc.start()
+    func(line)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def run(number: int, repeat: int):
+    parser = Parser(engine=ENGINE_SCANNER)
+    print("{0:<12}{1:>14}{2:>14}{3:>10}{4:>14}{5:>14}".format(
+        "input", "parse", "validate", "", "parse peak", "validate peak",
+    ))
+    for name, line in INPUTS.items():
+        parsing = min(timeit.repeat(lambda: parser.parse(line), number=number, repeat=repeat))
+        validating = min(timeit.repeat(lambda: parser.validate(line), number=number, repeat=repeat))
+        print("{0:<12}{1:>11.2f} us{2:>11.2f} us{3:>10}{4:>12} B{5:>12} B".format(
+            name,
+            parsing / number * 1e6,
+            validating / number * 1e6,
+            "x{0:.2f}".format(parsing / validating),
+            peak_allocated(parser.parse, line),
+            peak_allocated(parser.validate, line),
+        ))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--number", type=int, default=2000)
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+    run(args.number, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+from typing import Dict
+
+from .ast import _MARKER_DESCRIPTOR_CLOSED
+from .table import CommandTable, _FLAG_ASYNCHRONOUS, _FLAG_OPERATOR_AND, _FLAG_OPERATOR_OR
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def _require_numpy():
+    if numpy is None:
+        raise ImportError("shell_parser.analytics requires NumPy")
+
+
+def _column(column):
+    # A view onto the array, without copying it. Array typecodes are valid
+    # NumPy dtypes.
+    if len(column) == 0:
+        return numpy.zeros(0, dtype=column.typecode)
+    return numpy.frombuffer(column, dtype=column.typecode)
+
+
+def _count_strings(table: CommandTable, ids) -> Dict[str, int]:
+    # Counts string ids, most common first.
+    counts = numpy.bincount(ids)
+    found = numpy.flatnonzero(counts)
+    found = found[numpy.argsort(-counts[found], kind="stable")]
+    strings = table._strings
+    return {strings[string_id]: int(counts[string_id]) for string_id in found}
+
+
+def command_name_counts(table: CommandTable) -> Dict[str, int]:
+    """
+    Counts how often each command name occurs, across every command in the
+    table.
+
+    :param table: The parsed statements.
+    :type table: CommandTable
+    :returns: The number of commands with each name, most common first.
+    :rtype: Dict[str, int]
+    """
+
+    _require_numpy()
+    word_offsets = _column(table._word_offsets)
+    return _count_strings(table, _column(table._words)[word_offsets[:-1]])
+
+
+def pipeline_length_histogram(table: CommandTable) -> Dict[int, int]:
+    """
+    Counts the pipelines of each length. A command that doesn't pipe to
+    anything is a pipeline of length 1.
+
+    :param table: The parsed statements.
+    :type table: CommandTable
+    :returns: The number of pipelines with each number of commands, by
+              increasing length.
+    :rtype: Dict[int, int]
+    """
+
+    _require_numpy()
+    # Rows are laid out in pre-order, so the commands of a pipeline take up
+    # consecutive rows, from a row that isn't piped to up to a row that
+    # doesn't pipe to anything.
+    pipe_rows = _column(table._pipe_rows)
+    piped_to = numpy.zeros(len(pipe_rows), dtype=bool)
+    piped_to[pipe_rows[pipe_rows >= 0]] = True
+    starts = numpy.flatnonzero(~piped_to)
+    ends = numpy.flatnonzero(pipe_rows < 0)
+    lengths, counts = numpy.unique(ends - starts + 1, return_counts=True)
+    return {int(length): int(count) for length, count in zip(lengths, counts)}
+
+
+def redirect_target_counts(table: CommandTable) -> Dict[str, int]:
+    """
+    Counts the descriptors redirected to each file. A descriptor duplicated
+    from a redirected one, as in ``> out.txt 2>&1``, counts towards the same
+    file.
+
+    :param table: The parsed statements.
+    :type table: CommandTable
+    :returns: The number of descriptors pointing at each file name, most
+              common first.
+    :rtype: Dict[str, int]
+    """
+
+    _require_numpy()
+    kinds = _column(table._descriptor_kinds)
+    targets = _column(table._descriptor_targets)
+    # Default files are stored as negative targets.
+    return _count_strings(table, targets[(kinds != _MARKER_DESCRIPTOR_CLOSED) & (targets >= 0)])
+
+
+def operator_counts(table: CommandTable) -> Dict[str, int]:
+    """
+    Counts the commands followed by each statement operator.
+
+    :param table: The parsed statements.
+    :type table: CommandTable
+    :returns: The number of ``&&`` and ``||`` operators, and of commands run
+              asynchronously with ``&``.
+    :rtype: Dict[str, int]
+    """
+
+    _require_numpy()
+    flags = _column(table._flags)
+    return {
+        "&&": int(numpy.count_nonzero(flags & _FLAG_OPERATOR_AND)),
+        "||": int(numpy.count_nonzero(flags & _FLAG_OPERATOR_OR)),
+        "&": int(numpy.count_nonzero(flags & _FLAG_ASYNCHRONOUS)),
+    }
+
+
+__all__ = [
+    "command_name_counts",
+    "pipeline_length_histogram",
+    "redirect_target_counts",
+    "operator_counts",
+]
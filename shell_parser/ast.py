@@ -1,17 +1,107 @@
-from dataclasses import dataclass, field
+from dataclasses import FrozenInstanceError, dataclass, field, fields
 from shlex import quote as shlex_quote
 from types import MappingProxyType
-from typing import Collection, Dict, List, Mapping, Optional, Union
+from typing import Collection, Dict, List, Mapping, Optional, Tuple, Union
 
 
 DESCRIPTOR_DEFAULT_INDEX_STDIN = 0
 DESCRIPTOR_DEFAULT_INDEX_STDOUT = 1
 DESCRIPTOR_DEFAULT_INDEX_STDERR = 2
 
-
+# Short tags used to pickle the stateless marker classes.
+_MARKER_STDIN_TARGET = 0
+_MARKER_STDOUT_TARGET = 1
+_MARKER_STDERR_TARGET = 2
+_MARKER_REDIRECTION_INPUT = 3
+_MARKER_REDIRECTION_OUTPUT = 4
+_MARKER_REDIRECTION_APPEND = 5
+_MARKER_OPERATOR_AND = 6
+_MARKER_OPERATOR_OR = 7
+_MARKER_DESCRIPTOR_READ = 8
+_MARKER_DESCRIPTOR_WRITE = 9
+_MARKER_DESCRIPTOR_CLOSED = 10
+
+
+def _get_span(self) -> Optional[Tuple[int, int]]:
+    start = self._span_start
+    if start is None:
+        return None
+    return (start, self._span_end)
+
+
+def _set_span(self, span: Optional[Tuple[int, int]]):
+    if span is None:
+        object.__setattr__(self, "_span_start", None)
+        object.__setattr__(self, "_span_end", None)
+    else:
+        object.__setattr__(self, "_span_start", span[0])
+        object.__setattr__(self, "_span_end", span[1])
+
+
+def _slotted(cls):
+    # Recreates a dataclass with a slot for each of its fields instead of a
+    # per-instance __dict__, as dataclass(slots=True) does on Python 3.10+.
+    field_names = tuple(f.name for f in fields(cls))
+    cls_dict = dict(cls.__dict__)
+    slots = field_names
+    frozen = cls.__dataclass_params__.frozen
+    if frozen and "span" in field_names:
+        # Nodes keep the start and end offsets of their span in two slots
+        # rather than holding a (start, end) tuple each, and the span property
+        # puts the tuple back together when asked for it.
+        slots = tuple(name for name in field_names if name != "span") + ("_span_start", "_span_end")
+    if not any("__weakref__" in base.__dict__ for base in cls.__mro__[1:]):
+        # Keep instances weakly referenceable, as they were with a __dict__.
+        slots += ("__weakref__",)
+    cls_dict["__slots__"] = slots
+    for name in field_names:
+        # The generated __init__ keeps its own copy of the defaults.
+        cls_dict.pop(name, None)
+    cls_dict.pop("__dict__", None)
+    cls_dict.pop("__weakref__", None)
+    if "_span_start" in slots:
+        cls_dict["span"] = property(_get_span, _set_span)
+    slotted_cls = type(cls)(cls.__name__, cls.__bases__, cls_dict)
+    slotted_cls.__qualname__ = cls.__qualname__
+
+    if frozen:
+        # The generated __setattr__ and __delattr__ only refuse changes to
+        # instances of the class they were generated for.
+        def __setattr__(self, name, value):
+            if type(self) is slotted_cls or name in field_names:
+                raise FrozenInstanceError("cannot assign to field {0!r}".format(name))
+            super(slotted_cls, self).__setattr__(name, value)
+
+        def __delattr__(self, name):
+            if type(self) is slotted_cls or name in field_names:
+                raise FrozenInstanceError("cannot delete field {0!r}".format(name))
+            super(slotted_cls, self).__delattr__(name)
+
+        slotted_cls.__setattr__ = __setattr__
+        slotted_cls.__delattr__ = __delattr__
+    return slotted_cls
+
+
+class _Marker(object):
+    # The marker classes carry no state, so each of them only ever has a
+    # single instance, and markers can be compared by identity.
+    __slots__ = ()
+
+    def __new__(cls):
+        instance = cls.__dict__.get("_instance")
+        if instance is None:
+            instance = object.__new__(cls)
+            cls._instance = instance
+        return instance
+
+
+@_slotted
 @dataclass(frozen=True)
 class Word(object):
     word: str
+    # The (start, end) offsets of the word in the parsed statement, including
+    # any quotes and escapes. Not considered when comparing words.
+    span: Optional[Tuple[int, int]] = field(default=None, compare=False)
 
     def __str__(self):
         return self.word
@@ -22,10 +112,19 @@ class Word(object):
             self.word,
         )
 
+    def __reduce__(self):
+        if self.span is None:
+            return (self.__class__, (self.word,))
+        return (self.__class__, (self.word, self.span))
+
 
+@_slotted
 @dataclass(frozen=True)
 class File(object):
     name: str
+    # The (start, end) offsets of the file name in the parsed statement. Not
+    # considered when comparing files.
+    span: Optional[Tuple[int, int]] = field(default=None, compare=False)
 
     def __str__(self):
         return self.name
@@ -36,37 +135,55 @@ class File(object):
             self.name,
         )
 
+    def __reduce__(self):
+        if self.span is None:
+            return (self.__class__, (self.name,))
+        return (self.__class__, (self.name, self.span))
+
     def duplicate(self) -> 'File':
-        return File(name=self.name)
+        return _new_file(self.name, self.span)
 
 
-@dataclass(frozen=True)
-class StdinTarget(object):
+@_slotted
+@dataclass(frozen=True, eq=False)
+class StdinTarget(_Marker):
     def __str__(self):
         return "stdin"
 
     def __repr__(self):
         return "<StdinTarget>"
 
+    def __reduce__(self):
+        return (_rebuild_marker, (_MARKER_STDIN_TARGET,))
 
-@dataclass(frozen=True)
-class StdoutTarget(object):
+
+@_slotted
+@dataclass(frozen=True, eq=False)
+class StdoutTarget(_Marker):
     def __str__(self):
         return "stdout"
 
     def __repr__(self):
         return "<StdoutTarget>"
 
+    def __reduce__(self):
+        return (_rebuild_marker, (_MARKER_STDOUT_TARGET,))
 
-@dataclass(frozen=True)
-class StderrTarget(object):
+
+@_slotted
+@dataclass(frozen=True, eq=False)
+class StderrTarget(_Marker):
     def __str__(self):
         return "stderr"
 
     def __repr__(self):
         return "<StderrTarget>"
 
+    def __reduce__(self):
+        return (_rebuild_marker, (_MARKER_STDERR_TARGET,))
+
 
+@_slotted
 @dataclass(frozen=True)
 class DefaultFile(object):
     target: Union[StdinTarget, StdoutTarget, StderrTarget]
@@ -77,130 +194,188 @@ class DefaultFile(object):
     def __repr__(self):
         return "<DefaultFile target={0}>".format(self.target)
 
+    def __reduce__(self):
+        return (self.__class__, (self.target,))
+
     def duplicate(self) -> 'DefaultFile':
         return DefaultFile(target=self.target)
 
     @property
     def is_stdin(self) -> bool:
-        return isinstance(self.target, StdinTarget)
+        return self.target is _STDIN_TARGET
 
     @property
     def is_stdout(self) -> bool:
-        return isinstance(self.target, StdoutTarget)
+        return self.target is _STDOUT_TARGET
 
     @property
     def is_stderr(self) -> bool:
-        return isinstance(self.target, StderrTarget)
+        return self.target is _STDERR_TARGET
 
 
-@dataclass(frozen=True)
-class RedirectionInput(object):
+@_slotted
+@dataclass(frozen=True, eq=False)
+class RedirectionInput(_Marker):
     def __str__(self):
         return "<"
 
     def __repr__(self):
         return "<RedirectionInput>"
 
+    def __reduce__(self):
+        return (_rebuild_marker, (_MARKER_REDIRECTION_INPUT,))
 
-@dataclass(frozen=True)
-class RedirectionOutput(object):
+
+@_slotted
+@dataclass(frozen=True, eq=False)
+class RedirectionOutput(_Marker):
     def __str__(self):
         return ">"
 
     def __repr__(self):
         return "<RedirectionOutput>"
 
+    def __reduce__(self):
+        return (_rebuild_marker, (_MARKER_REDIRECTION_OUTPUT,))
 
-@dataclass(frozen=True)
-class RedirectionAppend(object):
+
+@_slotted
+@dataclass(frozen=True, eq=False)
+class RedirectionAppend(_Marker):
     def __str__(self):
         return ">>"
 
     def __repr__(self):
         return "<RedirectionAppend>"
 
+    def __reduce__(self):
+        return (_rebuild_marker, (_MARKER_REDIRECTION_APPEND,))
 
-@dataclass(frozen=True)
-class OperatorAnd(object):
+
+@_slotted
+@dataclass(frozen=True, eq=False)
+class OperatorAnd(_Marker):
     def __str__(self):
         return "&&"
 
     def __repr__(self):
         return "<OperatorAnd>"
 
+    def __reduce__(self):
+        return (_rebuild_marker, (_MARKER_OPERATOR_AND,))
 
-@dataclass(frozen=True)
-class OperatorOr(object):
+
+@_slotted
+@dataclass(frozen=True, eq=False)
+class OperatorOr(_Marker):
     def __str__(self):
         return "||"
 
     def __repr__(self):
         return "<OperatorOr>"
 
+    def __reduce__(self):
+        return (_rebuild_marker, (_MARKER_OPERATOR_OR,))
 
-@dataclass(frozen=True)
-class DescriptorRead(object):
-    pass
 
+@_slotted
+@dataclass(frozen=True, eq=False)
+class DescriptorRead(_Marker):
+    def __reduce__(self):
+        return (_rebuild_marker, (_MARKER_DESCRIPTOR_READ,))
 
-@dataclass(frozen=True)
-class DescriptorWrite(object):
-    pass
 
+@_slotted
+@dataclass(frozen=True, eq=False)
+class DescriptorWrite(_Marker):
+    def __reduce__(self):
+        return (_rebuild_marker, (_MARKER_DESCRIPTOR_WRITE,))
 
-@dataclass(frozen=True)
-class CommandDescriptorClosed(object):
+
+@_slotted
+@dataclass(frozen=True, eq=False)
+class CommandDescriptorClosed(_Marker):
     def duplicate(self) -> 'CommandDescriptorClosed':
         # There is no state to duplicate.
         return self
 
+    def __reduce__(self):
+        return (_rebuild_marker, (_MARKER_DESCRIPTOR_CLOSED,))
+
 
+_STDIN_TARGET = StdinTarget()
+_STDOUT_TARGET = StdoutTarget()
+_STDERR_TARGET = StderrTarget()
+_REDIRECTION_INPUT = RedirectionInput()
+_REDIRECTION_OUTPUT = RedirectionOutput()
+_REDIRECTION_APPEND = RedirectionAppend()
+_OPERATOR_AND = OperatorAnd()
+_OPERATOR_OR = OperatorOr()
+_DESCRIPTOR_READ = DescriptorRead()
+_DESCRIPTOR_WRITE = DescriptorWrite()
+_COMMAND_DESCRIPTOR_CLOSED = CommandDescriptorClosed()
+
+_DEFAULT_TARGET_FILES = {
+    _STDIN_TARGET: "/dev/stdin",
+    _STDOUT_TARGET: "/dev/stdout",
+    _STDERR_TARGET: "/dev/stderr",
+}
+
+
+@_slotted
 @dataclass(frozen=True)
 class CommandFileDescriptor(object):
     target: Union[File, DefaultFile]
     operator: Union[RedirectionInput, RedirectionOutput, RedirectionAppend]
 
     def duplicate(self) -> 'CommandFileDescriptor':
-        return CommandFileDescriptor(
-            target=self.target.duplicate(),
-            operator=self.operator,
-        )
+        return _new_file_descriptor(self.target.duplicate(), self.operator)
+
+    def __reduce__(self):
+        return (self.__class__, (self.target, self.operator))
 
     @property
     def is_default_file(self) -> bool:
         return isinstance(self.target, DefaultFile)
 
 
+@_slotted
 @dataclass(frozen=True)
 class CommandDescriptor(object):
     mode: Union[DescriptorRead, DescriptorWrite]
     descriptor: CommandFileDescriptor
 
     def __post_init__(self):
-        if isinstance(self.mode, DescriptorRead):
-            if not isinstance(self.descriptor.operator, RedirectionInput):
+        mode = self.mode
+        operator = self.descriptor.operator
+        if mode is _DESCRIPTOR_READ:
+            if operator is not _REDIRECTION_INPUT:
                 raise InvalidDescriptorDataException()
-        elif isinstance(self.mode, DescriptorWrite):
-            if not isinstance(self.descriptor.operator, (RedirectionOutput, RedirectionAppend)):
+        elif mode is _DESCRIPTOR_WRITE:
+            if operator is not _REDIRECTION_OUTPUT and operator is not _REDIRECTION_APPEND:
                 raise InvalidDescriptorDataException()
         else:
             raise InvalidDescriptorDataException()
 
     def duplicate(self) -> 'CommandDescriptor':
-        return CommandDescriptor(
-            mode=self.mode,
-            descriptor=self.descriptor.duplicate(),
-        )
+        return _new_descriptor(self.mode, self.descriptor.duplicate())
+
+    def __reduce__(self):
+        code = _encode_descriptor(self)
+        if code is None:
+            return (self.__class__, (self.mode, self.descriptor))
+        return (_decode_descriptor, (code,))
 
     @property
     def for_reading(self) -> bool:
-        return isinstance(self.mode, DescriptorRead)
+        return self.mode is _DESCRIPTOR_READ
 
     @property
     def for_writing(self) -> bool:
-        return isinstance(self.mode, DescriptorWrite)
+        return self.mode is _DESCRIPTOR_WRITE
 
 
+@_slotted
 @dataclass(frozen=True)
 class CommandDescriptors(object):
     descriptors: Mapping[int, Union[CommandDescriptor, CommandDescriptorClosed]]
@@ -212,13 +387,22 @@ class CommandDescriptors(object):
             if fd < 0:
                 raise InvalidFileDescriptorException("File descriptors must not be negative")
 
+    def __reduce__(self):
+        # MappingProxyType cannot be pickled, so the descriptors are shipped
+        # in a compact encoded form and wrapped again on the way back in.
+        return (_decode_descriptors, (_encode_descriptors(self),))
+
+    def __hash__(self):
+        # MappingProxyType isn't hashable either, so hash the items instead.
+        return hash(frozenset(self.descriptors.items()))
+
     @property
     def command_line(self) -> str:
         descriptors = self.descriptors
         fds = sorted(descriptors)
         args = []
         for fd in fds:
-            if isinstance(descriptors[fd], CommandDescriptorClosed):
+            if descriptors[fd] is _COMMAND_DESCRIPTOR_CLOSED:
                 if fd == DESCRIPTOR_DEFAULT_INDEX_STDOUT:
                     args.append(">&-")
                 else:
@@ -229,12 +413,12 @@ class CommandDescriptors(object):
             if fd == DESCRIPTOR_DEFAULT_INDEX_STDIN:
                 if descriptors[fd].descriptor.is_default_file and descriptors[fd].descriptor.target.is_stdin:
                     continue
-                if not isinstance(descriptors[fd].mode, DescriptorRead):
+                if descriptors[fd].mode is not _DESCRIPTOR_READ:
                     arg += str(fd)
             elif fd == DESCRIPTOR_DEFAULT_INDEX_STDOUT:
                 if descriptors[fd].descriptor.is_default_file and descriptors[fd].descriptor.target.is_stdout:
                     continue
-                if not isinstance(descriptors[fd].mode, DescriptorWrite):
+                if descriptors[fd].mode is not _DESCRIPTOR_WRITE:
                     arg += str(fd)
             elif fd == DESCRIPTOR_DEFAULT_INDEX_STDERR:
                 if descriptors[fd].descriptor.is_default_file and descriptors[fd].descriptor.target.is_stderr:
@@ -248,14 +432,8 @@ class CommandDescriptors(object):
 
             target = descriptor.target
             if isinstance(target, DefaultFile):
-                file_target = target.target
-                if isinstance(file_target, StdinTarget):
-                    file_arg = "/dev/stdin"
-                elif isinstance(file_target, StdoutTarget):
-                    file_arg = "/dev/stdout"
-                elif isinstance(file_target, StderrTarget):
-                    file_arg = "/dev/stderr"
-                else:
+                file_arg = _DEFAULT_TARGET_FILES.get(target.target)
+                if file_arg is None:
                     raise Exception()
             else:
                 file_arg = str(target)
@@ -266,6 +444,7 @@ class CommandDescriptors(object):
         return " ".join(args)
 
 
+@_slotted
 @dataclass(frozen=True)
 class Command(object):
     command: Word
@@ -275,6 +454,10 @@ class Command(object):
     next_command: Optional['Command'] = None
     next_command_operator: Union[None, OperatorAnd, OperatorOr] = None
     asynchronous: bool = False
+    # The (start, end) offsets of the command in the parsed statement, from
+    # its first word or redirection up to its last. Not considered when
+    # comparing commands.
+    span: Optional[Tuple[int, int]] = field(default=None, compare=False, repr=False)
 
     def __post_init__(self):
         if self.next_command_operator and not self.next_command:
@@ -295,56 +478,277 @@ class Command(object):
     def __str__(self):
         return self.command_line
 
+    # Equality, hashing and repr all walk the pipe_command/next_command tree
+    # with an explicit stack rather than recursing, so that they keep working
+    # on chains of any length.
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+
+        stack = [(self, other)]
+        while stack:
+            cmd, other_cmd = stack.pop()
+            if cmd is other_cmd:
+                continue
+            if (
+                cmd.command != other_cmd.command
+                or cmd.descriptors != other_cmd.descriptors
+                or cmd.args != other_cmd.args
+                or cmd.next_command_operator != other_cmd.next_command_operator
+                or cmd.asynchronous != other_cmd.asynchronous
+            ):
+                return False
+
+            for child, other_child in (
+                (cmd.pipe_command, other_cmd.pipe_command),
+                (cmd.next_command, other_cmd.next_command),
+            ):
+                if child.__class__ is self.__class__ and other_child.__class__ is self.__class__:
+                    stack.append((child, other_child))
+                elif child != other_child:
+                    return False
+        return True
+
+    def __hash__(self):
+        # Hash every command after its pipe and next commands, by walking a
+        # pre-order list of the tree backwards.
+        cmds = []
+        stack = [self]
+        while stack:
+            cmd = stack.pop()
+            cmds.append(cmd)
+            if cmd.next_command.__class__ is self.__class__:
+                stack.append(cmd.next_command)
+            if cmd.pipe_command.__class__ is self.__class__:
+                stack.append(cmd.pipe_command)
+
+        hashes: Dict[int, int] = {}
+        for cmd in reversed(cmds):
+            pipe_command = cmd.pipe_command
+            next_command = cmd.next_command
+            hashes[id(cmd)] = hash((
+                cmd.command,
+                cmd.descriptors,
+                tuple(cmd.args),
+                hashes[id(pipe_command)] if pipe_command.__class__ is self.__class__ else hash(pipe_command),
+                hashes[id(next_command)] if next_command.__class__ is self.__class__ else hash(next_command),
+                cmd.next_command_operator,
+                cmd.asynchronous,
+            ))
+        return hashes[id(self)]
+
+    def __repr__(self):
+        # Produces the same output as the dataclass-generated repr. Fragments
+        # are collected in order and joined once at the end, which keeps the
+        # cost linear in the size of the output.
+        parts = []
+        stack = [self]
+        while stack:
+            item = stack.pop()
+            if item.__class__ is not self.__class__:
+                parts.append(item if isinstance(item, str) else repr(item))
+                continue
+            stack.append(", next_command_operator={0!r}, asynchronous={1!r})".format(
+                item.next_command_operator,
+                item.asynchronous,
+            ))
+            stack.append(item.next_command)
+            stack.append(", next_command=")
+            stack.append(item.pipe_command)
+            stack.append("{0}(command={1!r}, descriptors={2!r}, args={3!r}, pipe_command=".format(
+                item.__class__.__qualname__,
+                item.command,
+                item.descriptors,
+                item.args,
+            ))
+        return "".join(parts)
+
+    def __reduce__(self):
+        # The whole pipe_command/next_command tree is flattened into a single
+        # tuple, so that pickling long chains doesn't recurse.
+        return (_unflatten_command, (_flatten_command(self),))
+
 
 class InvalidCommandDataException(Exception):
     pass
 
 
-@dataclass(eq=False)
+# Trusted constructors for nodes built by the parser and the builders, whose
+# data is already known to be valid. They skip __init__, and with it the
+# frozen __setattr__ and the checks in __post_init__, and fill in the slots
+# directly. Fields are given in declaration order, with spans split into
+# their start and end slots.
+
+def _slot_setters(cls, *names):
+    return tuple(cls.__dict__[name].__set__ for name in names)
+
+
+_set_word_word, _set_word_span_start, _set_word_span_end = _slot_setters(Word, "word", "_span_start", "_span_end")
+_set_file_name, _set_file_span_start, _set_file_span_end = _slot_setters(File, "name", "_span_start", "_span_end")
+_set_file_descriptor_target, _set_file_descriptor_operator = _slot_setters(
+    CommandFileDescriptor, "target", "operator",
+)
+_set_descriptor_mode, _set_descriptor_descriptor = _slot_setters(CommandDescriptor, "mode", "descriptor")
+_set_descriptors_descriptors, = _slot_setters(CommandDescriptors, "descriptors")
+(
+    _set_command_command,
+    _set_command_descriptors,
+    _set_command_args,
+    _set_command_pipe_command,
+    _set_command_next_command,
+    _set_command_next_command_operator,
+    _set_command_asynchronous,
+    _set_command_span_start,
+    _set_command_span_end,
+) = _slot_setters(
+    Command,
+    "command",
+    "descriptors",
+    "args",
+    "pipe_command",
+    "next_command",
+    "next_command_operator",
+    "asynchronous",
+    "_span_start",
+    "_span_end",
+)
+
+_NO_SPAN = (None, None)
+
+
+def _new_word(word: str, span: Optional[Tuple[int, int]]) -> Word:
+    node = object.__new__(Word)
+    _set_word_word(node, word)
+    start, end = span or _NO_SPAN
+    _set_word_span_start(node, start)
+    _set_word_span_end(node, end)
+    return node
+
+
+def _new_file(name: str, span: Optional[Tuple[int, int]]) -> File:
+    node = object.__new__(File)
+    _set_file_name(node, name)
+    start, end = span or _NO_SPAN
+    _set_file_span_start(node, start)
+    _set_file_span_end(node, end)
+    return node
+
+
+def _new_file_descriptor(target, operator) -> CommandFileDescriptor:
+    node = object.__new__(CommandFileDescriptor)
+    _set_file_descriptor_target(node, target)
+    _set_file_descriptor_operator(node, operator)
+    return node
+
+
+def _new_descriptor(mode, descriptor: CommandFileDescriptor) -> CommandDescriptor:
+    node = object.__new__(CommandDescriptor)
+    _set_descriptor_mode(node, mode)
+    _set_descriptor_descriptor(node, descriptor)
+    return node
+
+
+def _new_descriptors(descriptors: Mapping[int, Union[CommandDescriptor, CommandDescriptorClosed]]) -> CommandDescriptors:
+    node = object.__new__(CommandDescriptors)
+    _set_descriptors_descriptors(node, descriptors)
+    return node
+
+
+def _new_command(
+    command: Word,
+    descriptors: CommandDescriptors,
+    args: Collection[Word],
+    pipe_command: Optional[Command],
+    next_command: Optional[Command],
+    next_command_operator: Union[None, OperatorAnd, OperatorOr],
+    asynchronous: bool,
+    span: Optional[Tuple[int, int]],
+) -> Command:
+    node = object.__new__(Command)
+    _set_command_command(node, command)
+    _set_command_descriptors(node, descriptors)
+    _set_command_args(node, args)
+    _set_command_pipe_command(node, pipe_command)
+    _set_command_next_command(node, next_command)
+    _set_command_next_command_operator(node, next_command_operator)
+    _set_command_asynchronous(node, asynchronous)
+    start, end = span or _NO_SPAN
+    _set_command_span_start(node, start)
+    _set_command_span_end(node, end)
+    return node
+
+
+# The descriptors every command starts out with. Command descriptor builders
+# share this table, and only copy it once something is changed.
+_DEFAULT_DESCRIPTOR_TABLE: Mapping[int, CommandDescriptor] = MappingProxyType({
+    DESCRIPTOR_DEFAULT_INDEX_STDIN: CommandDescriptor(
+        mode=_DESCRIPTOR_READ,
+        descriptor=CommandFileDescriptor(target=DefaultFile(target=_STDIN_TARGET), operator=_REDIRECTION_INPUT),
+    ),
+    DESCRIPTOR_DEFAULT_INDEX_STDOUT: CommandDescriptor(
+        mode=_DESCRIPTOR_WRITE,
+        descriptor=CommandFileDescriptor(target=DefaultFile(target=_STDOUT_TARGET), operator=_REDIRECTION_OUTPUT),
+    ),
+    DESCRIPTOR_DEFAULT_INDEX_STDERR: CommandDescriptor(
+        mode=_DESCRIPTOR_WRITE,
+        descriptor=CommandFileDescriptor(target=DefaultFile(target=_STDERR_TARGET), operator=_REDIRECTION_OUTPUT),
+    ),
+})
+_DEFAULT_COMMAND_DESCRIPTORS = CommandDescriptors(descriptors=_DEFAULT_DESCRIPTOR_TABLE)
+
+
+@_slotted
+@dataclass(init=False, repr=False, eq=False)
 class CommandDescriptorsBuilder(object):
-    descriptors: Dict[int, Union[CommandDescriptor, CommandDescriptorClosed]] = field(default_factory=dict)
+    # The table starts out as the shared, read-only default table, which is
+    # only copied into a dict private to this builder once it is changed or
+    # handed out through the descriptors property.
+    _descriptors: Mapping[int, Union[CommandDescriptor, CommandDescriptorClosed]]
+    _owned: bool
+
+    def __init__(self, descriptors: Optional[Dict[int, Union[CommandDescriptor, CommandDescriptorClosed]]] = None):
+        if descriptors is None:
+            self._descriptors = _DEFAULT_DESCRIPTOR_TABLE
+            self._owned = False
+            return
+        for fd, descriptor in _DEFAULT_DESCRIPTOR_TABLE.items():
+            if fd not in descriptors:
+                descriptors[fd] = descriptor
+        self._descriptors = descriptors
+        self._owned = True
 
-    def __post_init__(self):
-        if DESCRIPTOR_DEFAULT_INDEX_STDIN not in self.descriptors:
-            self.descriptors[DESCRIPTOR_DEFAULT_INDEX_STDIN] = CommandDescriptor(
-                mode=DescriptorRead(),
-                descriptor=CommandFileDescriptor(
-                    target=DefaultFile(target=StdinTarget()),
-                    operator=RedirectionInput(),
-                ),
-            )
-
-        if DESCRIPTOR_DEFAULT_INDEX_STDOUT not in self.descriptors:
-            self.descriptors[DESCRIPTOR_DEFAULT_INDEX_STDOUT] = CommandDescriptor(
-                mode=DescriptorWrite(),
-                descriptor=CommandFileDescriptor(
-                    target=DefaultFile(target=StdoutTarget()),
-                    operator=RedirectionOutput(),
-                ),
-            )
-
-        if DESCRIPTOR_DEFAULT_INDEX_STDERR not in self.descriptors:
-            self.descriptors[DESCRIPTOR_DEFAULT_INDEX_STDERR] = CommandDescriptor(
-                mode=DescriptorWrite(),
-                descriptor=CommandFileDescriptor(
-                    target=DefaultFile(target=StderrTarget()),
-                    operator=RedirectionOutput(),
-                ),
-            )
+    def __repr__(self):
+        return "{0}(descriptors={1!r})".format(self.__class__.__name__, dict(self._descriptors))
+
+    @property
+    def descriptors(self) -> Dict[int, Union[CommandDescriptor, CommandDescriptorClosed]]:
+        return self._writable()
+
+    @descriptors.setter
+    def descriptors(self, descriptors: Dict[int, Union[CommandDescriptor, CommandDescriptorClosed]]):
+        self._descriptors = descriptors
+        self._owned = descriptors is not _DEFAULT_DESCRIPTOR_TABLE
+
+    def _writable(self) -> Dict[int, Union[CommandDescriptor, CommandDescriptorClosed]]:
+        if not self._owned:
+            self._descriptors = dict(self._descriptors)
+            self._owned = True
+        return self._descriptors
 
     def set_descriptor(self, fd: int, descriptor: CommandDescriptor):
         if fd < 0:
             raise InvalidFileDescriptorException("File descriptors cannot be negative")
-        self.descriptors[fd] = descriptor
+        self._writable()[fd] = descriptor
 
     def duplicate_descriptor(self, src_fd: int, dest_fd: int):
         if src_fd < 0 or dest_fd < 0:
             raise InvalidFileDescriptorException("File descriptors cannot be negative")
         success = False
         try:
-            src_descriptor = self.descriptors[src_fd].duplicate()
+            src_descriptor = self._descriptors[src_fd].duplicate()
             if isinstance(src_descriptor, CommandDescriptor):
-                self.descriptors[dest_fd] = src_descriptor
+                self._writable()[dest_fd] = src_descriptor
                 success = True
         except KeyError:
             pass
@@ -355,10 +759,23 @@ class CommandDescriptorsBuilder(object):
     def close_descriptor(self, fd: int):
         if fd < 0:
             raise InvalidFileDescriptorException("File descriptors cannot be negative")
-        self.descriptors[fd] = CommandDescriptorClosed()
+        self._writable()[fd] = _COMMAND_DESCRIPTOR_CLOSED
 
     def create(self) -> CommandDescriptors:
-        return CommandDescriptors(descriptors=MappingProxyType(self.descriptors.copy()))
+        return self._create(False)
+
+    def _create(self, trusted: bool) -> CommandDescriptors:
+        # Trusted callers guarantee that every descriptor was added by the
+        # parser, so the table doesn't need to be checked again. The builder
+        # may still be changed afterwards, so the table is always copied,
+        # unless it is still the shared default.
+        descriptors = self._descriptors
+        if descriptors is _DEFAULT_DESCRIPTOR_TABLE:
+            return _DEFAULT_COMMAND_DESCRIPTORS
+        descriptors = dict(descriptors)
+        if trusted:
+            return _new_descriptors(MappingProxyType(descriptors))
+        return CommandDescriptors(descriptors=MappingProxyType(descriptors))
 
 
 class BadFileDescriptorException(Exception):
@@ -373,6 +790,7 @@ class InvalidFileDescriptorException(Exception):
     pass
 
 
+@_slotted
 @dataclass(eq=False)
 class CommandBuilder(object):
     words: List[Word] = field(default_factory=list)
@@ -381,45 +799,384 @@ class CommandBuilder(object):
     next_command: Optional['CommandBuilder'] = None
     next_command_operator: Union[None, OperatorAnd, OperatorOr] = None
     asynchronous: bool = False
+    span: Optional[Tuple[int, int]] = None
 
     def create(self) -> Command:
-        args: Collection[Word]
-        if len(self.words) == 0:
-            raise CommandBuilderCreateException("No command words added.")
-        elif len(self.words) == 1:
-            command = self.words[0]
-            args = tuple()
-        else:
-            command = self.words[0]
-            args = tuple(self.words[1:])
+        return self._create(False)
+
+    def _create(self, trusted: bool) -> Command:
+        # Trusted callers, such as the parser, guarantee that the builders
+        # hold valid data, so the commands are made without checking it
+        # again.
+        #
+        # Collect the builders in pre-order (each builder, then its pipe
+        # command, then its next command), so that walking the list backwards
+        # creates every command after the commands it links to. This avoids
+        # recursing through long pipelines and statement chains.
+        builders: List['CommandBuilder'] = []
+        stack = [self]
+        while stack:
+            builder = stack.pop()
+            if len(builder.words) == 0:
+                raise CommandBuilderCreateException("No command words added.")
+            builders.append(builder)
+            if builder.next_command:
+                stack.append(builder.next_command)
+            if builder.pipe_command:
+                stack.append(builder.pipe_command)
+
+        created: Dict[int, Command] = {}
+        for builder in reversed(builders):
+            args: Collection[Word]
+            if len(builder.words) == 1:
+                command = builder.words[0]
+                args = tuple()
+            else:
+                command = builder.words[0]
+                args = tuple(builder.words[1:])
 
-        pipe_command: Optional[Command]
-        if self.pipe_command:
-            pipe_command = self.pipe_command.create()
-        else:
-            pipe_command = None
+            pipe_command: Optional[Command]
+            if builder.pipe_command:
+                pipe_command = created[id(builder.pipe_command)]
+            else:
+                pipe_command = None
 
-        next_command: Optional[Command]
-        if self.next_command:
-            next_command = self.next_command.create()
-        else:
-            next_command = None
+            next_command: Optional[Command]
+            if builder.next_command:
+                next_command = created[id(builder.next_command)]
+            else:
+                next_command = None
+
+            if trusted:
+                created[id(builder)] = _new_command(
+                    command,
+                    builder.descriptors._create(True),
+                    args,
+                    pipe_command,
+                    next_command,
+                    builder.next_command_operator,
+                    builder.asynchronous,
+                    builder.span,
+                )
+            else:
+                created[id(builder)] = Command(
+                    command=command,
+                    args=args,
+                    descriptors=builder.descriptors.create(),
+                    pipe_command=pipe_command,
+                    next_command=next_command,
+                    next_command_operator=builder.next_command_operator,
+                    asynchronous=builder.asynchronous,
+                    span=builder.span,
+                )
 
-        return Command(
-            command=command,
-            args=args,
-            descriptors=self.descriptors.create(),
-            pipe_command=pipe_command,
-            next_command=next_command,
-            next_command_operator=self.next_command_operator,
-            asynchronous=self.asynchronous,
-        )
+        return created[id(self)]
 
 
 class CommandBuilderCreateException(Exception):
     pass
 
 
+_MARKER_CLASSES = (
+    StdinTarget,
+    StdoutTarget,
+    StderrTarget,
+    RedirectionInput,
+    RedirectionOutput,
+    RedirectionAppend,
+    OperatorAnd,
+    OperatorOr,
+    DescriptorRead,
+    DescriptorWrite,
+    CommandDescriptorClosed,
+)
+
+_MARKERS = tuple(marker_class() for marker_class in _MARKER_CLASSES)
+
+_DESCRIPTOR_CLOSED = 0
+_DESCRIPTOR_DEFAULT_STDIN = 1
+_DESCRIPTOR_DEFAULT_STDOUT = 2
+_DESCRIPTOR_DEFAULT_STDERR = 3
+
+_OPERATOR_TAGS = {
+    RedirectionInput: _MARKER_REDIRECTION_INPUT,
+    RedirectionOutput: _MARKER_REDIRECTION_OUTPUT,
+    RedirectionAppend: _MARKER_REDIRECTION_APPEND,
+}
+_TARGET_TAGS = {
+    StdinTarget: _MARKER_STDIN_TARGET,
+    StdoutTarget: _MARKER_STDOUT_TARGET,
+    StderrTarget: _MARKER_STDERR_TARGET,
+}
+
+_DEFAULT_DESCRIPTORS = (
+    _COMMAND_DESCRIPTOR_CLOSED,
+    _DEFAULT_DESCRIPTOR_TABLE[DESCRIPTOR_DEFAULT_INDEX_STDIN],
+    _DEFAULT_DESCRIPTOR_TABLE[DESCRIPTOR_DEFAULT_INDEX_STDOUT],
+    _DEFAULT_DESCRIPTOR_TABLE[DESCRIPTOR_DEFAULT_INDEX_STDERR],
+)
+_DEFAULT_DESCRIPTORS_ENCODED = (
+    DESCRIPTOR_DEFAULT_INDEX_STDIN, _DESCRIPTOR_DEFAULT_STDIN,
+    DESCRIPTOR_DEFAULT_INDEX_STDOUT, _DESCRIPTOR_DEFAULT_STDOUT,
+    DESCRIPTOR_DEFAULT_INDEX_STDERR, _DESCRIPTOR_DEFAULT_STDERR,
+)
+
+_COMMAND_HAS_PIPE = 1
+_COMMAND_HAS_NEXT = 2
+_COMMAND_ASYNCHRONOUS = 4
+_COMMAND_OPERATOR_AND = 8
+_COMMAND_OPERATOR_OR = 16
+_COMMAND_HAS_SPANS = 32
+_COMMAND_ARGS_LIST = 64
+_COMMAND_ARGS_TYPE = 128
+
+
+def _rebuild_marker(tag: int):
+    return _MARKERS[tag]
+
+
+def _encode_descriptor(descriptor: Union[CommandDescriptor, CommandDescriptorClosed]):
+    # Returns a short tag for closed and default descriptors, an
+    # (operator, target) pair for everything else that the parser can
+    # produce, or None if the descriptor can't be encoded compactly.
+    if type(descriptor) is CommandDescriptorClosed:
+        return _DESCRIPTOR_CLOSED
+    if type(descriptor) is not CommandDescriptor:
+        return None
+
+    file_descriptor = descriptor.descriptor
+    if type(file_descriptor) is not CommandFileDescriptor:
+        return None
+    operator_tag = _OPERATOR_TAGS.get(type(file_descriptor.operator))
+    target = file_descriptor.target
+    if operator_tag is None:
+        return None
+
+    if type(target) is File:
+        if target.span is None:
+            return (operator_tag, target.name)
+        return (operator_tag, target.name, target.span[0], target.span[1])
+    if type(target) is not DefaultFile:
+        return None
+    target_tag = _TARGET_TAGS.get(type(target.target))
+    if target_tag is None:
+        return None
+
+    if operator_tag == _MARKER_REDIRECTION_INPUT:
+        if target_tag == _MARKER_STDIN_TARGET:
+            return _DESCRIPTOR_DEFAULT_STDIN
+    elif operator_tag == _MARKER_REDIRECTION_OUTPUT:
+        if target_tag == _MARKER_STDOUT_TARGET:
+            return _DESCRIPTOR_DEFAULT_STDOUT
+        elif target_tag == _MARKER_STDERR_TARGET:
+            return _DESCRIPTOR_DEFAULT_STDERR
+    return (operator_tag, target_tag)
+
+
+def _decode_descriptor(code, trusted: bool = False) -> Union[CommandDescriptor, CommandDescriptorClosed]:
+    if type(code) is int:
+        return _DEFAULT_DESCRIPTORS[code]
+
+    operator_tag = code[0]
+    target_code = code[1]
+    span = (code[2], code[3]) if len(code) == 4 else None
+    if type(target_code) is str:
+        target = _new_file(target_code, span) if trusted else File(target_code, span)
+    else:
+        target = DefaultFile(target=_MARKERS[target_code])
+
+    if operator_tag == _MARKER_REDIRECTION_INPUT:
+        mode = _DESCRIPTOR_READ
+    else:
+        mode = _DESCRIPTOR_WRITE
+    if trusted:
+        return _new_descriptor(mode, _new_file_descriptor(target, _MARKERS[operator_tag]))
+    return CommandDescriptor(
+        mode=mode,
+        descriptor=CommandFileDescriptor(target=target, operator=_MARKERS[operator_tag]),
+    )
+
+
+def _encode_descriptors(descriptors):
+    # Descriptor tables are encoded as a flat (fd, code, fd, code, ...) tuple,
+    # where descriptors that can't be encoded compactly are stored as-is.
+    # None stands in for the default stdin/stdout/stderr table.
+    if type(descriptors) is not CommandDescriptors:
+        return [descriptors]
+
+    encoded = []
+    for fd, descriptor in descriptors.descriptors.items():
+        code = _encode_descriptor(descriptor)
+        encoded.append(fd)
+        encoded.append(descriptor if code is None else code)
+    encoded = tuple(encoded)
+    if encoded == _DEFAULT_DESCRIPTORS_ENCODED:
+        return None
+    return encoded
+
+
+def _decode_descriptors(encoded, trusted: bool = False) -> CommandDescriptors:
+    if encoded is None:
+        return _DEFAULT_COMMAND_DESCRIPTORS
+    if type(encoded) is list:
+        return encoded[0]
+
+    descriptors = {}
+    for i in range(0, len(encoded), 2):
+        code = encoded[i + 1]
+        if type(code) is int or type(code) is tuple:
+            descriptors[encoded[i]] = _decode_descriptor(code, trusted)
+        else:
+            descriptors[encoded[i]] = code
+    if trusted:
+        return _new_descriptors(MappingProxyType(descriptors))
+    return CommandDescriptors(descriptors=MappingProxyType(descriptors))
+
+
+def _encode_spans(cmd: Command) -> Optional[tuple]:
+    # Lays out the command span followed by the span of every word as a flat
+    # tuple of offsets, using -1 where there is no span. Returns None if
+    # there are no spans at all.
+    spans = [cmd.span]
+    spans.append(cmd.command.span if type(cmd.command) is Word else None)
+    for arg in cmd.args:
+        spans.append(arg.span if type(arg) is Word else None)
+
+    encoded = []
+    found = False
+    for span in spans:
+        if span is None:
+            encoded.append(-1)
+            encoded.append(-1)
+        else:
+            encoded.append(span[0])
+            encoded.append(span[1])
+            found = True
+    return tuple(encoded) if found else None
+
+
+def _decode_span(spans: Optional[tuple], index: int) -> Optional[Tuple[int, int]]:
+    if spans is None or spans[index] == -1:
+        return None
+    return (spans[index], spans[index + 1])
+
+
+def _flatten_command(first_cmd: Command) -> tuple:
+    # Walks the command tree in pre-order (each command, then its pipe
+    # command, then its next command) and lays every command out flat as:
+    # command word, argument count, arguments, encoded descriptors, flags,
+    # the type of the arguments container if it is neither a tuple nor a
+    # list, and finally the encoded spans if the flags say there are any.
+    # Words that aren't plain Word objects are stored as-is.
+    records: List = []
+    append = records.append
+    stack = [first_cmd]
+    while stack:
+        cmd = stack.pop()
+        command = cmd.command
+        append(command.word if type(command) is Word else command)
+        args = cmd.args
+        append(len(args))
+        for arg in args:
+            append(arg.word if type(arg) is Word else arg)
+        append(_encode_descriptors(cmd.descriptors))
+
+        flags = 0
+        if cmd.pipe_command is not None:
+            flags |= _COMMAND_HAS_PIPE
+        if cmd.next_command is not None:
+            flags |= _COMMAND_HAS_NEXT
+            stack.append(cmd.next_command)
+        if cmd.pipe_command is not None:
+            stack.append(cmd.pipe_command)
+        if cmd.asynchronous:
+            flags |= _COMMAND_ASYNCHRONOUS
+        if cmd.next_command_operator is _OPERATOR_AND:
+            flags |= _COMMAND_OPERATOR_AND
+        elif cmd.next_command_operator is _OPERATOR_OR:
+            flags |= _COMMAND_OPERATOR_OR
+        args_type = type(args)
+        if args_type is list:
+            flags |= _COMMAND_ARGS_LIST
+        elif args_type is not tuple:
+            flags |= _COMMAND_ARGS_TYPE
+        spans = _encode_spans(cmd)
+        if spans is not None:
+            flags |= _COMMAND_HAS_SPANS
+        append(flags)
+        if flags & _COMMAND_ARGS_TYPE:
+            append(args_type)
+        if spans is not None:
+            append(spans)
+    return tuple(records)
+
+
+def _unflatten_command(records: tuple, trusted: bool = False) -> Command:
+    # Records written by this package itself, rather than read from an
+    # arbitrary pickle, may be trusted and built without validation.
+    nodes = []
+    pos = 0
+    records_len = len(records)
+    while pos < records_len:
+        command = records[pos]
+        args_len = records[pos + 1]
+        args = records[pos + 2:pos + 2 + args_len]
+        descriptors = records[pos + 2 + args_len]
+        flags = records[pos + 3 + args_len]
+        pos += 4 + args_len
+        args_type = tuple
+        if flags & _COMMAND_ARGS_LIST:
+            args_type = list
+        elif flags & _COMMAND_ARGS_TYPE:
+            args_type = records[pos]
+            pos += 1
+        spans = None
+        if flags & _COMMAND_HAS_SPANS:
+            spans = records[pos]
+            pos += 1
+        nodes.append((command, args, args_type, descriptors, flags, spans))
+
+    # Build the tree bottom-up. Walking the pre-order layout backwards means
+    # every command's pipe and next commands have already been built, with
+    # the pipe command on top of the stack.
+    stack: List[Command] = []
+    for command, args, args_type, descriptors, flags, spans in reversed(nodes):
+        pipe_command = stack.pop() if flags & _COMMAND_HAS_PIPE else None
+        next_command = stack.pop() if flags & _COMMAND_HAS_NEXT else None
+        if flags & _COMMAND_OPERATOR_AND:
+            next_command_operator = _OPERATOR_AND
+        elif flags & _COMMAND_OPERATOR_OR:
+            next_command_operator = _OPERATOR_OR
+        else:
+            next_command_operator = None
+        if trusted:
+            stack.append(_new_command(
+                _new_word(command, _decode_span(spans, 2)),
+                _decode_descriptors(descriptors, True),
+                args_type(_new_word(arg, _decode_span(spans, 4 + i * 2)) for i, arg in enumerate(args)),
+                pipe_command,
+                next_command,
+                next_command_operator,
+                bool(flags & _COMMAND_ASYNCHRONOUS),
+                _decode_span(spans, 0),
+            ))
+            continue
+        stack.append(Command(
+            command=Word(command, _decode_span(spans, 2)) if type(command) is str else command,
+            descriptors=_decode_descriptors(descriptors, False),
+            args=args_type(
+                Word(arg, _decode_span(spans, 4 + i * 2)) if type(arg) is str else arg
+                for i, arg in enumerate(args)
+            ),
+            pipe_command=pipe_command,
+            next_command=next_command,
+            next_command_operator=next_command_operator,
+            asynchronous=bool(flags & _COMMAND_ASYNCHRONOUS),
+            span=_decode_span(spans, 0),
+        ))
+    return stack[0]
+
+
 __all__ = [
     "DESCRIPTOR_DEFAULT_INDEX_STDIN",
     "DESCRIPTOR_DEFAULT_INDEX_STDOUT",
@@ -0,0 +1,184 @@
+import copy
+import sys
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Optional, Union
+
+from .ast import Command
+
+
+# Rough per-object memory costs, used to estimate how much memory a cached
+# parse result holds on to without walking every object it references.
+_COMMAND_SIZE_ESTIMATE = 2000
+_WORD_SIZE_ESTIMATE = 90
+_SPAN_SIZE_ESTIMATE = 64
+_FAILURE_SIZE_ESTIMATE = 400
+_ENTRY_SIZE_ESTIMATE = 100
+
+
+def estimate_size(statement: str, result: Union[Command, Exception]) -> int:
+    """
+    Estimates the number of bytes of memory used by a cache entry. The
+    estimate covers the statement used as the key, and every command and word
+    reachable from the result.
+
+    :param statement: The command line string used as the cache key.
+    :type statement: str
+    :param result: The parsed command, or the exception raised while parsing.
+    :type result: Union[Command, Exception]
+    :returns: The approximate size of the entry, in bytes.
+    :rtype: int
+    """
+
+    size = _ENTRY_SIZE_ESTIMATE + sys.getsizeof(statement)
+    if not isinstance(result, Command):
+        return size + _FAILURE_SIZE_ESTIMATE
+
+    stack = [result]
+    while stack:
+        cmd = stack.pop()
+        size += _COMMAND_SIZE_ESTIMATE + _WORD_SIZE_ESTIMATE + sys.getsizeof(str(cmd.command))
+        for arg in cmd.args:
+            size += _WORD_SIZE_ESTIMATE + sys.getsizeof(str(arg))
+        if cmd.span is not None:
+            # One span for the command, and roughly one for each word.
+            size += _SPAN_SIZE_ESTIMATE * (len(cmd.args) + 2)
+        if cmd.pipe_command is not None:
+            stack.append(cmd.pipe_command)
+        if cmd.next_command is not None:
+            stack.append(cmd.next_command)
+    return size
+
+
+class ParseCache(object):
+    """
+    A bounded, in-memory least-recently-used cache of parse results, keyed on
+    the statement passed to :func:`shell_parser.parser.Parser.parse`.
+
+    Both successfully parsed commands and parsing failures are cached, so a
+    statement that was rejected once is rejected again without being parsed.
+    Entries are evicted least-recently-used first whenever the cache holds
+    more than ``max_entries`` entries, or the estimated memory used by all
+    entries exceeds ``max_bytes``.
+
+    It is safe to share a single cache between several parsers and threads,
+    as long as the parsers use the same ``spans`` setting: the spans recorded
+    by whichever parser filled an entry are returned to all of them.
+    """
+
+    def __init__(self, max_entries: Optional[int] = 10000, max_bytes: Optional[int] = None):
+        """
+        :param max_entries: The maximum number of entries to keep, or ``None``
+                            for no limit.
+        :type max_entries: int
+        :param max_bytes: The maximum estimated memory used by all entries,
+                          in bytes, or ``None`` for no limit.
+        :type max_bytes: int
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.size_bytes = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, statement: str) -> bool:
+        return statement in self._entries
+
+    def get(self, statement: str) -> Union[None, Command, Exception]:
+        """
+        Looks up the result of parsing a statement, marking it as recently
+        used.
+
+        :param statement: The command line string, as passed to the parser.
+        :type statement: str
+        :returns: ``None`` if the statement is not cached. Otherwise, the
+                  parsed command, or a fresh copy of the exception raised
+                  when it was parsed.
+        :rtype: Union[None, Command, Exception]
+        """
+
+        with self._lock:
+            entry = self._entries.get(statement)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(statement)
+            self.hits += 1
+
+        result = entry[0]
+        if isinstance(result, Exception):
+            # Hand out a copy, so that raising it doesn't attach a traceback
+            # to the cached exception.
+            return copy.copy(result)
+        return result
+
+    def put(self, statement: str, result: Union[Command, Exception]):
+        """
+        Stores the result of parsing a statement, evicting the least recently
+        used entries as necessary.
+
+        :param statement: The command line string, as passed to the parser.
+        :type statement: str
+        :param result: The parsed command, or the exception raised while
+                       parsing.
+        :type result: Union[Command, Exception]
+        """
+
+        if isinstance(result, Exception):
+            result = copy.copy(result)
+        size = estimate_size(statement, result)
+
+        with self._lock:
+            old_entry = self._entries.pop(statement, None)
+            if old_entry is not None:
+                self.size_bytes -= old_entry[1]
+            self._entries[statement] = (result, size)
+            self.size_bytes += size
+
+            max_entries = self.max_entries
+            max_bytes = self.max_bytes
+            while self._entries and (
+                (max_entries is not None and len(self._entries) > max_entries)
+                or (max_bytes is not None and self.size_bytes > max_bytes)
+            ):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.size_bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        """
+        Removes every entry from the cache. The statistics counters are left
+        untouched.
+        """
+
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        :returns: A snapshot of the cache statistics: ``hits``, ``misses``,
+                  ``evictions``, ``entries`` and ``size_bytes``.
+        :rtype: Dict[str, int]
+        """
+
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "size_bytes": self.size_bytes,
+            }
+
+
+__all__ = [
+    "estimate_size",
+    "ParseCache",
+]
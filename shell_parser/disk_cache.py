@@ -0,0 +1,366 @@
+import hashlib
+import marshal
+import os
+import sqlite3
+import time
+from threading import Lock
+from typing import Dict, Optional, Union
+
+from . import __version__
+from .ast import (
+    BadFileDescriptorException,
+    Command,
+    CommandBuilderCreateException,
+    _flatten_command,
+    _unflatten_command,
+)
+from .parser import (
+    AmbiguousRedirectParserFailure,
+    EmptyInputException,
+    EmptyRedirectParserFailure,
+    EmptyStatementParserFailure,
+    InvalidRedirectionParserFailure,
+    ParserFailure,
+    UnclosedQuoteParserFailure,
+    UnexpectedStatementFinishParserFailure,
+)
+
+
+# Bumped whenever the encoding of cached values changes. Together with the
+# package version and the marshal format version, it salts every key, so
+# entries written by another version are never read back, and are evicted in
+# time.
+_FORMAT_VERSION = 1
+_KEY_SALT = "shell_parser {0} cache {1} marshal {2}\x00".format(
+    __version__, _FORMAT_VERSION, marshal.version,
+).encode("ascii")
+_KEY_SIZE = 16
+
+# Values are a kind byte followed by the flattened command, or the failure
+# class and its arguments, serialized with marshal. Decoding a marshalled
+# tuple happens entirely in C, which is several times faster than decoding
+# the varint encoding used by command stores, for a few more bytes.
+_KIND_COMMAND = b"C"
+_KIND_FAILURE = b"F"
+
+# Failure classes are stored by their position in this tuple, so new classes
+# may only be added at the end.
+_FAILURE_CLASSES = (
+    EmptyInputException,
+    ParserFailure,
+    UnclosedQuoteParserFailure,
+    EmptyStatementParserFailure,
+    EmptyRedirectParserFailure,
+    UnexpectedStatementFinishParserFailure,
+    InvalidRedirectionParserFailure,
+    AmbiguousRedirectParserFailure,
+    BadFileDescriptorException,
+    CommandBuilderCreateException,
+)
+_FAILURE_TAGS = {failure_class: tag for tag, failure_class in enumerate(_FAILURE_CLASSES)}
+
+# Writing the time an entry was last used on every hit would turn readers
+# into writers, so a hit only refreshes entries not used for this long.
+_TOUCH_INTERVAL = 60
+
+# The number of least recently used entries looked at in one go when
+# evicting.
+_EVICTION_BATCH = 64
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS entries ("
+    "key BLOB PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, used INTEGER NOT NULL"
+    ") WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS entries_used ON entries (used)",
+    # A single row with the totals for the entries table, so that checking the
+    # limits doesn't scan the table.
+    "CREATE TABLE IF NOT EXISTS totals (id INTEGER PRIMARY KEY CHECK (id = 0), "
+    "entries INTEGER NOT NULL, bytes INTEGER NOT NULL)",
+    "INSERT OR IGNORE INTO totals VALUES (0, 0, 0)",
+)
+
+
+def _cache_key(statement: str) -> bytes:
+    # A statement is any str, and may hold lone surrogates, for example from
+    # text decoded with surrogateescape. Plain UTF-8 refuses to encode them.
+    return hashlib.blake2b(
+        _KEY_SALT + statement.encode("utf-8", "surrogatepass"),
+        digest_size=_KEY_SIZE,
+    ).digest()
+
+
+def _encode_result(result: Union[Command, Exception]) -> Optional[bytes]:
+    # Returns None for results that can't be stored.
+    if isinstance(result, Exception):
+        tag = _FAILURE_TAGS.get(type(result))
+        if tag is None:
+            return None
+        if isinstance(result, ParserFailure):
+            values = (tag, str(result.args[0]), result.pos)
+        else:
+            values = (tag,) + result.args
+        value = bytearray(_KIND_FAILURE)
+    else:
+        values = _flatten_command(result)
+        value = bytearray(_KIND_COMMAND)
+    try:
+        value += marshal.dumps(values)
+    except ValueError:
+        # Something the parser doesn't produce, such as a subclass of Word.
+        return None
+    return bytes(value)
+
+
+def _decode_result(value: bytes) -> Union[Command, Exception]:
+    values = marshal.loads(value[1:])
+    if value[:1] == _KIND_COMMAND:
+        return _unflatten_command(values, trusted=True)
+    return _FAILURE_CLASSES[values[0]](*values[1:])
+
+
+class DiskParseCache(object):
+    """
+    A bounded, persistent cache of parse results, stored in an SQLite
+    database on the local disk. It can be passed to
+    :class:`shell_parser.parser.Parser` in place of a
+    :class:`shell_parser.cache.ParseCache`.
+
+    Entries are keyed on a hash of the statement and of the version of this
+    package, so they outlive the process that wrote them, and a newer version
+    never reads results cached by an older one. Results are stored in the
+    compact, flattened form, and decoded into fresh commands on every hit
+    instead of being parsed again. Only open databases written by processes
+    you trust, as they are read without validation. Like
+    :class:`shell_parser.cache.ParseCache`, failures are cached too. Parsers
+    sharing a cache should use the same ``spans`` setting.
+
+    Many processes on the same host may open the same database at once. Each
+    process, and each instance, should open its own cache rather than sharing
+    one across a fork. Entries are evicted least-recently-used first whenever
+    the database holds more than ``max_entries`` entries, or the keys and
+    encoded values of all entries take up more than ``max_bytes``. The time
+    an entry was last used is only refreshed once a minute, so eviction order
+    is approximate.
+    """
+
+    def __init__(
+            self,
+            path: str,
+            max_entries: Optional[int] = 1000000,
+            max_bytes: Optional[int] = None,
+            timeout: float = 30.0,
+        ):
+        """
+        :param path: The path of the database file. It is created if it
+                     doesn't exist.
+        :type path: str
+        :param max_entries: The maximum number of entries to keep, or ``None``
+                            for no limit.
+        :type max_entries: int
+        :param max_bytes: The maximum size of the keys and encoded values of
+                          all entries, in bytes, or ``None`` for no limit. The
+                          database file itself is somewhat larger.
+        :type max_bytes: int
+        :param timeout: How long to wait for another process writing to the
+                        database, in seconds.
+        :type timeout: float
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = Lock()
+        self._pid = os.getpid()
+        # Transactions are managed explicitly, so that a write takes the
+        # database lock up front instead of failing halfway through.
+        self._connection = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        try:
+            # The write-ahead log lets readers carry on while another process
+            # writes.
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            with self._transaction():
+                for statement in _SCHEMA:
+                    self._connection.execute(statement)
+        except sqlite3.Error:
+            self._connection.close()
+            raise
+
+    def __enter__(self) -> "DiskParseCache":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self) -> int:
+        return self._totals()[0]
+
+    def __contains__(self, statement: str) -> bool:
+        self._check_process()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT 1 FROM entries WHERE key = ?", (_cache_key(statement),),
+            ).fetchone()
+        return row is not None
+
+    def _check_process(self):
+        # An SQLite connection must not be used by a forked child.
+        if os.getpid() != self._pid:
+            raise DiskParseCacheException("The cache was opened by another process")
+
+    def _transaction(self) -> "_Transaction":
+        return _Transaction(self._connection)
+
+    def _totals(self):
+        self._check_process()
+        with self._lock:
+            return self._connection.execute("SELECT entries, bytes FROM totals").fetchone()
+
+    def get(self, statement: str) -> Union[None, Command, Exception]:
+        """
+        Looks up the result of parsing a statement.
+
+        :param statement: The command line string, as passed to the parser.
+        :type statement: str
+        :returns: ``None`` if the statement is not cached. Otherwise, the
+                  parsed command, or the exception raised when it was
+                  parsed.
+        :rtype: Union[None, Command, Exception]
+        """
+
+        self._check_process()
+        key = _cache_key(statement)
+        now = int(time.time())
+        with self._lock:
+            row = self._connection.execute("SELECT value, used FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            if now - row[1] >= _TOUCH_INTERVAL:
+                with self._transaction():
+                    self._connection.execute("UPDATE entries SET used = ? WHERE key = ?", (now, key))
+        return _decode_result(row[0])
+
+    def put(self, statement: str, result: Union[Command, Exception]):
+        """
+        Stores the result of parsing a statement, evicting the least recently
+        used entries as necessary. Exceptions the parser doesn't raise itself
+        are not stored.
+
+        :param statement: The command line string, as passed to the parser.
+        :type statement: str
+        :param result: The parsed command, or the exception raised while
+                       parsing.
+        :type result: Union[Command, Exception]
+        """
+
+        self._check_process()
+        value = _encode_result(result)
+        if value is None:
+            return
+        key = _cache_key(statement)
+        size = len(key) + len(value)
+        now = int(time.time())
+
+        with self._lock, self._transaction():
+            execute = self._connection.execute
+            row = execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                execute("INSERT INTO entries VALUES (?, ?, ?, ?)", (key, value, size, now))
+                execute("UPDATE totals SET entries = entries + 1, bytes = bytes + ?", (size,))
+            else:
+                execute("UPDATE entries SET value = ?, size = ?, used = ? WHERE key = ?", (value, size, now, key))
+                execute("UPDATE totals SET bytes = bytes + ?", (size - row[0],))
+            self._evict()
+
+    def _evict(self):
+        execute = self._connection.execute
+        max_entries = self.max_entries
+        max_bytes = self.max_bytes
+        entries, total_bytes = execute("SELECT entries, bytes FROM totals").fetchone()
+        while entries and (
+            (max_entries is not None and entries > max_entries)
+            or (max_bytes is not None and total_bytes > max_bytes)
+        ):
+            evicted = []
+            evicted_bytes = 0
+            for key, size in execute("SELECT key, size FROM entries ORDER BY used LIMIT ?", (_EVICTION_BATCH,)):
+                evicted.append((key,))
+                evicted_bytes += size
+                entries -= 1
+                total_bytes -= size
+                if not (
+                    (max_entries is not None and entries > max_entries)
+                    or (max_bytes is not None and total_bytes > max_bytes)
+                ):
+                    break
+            if not evicted:
+                break
+            self._connection.executemany("DELETE FROM entries WHERE key = ?", evicted)
+            execute("UPDATE totals SET entries = entries - ?, bytes = bytes - ?", (len(evicted), evicted_bytes))
+            self.evictions += len(evicted)
+
+    def clear(self):
+        """
+        Removes every entry from the cache, for every process using it. The
+        statistics counters are left untouched.
+        """
+
+        self._check_process()
+        with self._lock, self._transaction():
+            self._connection.execute("DELETE FROM entries")
+            self._connection.execute("UPDATE totals SET entries = 0, bytes = 0")
+
+    def stats(self) -> Dict[str, int]:
+        """
+        :returns: A snapshot of the cache statistics. ``hits``, ``misses`` and
+                  ``evictions`` count the lookups and evictions made through
+                  this instance, while ``entries`` and ``size_bytes`` describe
+                  the whole database.
+        :rtype: Dict[str, int]
+        """
+
+        entries, size_bytes = self._totals()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": entries,
+            "size_bytes": size_bytes,
+        }
+
+    def close(self):
+        """
+        Closes the database. Commands that were already returned stay valid.
+        """
+        self._connection.close()
+
+
+class _Transaction(object):
+    # Holds the database write lock from the start of the block, and commits
+    # at the end of it, or rolls back if it raised.
+
+    def __init__(self, connection: sqlite3.Connection):
+        self._connection = connection
+
+    def __enter__(self):
+        self._connection.execute("BEGIN IMMEDIATE")
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self._connection.execute("COMMIT")
+        else:
+            self._connection.execute("ROLLBACK")
+
+
+class DiskParseCacheException(Exception):
+    pass
+
+
+__all__ = [
+    "DiskParseCache",
+    "DiskParseCacheException",
+]
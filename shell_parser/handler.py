@@ -0,0 +1,211 @@
+from typing import Callable, Optional, Tuple
+
+from .ast import _new_word, _new_file, _new_file_descriptor, _new_descriptor
+from .ast import _REDIRECTION_INPUT, _REDIRECTION_OUTPUT, _REDIRECTION_APPEND, _OPERATOR_AND, _OPERATOR_OR
+from .ast import _DESCRIPTOR_READ, _DESCRIPTOR_WRITE
+from .ast import Command, CommandBuilder
+
+
+class ParseHandler(object):
+    """
+    Receives the parts of a statement from
+    :func:`shell_parser.parser.Parser.parse_events` as the parser finds them,
+    in the order they appear in the statement. Every method does nothing by
+    default, so subclasses only need to implement the events they are
+    interested in.
+
+    Spans are ``(start, end)`` offsets into the statement passed to the
+    parser, or ``None`` if the parser was created with ``spans=False``.
+    """
+
+    def on_word(self, word: str, span: Optional[Tuple[int, int]]):
+        """
+        Called for each word of the current command, with quotes and escapes
+        processed. The first word is the command itself.
+
+        :param word: The word.
+        :type word: str
+        :param span: Where the word was found, including quotes and escapes.
+        :type span: Tuple[int, int]
+        """
+
+    def on_redirect(self, fd: int, op: str, target: str, span: Optional[Tuple[int, int]]):
+        """
+        Called when a file descriptor of the current command is redirected to
+        or from a file.
+
+        :param fd: The file descriptor being redirected.
+        :type fd: int
+        :param op: The redirection operator: ``<``, ``>`` or ``>>``.
+        :type op: str
+        :param target: The name of the file.
+        :type target: str
+        :param span: Where the file name was found.
+        :type span: Tuple[int, int]
+        """
+
+    def on_dup(self, fd: int, src_fd: int):
+        """
+        Called when a file descriptor of the current command is made a copy
+        of another one, as in ``2>&1``.
+
+        :param fd: The file descriptor being replaced.
+        :type fd: int
+        :param src_fd: The file descriptor being copied.
+        :type src_fd: int
+        """
+
+    def on_close(self, fd: int):
+        """
+        Called when a file descriptor of the current command is closed, as
+        in ``2>&-``.
+
+        :param fd: The file descriptor being closed.
+        :type fd: int
+        """
+
+    def on_pipe(self, command_span: Optional[Tuple[int, int]]):
+        """
+        Called when the output of the current command is piped into the
+        next command.
+
+        :param command_span: Where the command that was just finished was
+                             found, from its first word or redirection to its
+                             last.
+        :type command_span: Tuple[int, int]
+        """
+
+    def on_operator(self, op: str):
+        """
+        Called when the current statement is chained to the next one, just
+        before :func:`on_statement_end`.
+
+        :param op: The operator: ``&&`` or ``||``.
+        :type op: str
+        """
+
+    def on_statement_end(self, asynchronous: bool, command_span: Optional[Tuple[int, int]]):
+        """
+        Called at the end of each statement, whether it ends with a
+        terminator (such as ``;``) or with the end of the input.
+
+        :param asynchronous: Whether the statement ended with ``&``, meaning
+                             its last command runs in the background.
+        :type asynchronous: bool
+        :param command_span: Where the last command of the statement was
+                             found, from its first word or redirection to its
+                             last.
+        :type command_span: Tuple[int, int]
+        """
+
+
+class ASTBuilder(ParseHandler):
+    """
+    The handler used by :func:`shell_parser.parser.Parser.parse`, which
+    builds the command AST out of the parse events.
+    """
+
+    def __init__(self):
+        self._cmd_builder = CommandBuilder()
+        self._first_cmd_builder = self._cmd_builder
+        self._prev_cmd_builder: Optional[CommandBuilder] = None
+        self._pipe_first_cmd_builder = self._cmd_builder
+        self._pipe_prev_cmd_builder: Optional[CommandBuilder] = None
+
+    def on_word(self, word: str, span: Optional[Tuple[int, int]]):
+        self._cmd_builder.words.append(_new_word(word, span))
+
+    def on_redirect(self, fd: int, op: str, target: str, span: Optional[Tuple[int, int]]):
+        target_file = _new_file(target, span)
+        if op == "<":
+            descriptor = _new_descriptor(_DESCRIPTOR_READ, _new_file_descriptor(target_file, _REDIRECTION_INPUT))
+        elif op == ">":
+            descriptor = _new_descriptor(_DESCRIPTOR_WRITE, _new_file_descriptor(target_file, _REDIRECTION_OUTPUT))
+        else:
+            descriptor = _new_descriptor(_DESCRIPTOR_WRITE, _new_file_descriptor(target_file, _REDIRECTION_APPEND))
+        self._cmd_builder.descriptors.set_descriptor(fd, descriptor)
+
+    def on_dup(self, fd: int, src_fd: int):
+        self._cmd_builder.descriptors.duplicate_descriptor(src_fd, fd)
+
+    def on_close(self, fd: int):
+        self._cmd_builder.descriptors.close_descriptor(fd)
+
+    def on_pipe(self, command_span: Optional[Tuple[int, int]]):
+        cmd_builder = self._cmd_builder
+        cmd_builder.span = command_span
+        if self._pipe_prev_cmd_builder:
+            self._pipe_prev_cmd_builder.pipe_command = cmd_builder
+        self._pipe_prev_cmd_builder = cmd_builder
+        self._cmd_builder = CommandBuilder()
+
+    def on_operator(self, op: str):
+        if op == "&&":
+            self._pipe_first_cmd_builder.next_command_operator = _OPERATOR_AND
+        else:
+            self._pipe_first_cmd_builder.next_command_operator = _OPERATOR_OR
+
+    def on_statement_end(self, asynchronous: bool, command_span: Optional[Tuple[int, int]]):
+        cmd_builder = self._cmd_builder
+        cmd_builder.span = command_span
+        if asynchronous:
+            cmd_builder.asynchronous = True
+
+        if self._pipe_prev_cmd_builder is not None:
+            self._pipe_prev_cmd_builder.pipe_command = cmd_builder
+            if self._prev_cmd_builder:
+                self._prev_cmd_builder.next_command = self._pipe_first_cmd_builder
+            self._prev_cmd_builder = self._pipe_first_cmd_builder
+        elif self._prev_cmd_builder is not None:
+            self._prev_cmd_builder.next_command = cmd_builder
+            self._prev_cmd_builder = cmd_builder
+        else:
+            self._prev_cmd_builder = cmd_builder
+
+        self._cmd_builder = CommandBuilder()
+        self._pipe_first_cmd_builder = self._cmd_builder
+        self._pipe_prev_cmd_builder = None
+
+    def result(self) -> Command:
+        """
+        :returns: The first command of the statement, once every event has
+                  been received.
+        :rtype: Command
+        """
+        return self._first_cmd_builder._create(True)
+
+    @property
+    def first_command_builder(self) -> CommandBuilder:
+        """
+        :returns: The builder of the first command of the statement. Unlike
+                  :func:`result`, calling its ``create`` method validates
+                  every command of the statement.
+        :rtype: CommandBuilder
+        """
+        return self._first_cmd_builder
+
+
+class _DecodingHandler(ParseHandler):
+    # Passes events on to another handler, decoding words and file names on
+    # the way.
+
+    def __init__(self, handler: ParseHandler, decode: Callable[[str], str]):
+        self._handler = handler
+        self._decode = decode
+        self.on_dup = handler.on_dup
+        self.on_close = handler.on_close
+        self.on_pipe = handler.on_pipe
+        self.on_operator = handler.on_operator
+        self.on_statement_end = handler.on_statement_end
+
+    def on_word(self, word: str, span: Optional[Tuple[int, int]]):
+        self._handler.on_word(self._decode(word), span)
+
+    def on_redirect(self, fd: int, op: str, target: str, span: Optional[Tuple[int, int]]):
+        self._handler.on_redirect(fd, op, self._decode(target), span)
+
+
+__all__ = [
+    "ParseHandler",
+    "ASTBuilder",
+]
@@ -1,14 +1,137 @@
-from typing import Optional
-
-from .ast import Word, File
-from .ast import RedirectionInput, RedirectionOutput, RedirectionAppend, OperatorAnd, OperatorOr
-from .ast import DescriptorRead, DescriptorWrite, CommandFileDescriptor, CommandDescriptor
-from .ast import Command, CommandBuilder
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import lru_cache
+from itertools import islice
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple, Union
+
+from .ast import Command, _DEFAULT_COMMAND_DESCRIPTORS, _new_command, _new_word
+from .ast import BadFileDescriptorException, CommandBuilderCreateException
+from .cache import ParseCache
+from .handler import ParseHandler, ASTBuilder, _DecodingHandler
+from .stats import ParseStats, _CountingASTBuilder
 
 
 WHITESPACE = frozenset((" ", "\t"))
 NUMBERS = frozenset(("0", "1", "2", "3", "4", "5", "6", "7", "8", "9"))
 
+ENGINE_STATE_MACHINE = "state-machine"
+ENGINE_SCANNER = "scanner"
+ENGINES = (ENGINE_STATE_MACHINE, ENGINE_SCANNER)
+
+TOKEN_WORD = "word"
+TOKEN_REDIRECT = "redirect"
+TOKEN_DESCRIPTOR = "descriptor"
+TOKEN_SEMICOLON = "semicolon"
+TOKEN_AMPERSAND = "ampersand"
+TOKEN_AND = "and"
+TOKEN_PIPE = "pipe"
+TOKEN_OR = "or"
+
+# Character classes used by the scanner engine. Anything not listed in the
+# table is an ordinary word character.
+_CLASS_WORD = 0
+_CLASS_SPACE = 1
+_CLASS_ESCAPE = 2
+_CLASS_SINGLE_QUOTE = 3
+_CLASS_DOUBLE_QUOTE = 4
+_CLASS_SEMICOLON = 5
+_CLASS_REDIRECT_OUTPUT = 6
+_CLASS_REDIRECT_INPUT = 7
+_CLASS_AMPERSAND = 8
+_CLASS_PIPE = 9
+_CLASS_DASH = 10
+_CLASS_DIGIT = 11
+
+_CHAR_CLASSES: Dict[str, int] = {
+    " ": _CLASS_SPACE,
+    "\t": _CLASS_SPACE,
+    "\\": _CLASS_ESCAPE,
+    "'": _CLASS_SINGLE_QUOTE,
+    '"': _CLASS_DOUBLE_QUOTE,
+    ";": _CLASS_SEMICOLON,
+    ">": _CLASS_REDIRECT_OUTPUT,
+    "<": _CLASS_REDIRECT_INPUT,
+    "&": _CLASS_AMPERSAND,
+    "|": _CLASS_PIPE,
+    "-": _CLASS_DASH,
+}
+for _digit in NUMBERS:
+    _CHAR_CLASSES[_digit] = _CLASS_DIGIT
+del _digit
+
+# Once a word has been started, digits and dashes lose their special meaning,
+# so a run of word characters only stops at whitespace, quotes, escapes and
+# operators.
+_WORD_RUN = re.compile(r"[^ \t'\"\\;<>&|]+")
+_SPACE_RUN = re.compile(r"[ \t]+")
+_DIGIT_RUN = re.compile(r"[0-9]+")
+_DOUBLE_QUOTED_RUN = re.compile(r'[^"\\]+')
+_NON_SPACE_RUN = re.compile(r"[^ \t]+")
+# Matches anything that stops a statement from being a plain run of words
+# separated by spaces and tabs: quotes, escapes, operators, and any other
+# whitespace, which str.split() would treat as a separator but the grammar
+# doesn't.
+_METACHARS = re.compile(r"[\\'\";<>&|]|[^\S \t]")
+
+# The whitespace bytes.strip() removes. parse_bytes() strips the same from its
+# latin-1 view, where str.strip() would also remove b"\x85" and b"\xa0".
+_ASCII_WHITESPACE = " \t\n\r\x0b\x0c"
+
+# Every character with a meaning in the grammar. parse_bytes() only accepts
+# encodings that decode these bytes to the same characters, wherever they
+# appear.
+_GRAMMAR_CHARS = " \t\n'\"\\;<>&|-0123456789"
+
+
+class Token(NamedTuple):
+    """
+    A single token produced by :func:`tokenize`.
+    """
+
+    #: One of the ``TOKEN_*`` constants.
+    kind: str
+    #: The offset of the first character of the token.
+    start: int
+    #: The offset just past the last character of the token.
+    end: int
+    #: For words, the word with quotes and escapes processed. For everything
+    #: else, the source text of the token (eg. ``2`` or ``>&``).
+    value: str
+
+
+class Diagnostic(NamedTuple):
+    """
+    A single failure found by :func:`Parser.parse_with_diagnostics`.
+    """
+
+    #: The exception class :func:`Parser.parse` would have raised.
+    exception_class: type
+    #: The exception message.
+    message: str
+    #: The position of the failure in the statement with leading whitespace
+    #: stripped, as for :attr:`ParserFailure.pos`. ``None`` for failures that
+    #: have no position, such as an empty statement or a bad file descriptor.
+    pos: Optional[int]
+
+
+class ParseResult(NamedTuple):
+    """
+    The outcome of :func:`Parser.parse_with_diagnostics`: either the parsed
+    command, or every failure found in the statement.
+    """
+
+    #: The parsed command, or ``None`` if any failures were found.
+    command: Optional[Command]
+    #: The failures found, in the order they appear in the statement.
+    diagnostics: Tuple[Diagnostic, ...]
+
+    @property
+    def ok(self) -> bool:
+        return self.command is not None
+
 
 def isdigit(s: str) -> bool:
     for char in s:
@@ -17,12 +140,187 @@ def isdigit(s: str) -> bool:
     return True
 
 
+def _scan_single_quoted(statement: str, pos: int, end: int) -> Tuple[str, int]:
+    # Everything up to the closing quote is taken literally. Returns the
+    # quoted text, and the position just past the closing quote.
+    close = statement.find("'", pos + 1, end)
+    if close == -1:
+        raise UnclosedQuoteParserFailure("End of statement reached with open quote.", pos=end)
+    return statement[pos + 1:close], close + 1
+
+
+def _scan_double_quoted(statement: str, pos: int, end: int) -> Tuple[str, int]:
+    # A backslash only escapes a following double quote or dollar sign, and
+    # is otherwise kept. Returns the quoted text, and the position just past
+    # the closing quote.
+    quoted = ""
+    escaped = False
+    pos += 1
+    while True:
+        match = _DOUBLE_QUOTED_RUN.match(statement, pos, end)
+        if match is not None:
+            chunk = match.group()
+            if escaped and chunk[0] != "$":
+                quoted += "\\"
+            quoted += chunk
+            escaped = False
+            pos = match.end()
+        if pos >= end:
+            raise UnclosedQuoteParserFailure("End of statement reached with open quote.", pos=end)
+        pos += 1
+        if statement[pos - 1] == "\\":
+            escaped = True
+        elif escaped:
+            quoted += '"'
+            escaped = False
+        else:
+            return quoted, pos
+
+
+def _resync(statement: str, pos: int) -> Optional[int]:
+    # Skips ahead to the next statement terminator at or after pos, stepping
+    # over escaped characters, quoted strings and redirection operators.
+    # Returns the position just past the terminator, or None if there isn't
+    # one.
+    statement_len = len(statement)
+    while pos < statement_len:
+        char = statement[pos]
+        if char == "\\":
+            # A backslash escapes the next character, and an escaped
+            # backslash escapes the one after it.
+            pos += 1
+            while pos < statement_len and statement[pos] == "\\":
+                pos += 1
+            pos += 1
+        elif char == "'":
+            _, pos = _scan_single_quoted(statement, pos, statement_len)
+        elif char == '"':
+            _, pos = _scan_double_quoted(statement, pos, statement_len)
+        elif char == ">" or char == "<":
+            pos += 1
+            if char == ">" and pos < statement_len and statement[pos] == ">":
+                pos += 1
+            if pos < statement_len and statement[pos] == "&":
+                pos += 1
+        elif char == ";":
+            return pos + 1
+        elif char == "&" or char == "|":
+            if pos + 1 < statement_len and statement[pos + 1] == char:
+                return pos + 2
+            return pos + 1
+        else:
+            pos += 1
+    return None
+
+
+def _is_ascii_compatible(encoding: str) -> bool:
+    # Every ASCII byte must decode to itself, and no byte may combine with a
+    # grammar byte after it into a single character, as the trail bytes of
+    # Shift_JIS, Big5 or GBK can. Invalid sequences are replaced rather than
+    # rejected, so that a decoder swallowing the grammar byte shows up.
+    ascii_bytes = bytes(range(0x80))
+    try:
+        if ascii_bytes.decode(encoding) != ascii_bytes.decode("ascii"):
+            return False
+        for grammar_byte in _GRAMMAR_CHARS.encode("ascii"):
+            grammar_char = chr(grammar_byte)
+            for lead_byte in range(0x100):
+                if not bytes((lead_byte, grammar_byte)).decode(encoding, "replace").endswith(grammar_char):
+                    return False
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+@lru_cache(maxsize=None)
+def _word_decoder(encoding: str, errors: str) -> Callable[[str], str]:
+    # parse_bytes() scans a latin-1 view of the input, in which every byte is
+    # one character. Returns a function that decodes the finished words and
+    # file names from that view using the real encoding. Plain ASCII is the
+    # same in both, so only words containing other bytes need decoding.
+    if not _is_ascii_compatible(encoding):
+        raise UnsupportedEncodingException("Encoding '{0}' is not ASCII-compatible.".format(encoding))
+
+    def decode(word: str) -> str:
+        if word.isascii():
+            return word
+        return word.encode("latin-1").decode(encoding, errors)
+
+    return decode
+
+
+def _end_redirect(
+        handler: ParseHandler,
+        word: str,
+        redirect_mode: str,
+        fd: int,
+        modifying_descriptor: bool,
+        pos: int,
+        span: Optional[Tuple[int, int]],
+    ):
+    if not word:
+        raise EmptyRedirectParserFailure("No redirect filename provided.", pos=pos)
+
+    if modifying_descriptor:
+        if word == "-":
+            handler.on_close(fd)
+        elif isdigit(word):
+            handler.on_dup(fd, int(word))
+        else:
+            raise AmbiguousRedirectParserFailure("", pos=pos)
+        return
+
+    handler.on_redirect(fd, redirect_mode, word, span)
+
+
 class Parser(object):
     """
     The main parser class, responsible for taking in the command line string
     and outputting the command AST.
     """
 
+    def __init__(
+            self,
+            engine: str = ENGINE_STATE_MACHINE,
+            cache: Optional[ParseCache] = None,
+            spans: bool = True,
+            stats: Optional[ParseStats] = None,
+        ):
+        """
+        :param engine: The parsing engine to use. Either
+                       :data:`ENGINE_STATE_MACHINE` (the default), which steps
+                       through the input one character at a time, or
+                       :data:`ENGINE_SCANNER`, which uses precompiled
+                       character-class tables and regular expressions to
+                       consume runs of characters in a single step. Both
+                       engines produce identical results.
+        :type engine: str
+        :param cache: An optional cache of parse results. Statements found in
+                      the cache are not parsed again, and statements that
+                      previously failed to parse raise the same failure again.
+                      Either a :class:`shell_parser.cache.ParseCache`, or a
+                      :class:`shell_parser.disk_cache.DiskParseCache` to keep
+                      results across restarts. Entries are keyed on the
+                      statement alone, so parsers sharing a cache must use
+                      the same ``spans`` setting.
+        :type cache: shell_parser.cache.ParseCache
+        :param spans: Whether to record where each word, redirect target and
+                      command was found in the input, as ``(start, end)``
+                      offsets into the statement passed to :func:`parse`.
+                      Turning this off saves a little memory per node.
+        :type spans: bool
+        :param stats: Optional counters to update with the work done by
+                      every statement parsed. Parsing takes a slower,
+                      instrumented path when this is given.
+        :type stats: shell_parser.stats.ParseStats
+        """
+        if engine not in ENGINES:
+            raise UnknownParserEngineException("Unknown parser engine '{0}'.".format(engine))
+        self.engine = engine
+        self.cache = cache
+        self.spans = spans
+        self.stats = stats
+
     def parse(self, statement: str) -> Command:
         """
         Parses the command line string.
@@ -33,19 +331,373 @@ class Parser(object):
         :rtype: Command
         """
 
+        cache = self.cache
+        if cache is None:
+            return self._parse(statement)
+
+        result = cache.get(statement)
+        if result is None:
+            try:
+                result = self._parse(statement)
+            except _STATEMENT_FAILURES as e:
+                cache.put(statement, e)
+                raise
+            cache.put(statement, result)
+        elif isinstance(result, Exception):
+            raise result
+        return result
+
+    def validate(self, statement: str):
+        """
+        Checks that the command line string is valid, without building any
+        commands. This runs every check :func:`parse` does, and raises the
+        same exception :func:`parse` would for an invalid statement.
+
+        :param statement: The full command-line string to be checked.
+        :type statement: str
+        """
+
         statement = statement.strip()
-        statement_len = len(statement)
-        if statement_len == 0:
+        if len(statement) == 0:
             raise EmptyInputException("Input statement was empty or contained only whitespace.")
+        if _METACHARS.search(statement) is not None:
+            _validate(statement)
+
+    def parse_events(self, statement: str, handler: ParseHandler):
+        """
+        Parses the command line string, passing each part of it to the handler
+        as it is found instead of building a command AST. This is how
+        :func:`parse` works internally, with a
+        :class:`shell_parser.handler.ASTBuilder` as the handler.
+
+        If the statement is invalid, the handler receives the events for the
+        part of the statement before the failure, and then the same exception
+        :func:`parse` would raise is raised. The parser's cache is not used.
+
+        :param statement: The full command-line string to be parsed.
+        :type statement: str
+        :param handler: The handler to pass the events to.
+        :type handler: shell_parser.handler.ParseHandler
+        """
 
+        lead = len(statement) - len(statement.lstrip())
+        statement = statement.strip()
+        if len(statement) == 0:
+            raise EmptyInputException("Input statement was empty or contained only whitespace.")
+        self._feed(statement, lead, handler)
+
+    def parse_bytes(
+            self,
+            statement: Union[bytes, bytearray, memoryview],
+            encoding: str = "utf-8",
+            errors: str = "strict",
+        ) -> Command:
+        """
+        Parses a command line held as bytes, such as a line read from a shell
+        history file or an audit log, without decoding it up front.
+
+        The input is scanned with the :data:`ENGINE_SCANNER` grammar directly,
+        and only the finished words and file names are decoded, so lines that
+        are mostly ASCII cost next to nothing to decode. Leading and trailing
+        ASCII whitespace is ignored. Spans are byte offsets into
+        ``statement``. The parser's cache is not used.
+
+        :param statement: The full command-line to be parsed.
+        :type statement: Union[bytes, bytearray, memoryview]
+        :param encoding: The encoding used to decode words and file names.
+                         This must be an ASCII-compatible encoding, in which
+                         ASCII bytes always stand for themselves, such as
+                         UTF-8, Latin-1 or a Windows code page. Multi-byte
+                         encodings whose characters may contain ASCII bytes,
+                         such as Shift_JIS, Big5 or GBK, are rejected.
+        :type encoding: str
+        :param errors: The error handling scheme used when a word cannot be
+                       decoded, as for :meth:`bytes.decode`. With the default,
+                       ``"strict"``, a :class:`UnicodeDecodeError` is raised.
+        :type errors: str
+        :returns: A fully processed Command AST object.
+        :rtype: Command
+        """
+
+        decode = _word_decoder(encoding, errors)
+        # Works on a latin-1 view of the input, in which every byte is one
+        # character, decoded straight from the buffer without copying it.
+        view = str(statement, "latin-1")
+        stripped = view.strip(_ASCII_WHITESPACE)
+        if len(stripped) == 0:
+            raise EmptyInputException("Input statement was empty or contained only whitespace.")
+        lead = len(view) - len(view.lstrip(_ASCII_WHITESPACE))
+        if stripped.isascii():
+            # ASCII reads the same in every accepted encoding.
+            decode = None
+
+        if _METACHARS.search(stripped) is None:
+            return self._parse_plain(stripped, lead, decode)
+        handler = ASTBuilder()
+        self._parse_scanner(stripped, lead, handler if decode is None else _DecodingHandler(handler, decode))
+        return handler.result()
+
+    def parse_with_diagnostics(self, statement: str) -> ParseResult:
+        """
+        Parses the command line string, reporting failures instead of raising
+        them.
+
+        After a failure, parsing resumes after the next statement terminator
+        (``;``, ``&``, ``&&``, ``|`` or ``||``), so a single call reports
+        every failure in a multi-statement input. The first diagnostic always
+        describes the exception :func:`parse` would have raised. Failures
+        without a position, such as duplicating a file descriptor that doesn't
+        exist, end the search. The parser's cache is not used.
+
+        Valid statements cost about as much as with :func:`parse`. Malformed
+        ones cost more: each failure is still raised inside the parser and
+        caught here, and parsing carries on after it. When only the first
+        failure matters, catching the exception raised by :func:`parse` is
+        faster.
+
+        :param statement: The full command-line string to be parsed.
+        :type statement: str
+        :returns: The parsed command, or the diagnostics for every failure
+                  found.
+        :rtype: ParseResult
+        """
+
+        try:
+            return ParseResult(self._parse(statement), ())
+        except _STATEMENT_FAILURES as e:
+            failure = e
+
+        stripped = statement.strip()
+        diagnostics: List[Diagnostic] = []
+        offset = 0
+        while True:
+            if not isinstance(failure, ParserFailure):
+                diagnostics.append(Diagnostic(failure.__class__, str(failure), None))
+                break
+            pos = failure.pos + offset
+            diagnostics.append(Diagnostic(failure.__class__, str(failure), pos))
+
+            try:
+                resume = _resync(stripped, pos)
+            except UnclosedQuoteParserFailure as e:
+                diagnostics.append(Diagnostic(e.__class__, str(e), e.pos))
+                break
+            if resume is None:
+                break
+            remainder = stripped[resume:]
+            offset = len(stripped) - len(remainder.lstrip())
+            if offset == len(stripped):
+                break
+            try:
+                self._parse(remainder)
+                break
+            except _STATEMENT_FAILURES as e:
+                failure = e
+
+        return ParseResult(None, tuple(diagnostics))
+
+    def _parse(self, statement: str) -> Command:
+        if self.stats is not None:
+            return self._parse_instrumented(statement)
+
+        # Spans are reported against the statement as given, so remember how
+        # much leading whitespace is stripped off.
+        lead = len(statement) - len(statement.lstrip())
+        statement = statement.strip()
+        if len(statement) == 0:
+            raise EmptyInputException("Input statement was empty or contained only whitespace.")
+
+        if _METACHARS.search(statement) is None:
+            return self._parse_plain(statement, lead)
+        handler = ASTBuilder()
+        if self.engine == ENGINE_SCANNER:
+            self._parse_scanner(statement, lead, handler)
+        else:
+            self._parse_state_machine(statement, lead, handler)
+        return handler.result()
+
+    def _parse_instrumented(self, statement: str) -> Command:
+        counts = {"statements": 1}
+        handler = _CountingASTBuilder()
+        lead = len(statement) - len(statement.lstrip())
+        statement = statement.strip()
+        _count_chars(statement, counts)
+
+        scan_start = time.perf_counter_ns()
+        create_start = None
+        try:
+            if len(statement) == 0:
+                raise EmptyInputException("Input statement was empty or contained only whitespace.")
+            self._feed(statement, lead, handler)
+            create_start = time.perf_counter_ns()
+            return handler.result()
+        except Exception:
+            counts["failures"] = 1
+            raise
+        finally:
+            end = time.perf_counter_ns()
+            if create_start is None:
+                counts["scan_ns"] = end - scan_start
+            else:
+                counts["scan_ns"] = create_start - scan_start
+                counts["create_ns"] = end - create_start
+            handler.count(counts)
+            self.stats.add(counts)
+
+    def _feed(self, statement: str, lead: int, handler: ParseHandler):
+        # Sends the events for a stripped, non-empty statement to the handler.
+        if _METACHARS.search(statement) is None:
+            record_spans = self.spans
+            on_word = handler.on_word
+            for match in _NON_SPACE_RUN.finditer(statement):
+                on_word(match.group(), (match.start() + lead, match.end() + lead) if record_spans else None)
+            handler.on_statement_end(False, (lead, lead + len(statement)) if record_spans else None)
+        elif self.engine == ENGINE_SCANNER:
+            self._parse_scanner(statement, lead, handler)
+        else:
+            self._parse_state_machine(statement, lead, handler)
+
+    def _parse_plain(self, statement: str, lead: int, decode: Optional[Callable[[str], str]] = None) -> Command:
+        # Without any quotes, escapes or operators, a statement is a single
+        # command made up of whitespace-separated words. parse_bytes() passes
+        # the function decoding the words of its latin-1 view.
+        if not self.spans:
+            if decode is None:
+                words = [_new_word(word, None) for word in statement.split()]
+            else:
+                words = [_new_word(decode(word), None) for word in statement.split()]
+            span = None
+        else:
+            if decode is None:
+                words = [
+                    _new_word(match.group(), (match.start() + lead, match.end() + lead))
+                    for match in _NON_SPACE_RUN.finditer(statement)
+                ]
+            else:
+                words = [
+                    _new_word(decode(match.group()), (match.start() + lead, match.end() + lead))
+                    for match in _NON_SPACE_RUN.finditer(statement)
+                ]
+            span = (lead, lead + len(statement))
+        return _new_command(words[0], _DEFAULT_COMMAND_DESCRIPTORS, tuple(words[1:]), None, None, None, False, span)
+
+    def parse_many(
+            self,
+            statements: Iterable[str],
+            *,
+            workers: Optional[int] = None,
+            chunksize: int = 512,
+        ) -> Iterator[Union[Command, Exception]]:
+        """
+        Parses many command line strings, spreading the work over a pool of
+        worker processes. Results are yielded in the same order as the input
+        statements.
+
+        Statements that cannot be parsed do not abort the batch. Instead, the
+        exception that :func:`parse` would have raised (an
+        :class:`EmptyInputException`, a :class:`ParserFailure`, or one of the
+        exceptions raised by the AST builders for invalid descriptors) is
+        yielded in place of the command.
+
+        If the parser has :class:`shell_parser.stats.ParseStats`, every worker
+        process counts the statements it parses, and the counts are added to
+        the parser's statistics as each chunk of results comes back. If it
+        has a cache, statements are looked up in it before a chunk is sent to
+        a worker process, and the results parsed by the workers are added to
+        it.
+
+        :param statements: The command line strings to be parsed. This may be
+                           a lazy iterable; it is consumed one chunk at a time.
+        :type statements: Iterable[str]
+        :param workers: The number of worker processes to use. Defaults to the
+                        number of CPUs on the machine. When set to ``1``, all
+                        parsing happens in the current process.
+        :type workers: int
+        :param chunksize: The number of statements sent to a worker process
+                          in one go.
+        :type chunksize: int
+        :returns: An iterator over the parsed commands and parsing failures.
+        :rtype: Iterator[Union[Command, Exception]]
+        """
+
+        if chunksize < 1:
+            raise ValueError("chunksize must be >= 1")
+        if workers is None:
+            workers = os.cpu_count() or 1
+
+        if workers <= 1:
+            return (_parse_one(self, statement) for statement in statements)
+        return self._parse_many_parallel(iter(statements), workers, chunksize)
+
+    def _parse_many_parallel(
+            self,
+            statements_iter: Iterator[str],
+            workers: int,
+            chunksize: int,
+        ) -> Iterator[Union[Command, Exception]]:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # Keep a bounded number of chunks in flight, so that arbitrarily
+            # large inputs can be streamed through without being read into
+            # memory all at once.
+            pending: Deque[Tuple[List[str], List[Union[None, Command, Exception]], Optional[Future]]] = deque()
+            collect_stats = self.stats is not None
+            cache = self.cache
+            while True:
+                chunk = list(islice(statements_iter, chunksize))
+                if not chunk:
+                    break
+                # Statements found in the cache are answered here, and only
+                # the rest are sent to a worker.
+                if cache is None:
+                    cached: List[Union[None, Command, Exception]] = [None] * len(chunk)
+                    misses = chunk
+                else:
+                    cached = [cache.get(statement) for statement in chunk]
+                    misses = [statement for statement, result in zip(chunk, cached) if result is None]
+                future = None
+                if misses:
+                    future = executor.submit(_parse_chunk, self.engine, self.spans, collect_stats, misses)
+                pending.append((chunk, cached, future))
+                if len(pending) >= workers * 2:
+                    yield from self._chunk_results(*pending.popleft())
+            while pending:
+                yield from self._chunk_results(*pending.popleft())
+
+    def _chunk_results(
+            self,
+            chunk: List[str],
+            cached: List[Union[None, Command, Exception]],
+            future: Optional[Future],
+        ) -> List[Union[Command, Exception]]:
+        if future is None:
+            return cached
+        results, counts = future.result()
+        if counts is not None:
+            self.stats.add(counts)
+        if len(results) == len(chunk):
+            parsed = results
+        else:
+            parsed_iter = iter(results)
+            parsed = [next(parsed_iter) if result is None else result for result in cached]
+        cache = self.cache
+        if cache is not None:
+            for statement, result, cached_result in zip(chunk, parsed, cached):
+                if cached_result is None:
+                    cache.put(statement, result)
+        return parsed
+
+    def _parse_state_machine(self, statement: str, lead: int, handler: ParseHandler):
+        statement_len = len(statement)
         pos = 0
         cur_word = ""
-
-        cmd_builder = CommandBuilder()
-        first_cmd_builder: CommandBuilder = cmd_builder
-        prev_cmd_builder: Optional[CommandBuilder] = None
-        pipe_first_cmd_builder: CommandBuilder = cmd_builder
-        pipe_prev_cmd_builder: Optional[CommandBuilder] = None
+        record_spans = self.spans
+        # Where the word being read started, and where the command being
+        # read started and last consumed a word or redirect target.
+        word_start: Optional[int] = None
+        cmd_start: Optional[int] = None
+        cmd_end: Optional[int] = None
+        redirect_start: Optional[int] = None
+        cmd_has_words = False
 
         prev_char: Optional[str] = None
         quote_mode: Optional[str] = None
@@ -57,9 +709,23 @@ class Parser(object):
         modifying_descriptor = False
 
         def WRITE_CHAR(char: str):
-            nonlocal cur_word
+            nonlocal cur_word, word_start
+            if word_start is None:
+                word_start = pos
             cur_word += char
 
+        def SPAN(start: int, end: int) -> Optional[Tuple[int, int]]:
+            if not record_spans:
+                return None
+            return (start + lead, end + lead)
+
+        def EXTEND_CMD(start: int, end: Optional[int]):
+            nonlocal cmd_start, cmd_end
+            if cmd_start is None:
+                cmd_start = start
+            if end is not None:
+                cmd_end = end
+
         def NEXT_CHAR(*, fail_if_end: bool = True) -> Optional[str]:
             next_char: Optional[str]
             try:
@@ -72,36 +738,16 @@ class Parser(object):
             else:
                 return next_char
 
-        def END_WORD():
-            nonlocal cur_word, was_quote_mode, cmd_builder, redirect_mode, current_descriptor, modifying_descriptor
+        def END_WORD(end: int):
+            nonlocal cur_word, word_start, was_quote_mode, redirect_mode, current_descriptor
+            nonlocal modifying_descriptor, cmd_has_words
+            start = end if word_start is None else word_start
+            word_start = None
             if redirect_mode is not None:
-                if not cur_word:
-                    raise EmptyRedirectParserFailure("No redirect filename provided.", pos=pos)
-                if redirect_mode == "<":
-                    descriptor_mode = DescriptorRead()
-                    redirect_operator = RedirectionInput()
-                elif redirect_mode == ">":
-                    descriptor_mode = DescriptorWrite()
-                    redirect_operator = RedirectionOutput()
-                elif redirect_mode == ">>":
-                    descriptor_mode = DescriptorWrite()
-                    redirect_operator = RedirectionAppend()
-                if modifying_descriptor:
-                    if cur_word == "-":
-                        cmd_builder.descriptors.close_descriptor(current_descriptor)
-                    elif isdigit(cur_word):
-                        cmd_builder.descriptors.duplicate_descriptor(int(cur_word), current_descriptor)
-                    else:
-                        raise AmbiguousRedirectParserFailure("", pos=pos)
-                else:
-                    descriptor = CommandDescriptor(
-                        mode=descriptor_mode,
-                        descriptor=CommandFileDescriptor(
-                            target=File(cur_word),
-                            operator=redirect_operator,
-                        ),
-                    )
-                    cmd_builder.descriptors.set_descriptor(current_descriptor, descriptor)
+                _end_redirect(
+                    handler, cur_word, redirect_mode, current_descriptor, modifying_descriptor, pos, SPAN(start, end),
+                )
+                EXTEND_CMD(start, end)
 
                 cur_word = ""
                 redirect_mode = None
@@ -109,28 +755,27 @@ class Parser(object):
                 modifying_descriptor = False
             else:
                 if cur_word or was_quote_mode:
-                    cmd_builder.words.append(Word(cur_word))
+                    handler.on_word(cur_word, SPAN(start, end))
+                    cmd_has_words = True
+                    EXTEND_CMD(start, end)
                     cur_word = ""
 
+        def END_CMD() -> Optional[Tuple[int, int]]:
+            nonlocal cmd_start, cmd_end, cmd_has_words
+            span = None
+            if cmd_start is not None and cmd_end is not None:
+                span = SPAN(cmd_start, cmd_end)
+            cmd_start = None
+            cmd_end = None
+            cmd_has_words = False
+            return span
+
         def END_CMDARGS():
             nonlocal was_quote_mode
             was_quote_mode = False
 
-        def END_STMT():
-            nonlocal cmd_builder, prev_cmd_builder, pipe_first_cmd_builder, pipe_prev_cmd_builder
-            if pipe_prev_cmd_builder is not None:
-                pipe_prev_cmd_builder.pipe_command = cmd_builder
-                if prev_cmd_builder:
-                    prev_cmd_builder.next_command = pipe_first_cmd_builder
-                prev_cmd_builder = pipe_first_cmd_builder
-            elif prev_cmd_builder is not None:
-                prev_cmd_builder.next_command = cmd_builder
-                prev_cmd_builder = cmd_builder
-            else:
-                prev_cmd_builder = cmd_builder
-            cmd_builder = CommandBuilder()
-            pipe_first_cmd_builder = cmd_builder
-            pipe_prev_cmd_builder = None
+        def END_STMT(asynchronous: bool = False):
+            handler.on_statement_end(asynchronous, END_CMD())
 
         while pos < statement_len:
             char = statement[pos]
@@ -169,22 +814,26 @@ class Parser(object):
                 else:
                     quote_mode = char
                     was_quote_mode = True
+                    if word_start is None:
+                        word_start = pos
 
             elif char == "\\":
                 if prev_char == "\\":
                     WRITE_CHAR(char)
+                elif word_start is None:
+                    word_start = pos
 
             elif char == ";":
                 if prev_char == "\\":
                     WRITE_CHAR(char)
                 else:
-                    if len(cmd_builder.words) == 0 and not cur_word:
+                    if not cmd_has_words and not cur_word:
                         raise EmptyStatementParserFailure(
                             "Statement terminator found without any preceding statement.",
                             pos=pos,
                         )
 
-                    END_WORD()
+                    END_WORD(pos)
                     END_CMDARGS()
 
                     END_STMT()
@@ -200,8 +849,13 @@ class Parser(object):
                             pos=pos,
                         )
 
-                    END_WORD()
+                    # A redirection starts at its descriptor number, if any.
+                    if redirect_start is None:
+                        redirect_start = pos
+                    END_WORD(redirect_start)
                     was_quote_mode = False
+                    EXTEND_CMD(redirect_start, None)
+                    redirect_start = None
 
                     if current_descriptor is None:
                         current_descriptor = 1
@@ -237,8 +891,13 @@ class Parser(object):
                             pos=pos,
                         )
 
-                    END_WORD()
+                    # A redirection starts at its descriptor number, if any.
+                    if redirect_start is None:
+                        redirect_start = pos
+                    END_WORD(redirect_start)
                     was_quote_mode = False
+                    EXTEND_CMD(redirect_start, None)
+                    redirect_start = None
 
                     if current_descriptor is None:
                         current_descriptor = 0
@@ -258,58 +917,54 @@ class Parser(object):
                 if prev_char == "\\":
                     WRITE_CHAR(char)
                 else:
-                    if len(cmd_builder.words) == 0 and not cur_word:
+                    if not cmd_has_words and not cur_word:
                         raise EmptyStatementParserFailure(
                             "Statement terminator found without any preceding statement.",
                             pos=pos,
                         )
 
-                    END_WORD()
+                    END_WORD(pos)
                     END_CMDARGS()
 
                     next_char = NEXT_CHAR()
                     if next_char == "&":
-                        pipe_first_cmd_builder.next_command_operator = OperatorAnd()
+                        handler.on_operator("&&")
                         pos += 1
                         expecting_new_statement = True
+                        END_STMT()
                     else:
-                        cmd_builder.asynchronous = True
-
-                    END_STMT()
+                        END_STMT(asynchronous=True)
                     just_terminated = True
 
             elif char == "|":
                 if prev_char == "\\":
                     WRITE_CHAR(char)
                 else:
-                    if len(cmd_builder.words) == 0 and not cur_word:
+                    if not cmd_has_words and not cur_word:
                         raise EmptyStatementParserFailure(
                             "Statement terminator found without any preceding statement.",
                             pos=pos,
                         )
 
-                    END_WORD()
+                    END_WORD(pos)
                     END_CMDARGS()
 
                     next_char = NEXT_CHAR()
                     if next_char == "|":
-                        pipe_first_cmd_builder.next_command_operator = OperatorOr()
+                        handler.on_operator("||")
                         pos += 1
                         END_STMT()
                         just_terminated = True
                         expecting_new_statement = True
                     else:
-                        if pipe_prev_cmd_builder:
-                            pipe_prev_cmd_builder.pipe_command = cmd_builder
-                        pipe_prev_cmd_builder = cmd_builder
-                        cmd_builder = CommandBuilder()
+                        handler.on_pipe(END_CMD())
 
             elif char == "-":
                 if prev_char == "\\":
                     WRITE_CHAR(char)
                 elif modifying_descriptor and not cur_word:
                     WRITE_CHAR(char)
-                    END_WORD()
+                    END_WORD(pos + 1)
                 else:
                     WRITE_CHAR(char)
 
@@ -318,15 +973,19 @@ class Parser(object):
                     WRITE_CHAR(char)
                 elif not cur_word and redirect_mode is None:
                     possible_descriptor = char
+                    descriptor_start = pos
                     next_char = NEXT_CHAR(fail_if_end=False)
                     pos += 1
                     while True:
                         if next_char == ">" or next_char == "<":
                             current_descriptor = int(possible_descriptor)
+                            redirect_start = descriptor_start
                             break
                         elif next_char in NUMBERS:
                             possible_descriptor += next_char
                         else:
+                            if word_start is None:
+                                word_start = descriptor_start
                             WRITE_CHAR(possible_descriptor)
                             break
                         next_char = NEXT_CHAR(fail_if_end=False)
@@ -339,7 +998,7 @@ class Parser(object):
                 if prev_char == "\\":
                     WRITE_CHAR(char)
                 else:
-                    END_WORD()
+                    END_WORD(pos)
                     was_quote_mode = False
 
             else:
@@ -355,11 +1014,752 @@ class Parser(object):
             if expecting_new_statement:
                 raise EmptyStatementParserFailure("Follow-on statement not found.", pos=pos)
         else:
-            END_WORD()
+            END_WORD(pos)
             END_CMDARGS()
             END_STMT()
 
-        return first_cmd_builder.create()
+    def _parse_scanner(self, statement: str, lead: int, handler: ParseHandler):
+        statement_len = len(statement)
+        char_classes = _CHAR_CLASSES
+        word_run = _WORD_RUN.match
+        space_run = _SPACE_RUN.match
+        digit_run = _DIGIT_RUN.match
+
+        pos = 0
+        cur_word = ""
+        record_spans = self.spans
+        word_start: Optional[int] = None
+        cmd_start: Optional[int] = None
+        cmd_end: Optional[int] = None
+        redirect_start: Optional[int] = None
+        span: Optional[Tuple[int, int]] = None
+        cmd_span: Optional[Tuple[int, int]] = None
+        on_word = handler.on_word
+        has_words = False
+
+        escaped = False
+        was_quote_mode = False
+        redirect_mode: Optional[str] = None
+        just_terminated = False
+        expecting_new_statement = False
+        current_descriptor: Optional[int] = None
+        modifying_descriptor = False
+        end_statement = False
+        asynchronous = False
+
+        while pos < statement_len:
+            char = statement[pos]
+            char_class = char_classes.get(char, _CLASS_WORD)
+            if just_terminated and char_class != _CLASS_SPACE:
+                just_terminated = False
+                expecting_new_statement = False
+
+            if escaped:
+                # An escaped character is always taken literally, including
+                # another backslash, which in turn escapes the next character.
+                cur_word += char
+                escaped = char_class == _CLASS_ESCAPE
+                pos += 1
+                continue
+
+            if char_class == _CLASS_WORD:
+                if word_start is None:
+                    word_start = pos
+                match = word_run(statement, pos)
+                cur_word += match.group()
+                pos = match.end()
+                continue
+
+            if char_class == _CLASS_SPACE:
+                if record_spans:
+                    span = (lead + (pos if word_start is None else word_start), lead + pos)
+                if redirect_mode is not None:
+                    _end_redirect(handler, cur_word, redirect_mode, current_descriptor, modifying_descriptor, pos, span)
+                    cur_word = ""
+                    redirect_mode = None
+                    current_descriptor = None
+                    modifying_descriptor = False
+                    cmd_end = pos
+                elif cur_word or was_quote_mode:
+                    on_word(cur_word, span)
+                    has_words = True
+                    cur_word = ""
+                    if cmd_start is None:
+                        cmd_start = pos if word_start is None else word_start
+                    cmd_end = pos
+                word_start = None
+                was_quote_mode = False
+                pos = space_run(statement, pos).end()
+                continue
+
+            if char_class == _CLASS_ESCAPE:
+                if word_start is None:
+                    word_start = pos
+                escaped = True
+                pos += 1
+                continue
+
+            if char_class == _CLASS_SINGLE_QUOTE:
+                was_quote_mode = True
+                if word_start is None:
+                    word_start = pos
+                quoted, pos = _scan_single_quoted(statement, pos, statement_len)
+                cur_word += quoted
+                continue
+
+            if char_class == _CLASS_DOUBLE_QUOTE:
+                was_quote_mode = True
+                if word_start is None:
+                    word_start = pos
+                quoted, pos = _scan_double_quoted(statement, pos, statement_len)
+                cur_word += quoted
+                continue
+
+            if char_class == _CLASS_DIGIT:
+                if cur_word or redirect_mode is not None:
+                    if word_start is None:
+                        word_start = pos
+                    match = word_run(statement, pos)
+                    cur_word += match.group()
+                    pos = match.end()
+                    continue
+                end = digit_run(statement, pos).end()
+                if end < statement_len and statement[end] in "<>":
+                    current_descriptor = int(statement[pos:end])
+                    redirect_start = pos
+                else:
+                    cur_word = statement[pos:end]
+                    if word_start is None:
+                        word_start = pos
+                pos = end
+                continue
+
+            if char_class == _CLASS_DASH:
+                if modifying_descriptor and not cur_word:
+                    _end_redirect(handler, "-", redirect_mode, current_descriptor, modifying_descriptor, pos, None)
+                    redirect_mode = None
+                    current_descriptor = None
+                    modifying_descriptor = False
+                    word_start = None
+                    pos += 1
+                    cmd_end = pos
+                else:
+                    if word_start is None:
+                        word_start = pos
+                    match = word_run(statement, pos)
+                    cur_word += match.group()
+                    pos = match.end()
+                continue
+
+            if char_class == _CLASS_REDIRECT_OUTPUT or char_class == _CLASS_REDIRECT_INPUT:
+                if redirect_mode is not None and (char_class == _CLASS_REDIRECT_INPUT or not cur_word):
+                    raise EmptyRedirectParserFailure("No redirect filename provided.", pos=pos)
+
+                # A redirection starts at its descriptor number, if any.
+                if redirect_start is None:
+                    redirect_start = pos
+                if record_spans:
+                    span = (lead + (redirect_start if word_start is None else word_start), lead + redirect_start)
+                if redirect_mode is not None:
+                    _end_redirect(handler, cur_word, redirect_mode, current_descriptor, modifying_descriptor, pos, span)
+                    cur_word = ""
+                    current_descriptor = None
+                    modifying_descriptor = False
+                    cmd_end = redirect_start
+                elif cur_word or was_quote_mode:
+                    on_word(cur_word, span)
+                    has_words = True
+                    cur_word = ""
+                    if cmd_start is None:
+                        cmd_start = redirect_start if word_start is None else word_start
+                    cmd_end = redirect_start
+                word_start = None
+                was_quote_mode = False
+                if cmd_start is None:
+                    cmd_start = redirect_start
+                redirect_start = None
+
+                if pos + 1 >= statement_len:
+                    raise UnexpectedStatementFinishParserFailure("Unexpected end of statement while parsing.", pos=pos)
+                next_char = statement[pos + 1]
+                if char_class == _CLASS_REDIRECT_INPUT:
+                    if current_descriptor is None:
+                        current_descriptor = 0
+                    redirect_mode = "<"
+                    if next_char == "&":
+                        modifying_descriptor = True
+                        pos += 1
+                elif next_char == ">":
+                    if current_descriptor is None:
+                        current_descriptor = 1
+                    redirect_mode = ">>"
+                    pos += 1
+                    if pos + 1 >= statement_len:
+                        raise UnexpectedStatementFinishParserFailure("Unexpected end of statement while parsing.", pos=pos)
+                    if statement[pos + 1] == "&":
+                        raise InvalidRedirectionParserFailure(
+                            "Cannot duplicate descriptor with append operator.",
+                            pos=pos,
+                        )
+                else:
+                    if current_descriptor is None:
+                        current_descriptor = 1
+                    redirect_mode = ">"
+                    if next_char == "&":
+                        modifying_descriptor = True
+                        pos += 1
+
+                pos += 1
+                if pos >= statement_len:
+                    raise UnexpectedStatementFinishParserFailure("Unexpected end of statement while parsing.", pos=pos - 1)
+                match = space_run(statement, pos)
+                if match is not None:
+                    pos = match.end()
+                    if pos >= statement_len:
+                        raise UnexpectedStatementFinishParserFailure("Unexpected end of statement while parsing.", pos=pos - 1)
+                continue
+
+            # Everything left over is a statement terminator or separator.
+            if not has_words and not cur_word:
+                raise EmptyStatementParserFailure(
+                    "Statement terminator found without any preceding statement.",
+                    pos=pos,
+                )
+
+            if record_spans:
+                span = (lead + (pos if word_start is None else word_start), lead + pos)
+            if redirect_mode is not None:
+                _end_redirect(handler, cur_word, redirect_mode, current_descriptor, modifying_descriptor, pos, span)
+                cur_word = ""
+                redirect_mode = None
+                current_descriptor = None
+                modifying_descriptor = False
+                cmd_end = pos
+            elif cur_word or was_quote_mode:
+                on_word(cur_word, span)
+                has_words = True
+                cur_word = ""
+                if cmd_start is None:
+                    cmd_start = pos if word_start is None else word_start
+                cmd_end = pos
+            word_start = None
+            was_quote_mode = False
+            if record_spans and cmd_start is not None and cmd_end is not None:
+                cmd_span = (cmd_start + lead, cmd_end + lead)
+            else:
+                cmd_span = None
+            cmd_start = None
+            cmd_end = None
+
+            if char_class == _CLASS_SEMICOLON:
+                end_statement = True
+            else:
+                if pos + 1 >= statement_len:
+                    raise UnexpectedStatementFinishParserFailure("Unexpected end of statement while parsing.", pos=pos)
+                if statement[pos + 1] == char:
+                    handler.on_operator("&&" if char_class == _CLASS_AMPERSAND else "||")
+                    pos += 1
+                    expecting_new_statement = True
+                    end_statement = True
+                elif char_class == _CLASS_AMPERSAND:
+                    asynchronous = True
+                    end_statement = True
+                else:
+                    handler.on_pipe(cmd_span)
+                    has_words = False
+
+            if end_statement:
+                handler.on_statement_end(asynchronous, cmd_span)
+                end_statement = False
+                asynchronous = False
+                has_words = False
+                just_terminated = True
+
+            pos += 1
+
+        if just_terminated:
+            if expecting_new_statement:
+                raise EmptyStatementParserFailure("Follow-on statement not found.", pos=pos)
+            return
+
+        if record_spans:
+            span = (lead + (pos if word_start is None else word_start), lead + pos)
+        if redirect_mode is not None:
+            _end_redirect(handler, cur_word, redirect_mode, current_descriptor, modifying_descriptor, pos, span)
+            cmd_end = pos
+        elif cur_word or was_quote_mode:
+            on_word(cur_word, span)
+            if cmd_start is None:
+                cmd_start = pos if word_start is None else word_start
+            cmd_end = pos
+        if record_spans and cmd_start is not None and cmd_end is not None:
+            cmd_span = (cmd_start + lead, cmd_end + lead)
+        else:
+            cmd_span = None
+        handler.on_statement_end(False, cmd_span)
+
+
+def tokenize(statement: str) -> Iterator[Token]:
+    """
+    Splits a command line string into tokens, without building any command
+    objects. Words are unescaped and unquoted following exactly the same
+    rules as :func:`Parser.parse`.
+
+    Only problems that prevent the statement from being split into tokens
+    are reported (unclosed quotes, operators at the very end of the
+    statement, and duplicating a descriptor with the append operator). Other
+    syntax errors, such as empty statements or missing redirection targets,
+    are left for :func:`Parser.parse` to detect.
+
+    :param statement: The full command-line string to be tokenized.
+    :type statement: str
+    :returns: An iterator over the tokens in the statement. Token offsets, as
+              well as the position of any :class:`ParserFailure` raised,
+              refer to the original statement, including any leading
+              whitespace.
+    :rtype: Iterator[Token]
+    """
+
+    end = len(statement.rstrip())
+    pos = len(statement) - len(statement.lstrip())
+    char_classes = _CHAR_CLASSES
+    word_run = _WORD_RUN.match
+    space_run = _SPACE_RUN.match
+
+    cur_word = ""
+    word_start = 0
+    escaped = False
+    was_quote_mode = False
+    expecting_target = False
+    modifying_descriptor = False
+
+    while pos < end:
+        char = statement[pos]
+        char_class = char_classes.get(char, _CLASS_WORD)
+
+        if escaped:
+            cur_word += char
+            escaped = char_class == _CLASS_ESCAPE
+            pos += 1
+            continue
+
+        if char_class == _CLASS_WORD or (
+            char_class == _CLASS_DIGIT and (cur_word or expecting_target)
+        ) or (
+            char_class == _CLASS_DASH and (cur_word or not modifying_descriptor)
+        ):
+            if not cur_word and not was_quote_mode:
+                word_start = pos
+            match = word_run(statement, pos, end)
+            cur_word += match.group()
+            pos = match.end()
+            continue
+
+        if char_class == _CLASS_ESCAPE or char_class == _CLASS_SINGLE_QUOTE or char_class == _CLASS_DOUBLE_QUOTE:
+            if not cur_word and not was_quote_mode:
+                word_start = pos
+            if char_class == _CLASS_ESCAPE:
+                escaped = True
+                pos += 1
+            else:
+                was_quote_mode = True
+                if char_class == _CLASS_SINGLE_QUOTE:
+                    quoted, pos = _scan_single_quoted(statement, pos, end)
+                else:
+                    quoted, pos = _scan_double_quoted(statement, pos, end)
+                cur_word += quoted
+            continue
+
+        if char_class == _CLASS_DIGIT:
+            digits_end = _DIGIT_RUN.match(statement, pos, end).end()
+            if digits_end < end and statement[digits_end] in "<>":
+                if was_quote_mode:
+                    # An empty quoted word directly before the descriptor.
+                    yield Token(TOKEN_WORD, word_start, pos, cur_word)
+                    was_quote_mode = False
+                yield Token(TOKEN_DESCRIPTOR, pos, digits_end, statement[pos:digits_end])
+            else:
+                if not was_quote_mode:
+                    word_start = pos
+                cur_word = statement[pos:digits_end]
+            pos = digits_end
+            continue
+
+        if char_class == _CLASS_DASH:
+            # Closing a descriptor with ">&-" or "<&-".
+            yield Token(TOKEN_WORD, pos, pos + 1, "-")
+            expecting_target = False
+            modifying_descriptor = False
+            pos += 1
+            continue
+
+        # Everything else ends the current word.
+        if cur_word or was_quote_mode:
+            yield Token(TOKEN_WORD, word_start, pos, cur_word)
+            cur_word = ""
+        was_quote_mode = False
+        expecting_target = False
+        modifying_descriptor = False
+
+        if char_class == _CLASS_SPACE:
+            pos = space_run(statement, pos, end).end()
+            continue
+
+        if char_class == _CLASS_SEMICOLON:
+            yield Token(TOKEN_SEMICOLON, pos, pos + 1, char)
+            pos += 1
+            continue
+
+        if pos + 1 >= end:
+            raise UnexpectedStatementFinishParserFailure("Unexpected end of statement while parsing.", pos=pos)
+        next_char = statement[pos + 1]
+
+        if char_class == _CLASS_AMPERSAND or char_class == _CLASS_PIPE:
+            if next_char == char:
+                kind = TOKEN_AND if char_class == _CLASS_AMPERSAND else TOKEN_OR
+                yield Token(kind, pos, pos + 2, statement[pos:pos + 2])
+                pos += 2
+            else:
+                kind = TOKEN_AMPERSAND if char_class == _CLASS_AMPERSAND else TOKEN_PIPE
+                yield Token(kind, pos, pos + 1, char)
+                pos += 1
+            continue
+
+        operator_end = pos + 1
+        if char_class == _CLASS_REDIRECT_OUTPUT and next_char == ">":
+            operator_end += 1
+            if operator_end >= end:
+                raise UnexpectedStatementFinishParserFailure("Unexpected end of statement while parsing.", pos=pos + 1)
+            if statement[operator_end] == "&":
+                raise InvalidRedirectionParserFailure(
+                    "Cannot duplicate descriptor with append operator.",
+                    pos=pos + 1,
+                )
+        elif next_char == "&":
+            operator_end += 1
+            modifying_descriptor = True
+            if operator_end >= end:
+                raise UnexpectedStatementFinishParserFailure("Unexpected end of statement while parsing.", pos=pos + 1)
+        yield Token(TOKEN_REDIRECT, pos, operator_end, statement[pos:operator_end])
+        expecting_target = True
+        match = space_run(statement, operator_end, end)
+        pos = operator_end if match is None else match.end()
+
+    if cur_word or was_quote_mode:
+        yield Token(TOKEN_WORD, word_start, pos, cur_word)
+
+
+def _count_chars(statement: str, counts: Dict[str, int]):
+    # Splits the characters of a stripped statement by the part of the
+    # grammar that consumes them, for ParseStats. Counting stops at the first
+    # token that can't be read; parsing reports the failure itself.
+    counts["chars"] = len(statement)
+    if not statement:
+        return
+    if _METACHARS.search(statement) is None:
+        counts["fast_path"] = 1
+        word = len(statement) - statement.count(" ") - statement.count("\t")
+        counts["chars.word"] = word
+        counts["chars.whitespace"] = len(statement) - word
+        return
+
+    quoted = escaped = redirect = operator = descriptor = word = 0
+    try:
+        for token in tokenize(statement):
+            length = token.end - token.start
+            if token.kind == TOKEN_REDIRECT:
+                redirect += length
+            elif token.kind == TOKEN_DESCRIPTOR:
+                descriptor += length
+            elif token.kind != TOKEN_WORD:
+                operator += length
+            else:
+                quote = None
+                prev_char = None
+                after_escape = False
+                for char in statement[token.start:token.end]:
+                    if after_escape:
+                        escaped += 1
+                        after_escape = False
+                    elif quote is not None:
+                        quoted += 1
+                        if char == quote and (quote == "'" or prev_char != "\\"):
+                            quote = None
+                    elif char == "\\":
+                        escaped += 1
+                        after_escape = True
+                    elif char == "'" or char == '"':
+                        quoted += 1
+                        quote = char
+                    else:
+                        word += 1
+                    prev_char = char
+    except ParserFailure:
+        pass
+
+    counts["chars.quoted"] = quoted
+    counts["chars.escaped"] = escaped
+    counts["chars.redirect"] = redirect
+    counts["chars.operator"] = operator
+    counts["chars.descriptor"] = descriptor
+    counts["chars.word"] = word
+    counts["chars.whitespace"] = len(statement) - quoted - escaped - redirect - operator - descriptor - word
+
+
+def _validate(statement: str):
+    # Runs the same checks as the scanner engine, in the same order, but
+    # only keeps track of what the checks need: whether the current word and
+    # command have anything in them, the text of descriptor duplication
+    # targets, and which descriptors are open. Nothing is built.
+    statement_len = len(statement)
+    char_classes = _CHAR_CLASSES
+    word_run = _WORD_RUN.match
+    space_run = _SPACE_RUN.match
+    digit_run = _DIGIT_RUN.match
+
+    pos = 0
+    # Whether the current word has any characters, and its text when it is
+    # the target of a descriptor duplication.
+    has_chars = False
+    dup_word = ""
+    has_words = False
+    wordless_command = False
+    # The descriptors open in the current command, or None if they haven't
+    # changed from stdin, stdout and stderr.
+    open_fds: Optional[Set[int]] = None
+
+    escaped = False
+    was_quote_mode = False
+    redirect_mode: Optional[str] = None
+    just_terminated = False
+    expecting_new_statement = False
+    current_descriptor: Optional[int] = None
+    modifying_descriptor = False
+
+    while True:
+        if pos < statement_len:
+            char = statement[pos]
+            char_class = char_classes.get(char, _CLASS_WORD)
+            if just_terminated and char_class != _CLASS_SPACE:
+                just_terminated = False
+                expecting_new_statement = False
+
+            if escaped:
+                has_chars = True
+                if modifying_descriptor:
+                    dup_word += char
+                escaped = char_class == _CLASS_ESCAPE
+                pos += 1
+                continue
+
+            if char_class == _CLASS_WORD or char_class == _CLASS_DASH and (has_chars or not modifying_descriptor):
+                end = word_run(statement, pos).end()
+                if modifying_descriptor:
+                    dup_word += statement[pos:end]
+                has_chars = True
+                pos = end
+                continue
+
+            if char_class == _CLASS_ESCAPE:
+                escaped = True
+                pos += 1
+                continue
+
+            if char_class == _CLASS_SINGLE_QUOTE or char_class == _CLASS_DOUBLE_QUOTE:
+                was_quote_mode = True
+                if char_class == _CLASS_SINGLE_QUOTE:
+                    quoted, pos = _scan_single_quoted(statement, pos, statement_len)
+                else:
+                    quoted, pos = _scan_double_quoted(statement, pos, statement_len)
+                if quoted:
+                    has_chars = True
+                    if modifying_descriptor:
+                        dup_word += quoted
+                continue
+
+            if char_class == _CLASS_DIGIT:
+                if has_chars or redirect_mode is not None:
+                    end = word_run(statement, pos).end()
+                    if modifying_descriptor:
+                        dup_word += statement[pos:end]
+                    has_chars = True
+                    pos = end
+                    continue
+                end = digit_run(statement, pos).end()
+                if end < statement_len and statement[end] in "<>":
+                    current_descriptor = int(statement[pos:end])
+                else:
+                    has_chars = True
+                pos = end
+                continue
+
+            if char_class == _CLASS_DASH:
+                # A dash straight after ">&" or "<&" closes the descriptor.
+                if open_fds is None:
+                    open_fds = {0, 1, 2}
+                open_fds.discard(current_descriptor)
+                redirect_mode = None
+                current_descriptor = None
+                modifying_descriptor = False
+                pos += 1
+                continue
+
+            if char_class == _CLASS_REDIRECT_OUTPUT or char_class == _CLASS_REDIRECT_INPUT:
+                if redirect_mode is not None and (char_class == _CLASS_REDIRECT_INPUT or not has_chars):
+                    raise EmptyRedirectParserFailure("No redirect filename provided.", pos=pos)
+        elif just_terminated:
+            if expecting_new_statement:
+                raise EmptyStatementParserFailure("Follow-on statement not found.", pos=pos)
+            break
+        else:
+            char = ""
+            char_class = None
+
+        # Whatever follows ends the current word: whitespace, a redirection,
+        # a statement terminator or separator, or the end of the statement.
+        if char_class is not None and char_class != _CLASS_SPACE and char_class != _CLASS_REDIRECT_OUTPUT \
+                and char_class != _CLASS_REDIRECT_INPUT and not has_words and not has_chars:
+            raise EmptyStatementParserFailure(
+                "Statement terminator found without any preceding statement.",
+                pos=pos,
+            )
+
+        if redirect_mode is not None:
+            if not has_chars:
+                raise EmptyRedirectParserFailure("No redirect filename provided.", pos=pos)
+            if open_fds is None:
+                open_fds = {0, 1, 2}
+            if not modifying_descriptor:
+                open_fds.add(current_descriptor)
+            elif dup_word == "-":
+                open_fds.discard(current_descriptor)
+            elif isdigit(dup_word):
+                if int(dup_word) not in open_fds:
+                    raise BadFileDescriptorException("Bad file descriptor {0}".format(int(dup_word)))
+                open_fds.add(current_descriptor)
+            else:
+                raise AmbiguousRedirectParserFailure("", pos=pos)
+            redirect_mode = None
+            current_descriptor = None
+            modifying_descriptor = False
+            dup_word = ""
+        elif has_chars or was_quote_mode:
+            has_words = True
+        has_chars = False
+        was_quote_mode = False
+
+        if char_class is None:
+            if not has_words:
+                wordless_command = True
+            break
+
+        if char_class == _CLASS_SPACE:
+            pos = space_run(statement, pos).end()
+            continue
+
+        if char_class == _CLASS_REDIRECT_OUTPUT or char_class == _CLASS_REDIRECT_INPUT:
+            if pos + 1 >= statement_len:
+                raise UnexpectedStatementFinishParserFailure("Unexpected end of statement while parsing.", pos=pos)
+            next_char = statement[pos + 1]
+            if char_class == _CLASS_REDIRECT_INPUT:
+                if current_descriptor is None:
+                    current_descriptor = 0
+                redirect_mode = "<"
+                if next_char == "&":
+                    modifying_descriptor = True
+                    pos += 1
+            elif next_char == ">":
+                if current_descriptor is None:
+                    current_descriptor = 1
+                redirect_mode = ">>"
+                pos += 1
+                if pos + 1 >= statement_len:
+                    raise UnexpectedStatementFinishParserFailure("Unexpected end of statement while parsing.", pos=pos)
+                if statement[pos + 1] == "&":
+                    raise InvalidRedirectionParserFailure(
+                        "Cannot duplicate descriptor with append operator.",
+                        pos=pos,
+                    )
+            else:
+                if current_descriptor is None:
+                    current_descriptor = 1
+                redirect_mode = ">"
+                if next_char == "&":
+                    modifying_descriptor = True
+                    pos += 1
+
+            pos += 1
+            if pos >= statement_len:
+                raise UnexpectedStatementFinishParserFailure("Unexpected end of statement while parsing.", pos=pos - 1)
+            match = space_run(statement, pos)
+            if match is not None:
+                pos = match.end()
+                if pos >= statement_len:
+                    raise UnexpectedStatementFinishParserFailure("Unexpected end of statement while parsing.", pos=pos - 1)
+            continue
+
+        # A statement terminator or separator ends the current command.
+        if not has_words:
+            wordless_command = True
+        has_words = False
+        open_fds = None
+        if char_class != _CLASS_SEMICOLON:
+            if pos + 1 >= statement_len:
+                raise UnexpectedStatementFinishParserFailure("Unexpected end of statement while parsing.", pos=pos)
+            if statement[pos + 1] == char:
+                pos += 1
+                expecting_new_statement = True
+                just_terminated = True
+            elif char_class == _CLASS_AMPERSAND:
+                just_terminated = True
+        else:
+            just_terminated = True
+        pos += 1
+
+    if wordless_command:
+        raise CommandBuilderCreateException("No command words added.")
+
+
+def _parse_one(parser: Parser, statement: str) -> Union[Command, Exception]:
+    try:
+        return parser.parse(statement)
+    except _STATEMENT_FAILURES as e:
+        return e
+
+
+def _parse_chunk(
+        engine: str,
+        spans: bool,
+        collect_stats: bool,
+        statements: List[str],
+    ) -> Tuple[List[Union[Command, Exception]], Optional[Dict[str, int]]]:
+    # Runs in a worker process. The worker's own counters are sent back with
+    # the results, for the parent to add to the parser's statistics.
+    stats = ParseStats() if collect_stats else None
+    parser = Parser(engine=engine, spans=spans, stats=stats)
+    results = [_parse_one(parser, statement) for statement in statements]
+    return results, None if stats is None else stats.snapshot()
+
+
+def _parse_statements_into(
+        append: Callable[[Command], None],
+        statements: Iterable[str],
+        parser: Optional[Parser],
+        workers: Optional[int],
+        chunksize: int,
+    ) -> List[Tuple[int, Exception]]:
+    # Shared by the add_statements methods of the bulk containers: parses
+    # the statements with parse_many, passes every command to append in
+    # input order, and collects the failures with their positions.
+    if parser is None:
+        parser = Parser()
+    failures = []
+    for i, result in enumerate(parser.parse_many(statements, workers=workers, chunksize=chunksize)):
+        if isinstance(result, Exception):
+            failures.append((i, result))
+        else:
+            append(result)
+    return failures
 
 
 class EmptyInputException(Exception):
@@ -369,6 +1769,22 @@ class EmptyInputException(Exception):
     """
 
 
+class UnknownParserEngineException(Exception):
+    """
+    Raised by the :class:`Parser` class constructor if the requested parsing
+    engine is not one of :data:`ENGINES`.
+    """
+
+
+class UnsupportedEncodingException(Exception):
+    """
+    Raised by the :class:`Parser` class :func:`~Parser.parse_bytes()` if the
+    requested encoding is not ASCII-compatible, or encodes characters with
+    bytes that have a meaning in the grammar, so statements in that encoding
+    cannot be scanned byte by byte.
+    """
+
+
 class ParserFailure(Exception):
     """
     A base class for all failures that can occur during the parsing process,
@@ -390,6 +1806,9 @@ class ParserFailure(Exception):
         super().__init__(message)
         self.pos = pos
 
+    def __reduce__(self):
+        return (self.__class__, (self.args[0], self.pos))
+
 
 class UnclosedQuoteParserFailure(ParserFailure):
     """
@@ -440,9 +1859,36 @@ class AmbiguousRedirectParserFailure(ParserFailure):
     """
 
 
+# Everything that can go wrong because of the content of a statement, as
+# opposed to a bug or a misconfigured parser.
+_STATEMENT_FAILURES = (
+    EmptyInputException,
+    ParserFailure,
+    BadFileDescriptorException,
+    CommandBuilderCreateException,
+)
+
+
 __all__ = [
+    "ENGINE_STATE_MACHINE",
+    "ENGINE_SCANNER",
+    "ENGINES",
+    "TOKEN_WORD",
+    "TOKEN_REDIRECT",
+    "TOKEN_DESCRIPTOR",
+    "TOKEN_SEMICOLON",
+    "TOKEN_AMPERSAND",
+    "TOKEN_AND",
+    "TOKEN_PIPE",
+    "TOKEN_OR",
+    "Token",
+    "Diagnostic",
+    "ParseResult",
     "Parser",
+    "tokenize",
     "EmptyInputException",
+    "UnknownParserEngineException",
+    "UnsupportedEncodingException",
     "ParserFailure",
     "UnclosedQuoteParserFailure",
     "EmptyStatementParserFailure",
@@ -0,0 +1,436 @@
+import json
+from types import MappingProxyType
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .ast import Command, CommandDescriptor, CommandDescriptors, CommandFileDescriptor, DefaultFile, File, Word
+from .ast import DESCRIPTOR_DEFAULT_INDEX_STDIN, DESCRIPTOR_DEFAULT_INDEX_STDOUT, DESCRIPTOR_DEFAULT_INDEX_STDERR
+from .ast import _COMMAND_DESCRIPTOR_CLOSED, _DEFAULT_COMMAND_DESCRIPTORS, _DEFAULT_DESCRIPTOR_TABLE
+from .ast import _DESCRIPTOR_READ, _DESCRIPTOR_WRITE, _OPERATOR_AND, _OPERATOR_OR
+from .ast import _REDIRECTION_APPEND, _REDIRECTION_INPUT, _REDIRECTION_OUTPUT
+from .ast import _STDERR_TARGET, _STDIN_TARGET, _STDOUT_TARGET
+from .ast import InvalidCommandDataException, InvalidDescriptorDataException, InvalidFileDescriptorException
+from .parser import Parser, _parse_statements_into
+
+
+# The version of the document layout below. It is bumped whenever a change
+# would stop older readers from understanding a document.
+#
+# A statement is a document with the schema version and a flat array of
+# commands, rather than a nested object per pipe or chained command, so that
+# neither writing nor reading it recurses:
+#
+#   {"version": 1, "commands": [command, ...]}
+#
+# Commands are listed in pre-order: each command, then the commands it pipes
+# to, then the commands it is chained to. The first command is the one the
+# parser returns. Every command is an object with these keys, where all but
+# "command" and "args" are left out when they don't apply:
+#
+#   command       the command name
+#   args          the arguments, as an array of strings
+#   descriptors   the descriptors that differ from the default stdin, stdout
+#                 and stderr, as an object keyed by descriptor number. A
+#                 descriptor is either {"closed": true}, or has an
+#                 "operator" of "<", ">" or ">>" and either a "file" name,
+#                 along with its "span", or a "default" target of "stdin",
+#                 "stdout" or "stderr". A default descriptor that was
+#                 removed is null.
+#   pipe          the index of the command piped to
+#   next          the index of the command chained to
+#   operator      "&&" or "||", if the next command is chained with one
+#   async         true, if the command is run asynchronously
+#   span          the [start, end] offsets of the command in the statement
+#   command_span  the offsets of the command name
+#   arg_spans     the offsets of every argument, or null where there are
+#                 none
+SCHEMA_VERSION = 1
+
+_DEFAULT_FDS = (DESCRIPTOR_DEFAULT_INDEX_STDIN, DESCRIPTOR_DEFAULT_INDEX_STDOUT, DESCRIPTOR_DEFAULT_INDEX_STDERR)
+
+_OPERATORS = {
+    _REDIRECTION_INPUT: "<",
+    _REDIRECTION_OUTPUT: ">",
+    _REDIRECTION_APPEND: ">>",
+}
+_OPERATORS_BY_NAME = {name: operator for operator, name in _OPERATORS.items()}
+
+_TARGETS = {
+    _STDIN_TARGET: "stdin",
+    _STDOUT_TARGET: "stdout",
+    _STDERR_TARGET: "stderr",
+}
+_TARGETS_BY_NAME = {name: target for target, name in _TARGETS.items()}
+
+_CHAIN_OPERATORS = {
+    _OPERATOR_AND: "&&",
+    _OPERATOR_OR: "||",
+}
+_CHAIN_OPERATORS_BY_NAME = {name: operator for operator, name in _CHAIN_OPERATORS.items()}
+
+# The most compact output json can produce.
+_SEPARATORS = (",", ":")
+
+
+def _word_to_json(word) -> str:
+    if type(word) is not Word:
+        raise SerializationException("Cannot serialize {0!r}".format(word))
+    return word.word
+
+
+def _descriptor_to_dict(descriptor) -> Dict[str, Any]:
+    if descriptor is _COMMAND_DESCRIPTOR_CLOSED:
+        return {"closed": True}
+    if type(descriptor) is not CommandDescriptor or type(descriptor.descriptor) is not CommandFileDescriptor:
+        raise SerializationException("Cannot serialize {0!r}".format(descriptor))
+
+    file_descriptor = descriptor.descriptor
+    operator = _OPERATORS.get(file_descriptor.operator)
+    if operator is None:
+        raise SerializationException("Cannot serialize {0!r}".format(file_descriptor.operator))
+    target = file_descriptor.target
+    if type(target) is File:
+        if target.span is None:
+            return {"operator": operator, "file": target.name}
+        return {"operator": operator, "file": target.name, "span": list(target.span)}
+    if type(target) is DefaultFile and target.target in _TARGETS:
+        return {"operator": operator, "default": _TARGETS[target.target]}
+    raise SerializationException("Cannot serialize {0!r}".format(target))
+
+
+def _descriptors_to_dict(descriptors: CommandDescriptors) -> Optional[Dict[str, Any]]:
+    # Returns None if the descriptors are the defaults.
+    if descriptors is _DEFAULT_COMMAND_DESCRIPTORS:
+        return None
+    if type(descriptors) is not CommandDescriptors:
+        raise SerializationException("Cannot serialize {0!r}".format(descriptors))
+
+    table = descriptors.descriptors
+    encoded = {}
+    for fd in _DEFAULT_FDS:
+        if fd not in table:
+            encoded[str(fd)] = None
+    for fd, descriptor in table.items():
+        default_descriptor = _DEFAULT_DESCRIPTOR_TABLE.get(fd)
+        if default_descriptor is not None and (descriptor is default_descriptor or descriptor == default_descriptor):
+            continue
+        encoded[str(fd)] = _descriptor_to_dict(descriptor)
+    return encoded or None
+
+
+def to_dict(first_cmd: Command) -> Dict[str, Any]:
+    """
+    Converts a parsed statement to a dictionary of plain JSON types. The
+    dictionary holds the :data:`SCHEMA_VERSION` and every command of the
+    statement in a flat list, in pre-order, with pipe and chained commands
+    referred to by their index in the list. Default descriptors, and spans
+    that weren't recorded, are left out.
+
+    :param first_cmd: The first command of the statement, as returned by
+                      :func:`shell_parser.parser.Parser.parse`.
+    :type first_cmd: Command
+    :returns: The statement.
+    :rtype: Dict[str, Any]
+    :raises SerializationException: If the statement holds anything the
+                                    parser can't produce, such as words that
+                                    aren't :class:`shell_parser.ast.Word`
+                                    objects.
+    """
+
+    commands: List[Dict[str, Any]] = []
+    # Each command is numbered as it's reached, and its index filled in on
+    # the command that links to it.
+    stack: List[Tuple[Command, Optional[Dict[str, Any]], str]] = [(first_cmd, None, "")]
+    while stack:
+        cmd, parent, link = stack.pop()
+        if parent is not None:
+            parent[link] = len(commands)
+
+        command = cmd.command
+        args = cmd.args
+        encoded: Dict[str, Any] = {
+            "command": _word_to_json(command),
+            "args": [_word_to_json(arg) for arg in args],
+        }
+        descriptors = _descriptors_to_dict(cmd.descriptors)
+        if descriptors is not None:
+            encoded["descriptors"] = descriptors
+        commands.append(encoded)
+
+        if cmd.next_command is not None:
+            stack.append((cmd.next_command, encoded, "next"))
+            if cmd.next_command_operator is not None:
+                encoded["operator"] = _CHAIN_OPERATORS[cmd.next_command_operator]
+        if cmd.pipe_command is not None:
+            stack.append((cmd.pipe_command, encoded, "pipe"))
+        if cmd.asynchronous:
+            encoded["async"] = True
+        if cmd.span is not None:
+            encoded["span"] = list(cmd.span)
+        if command.span is not None:
+            encoded["command_span"] = list(command.span)
+        for arg in args:
+            if arg.span is not None:
+                encoded["arg_spans"] = [None if arg.span is None else list(arg.span) for arg in args]
+                break
+    return {"version": SCHEMA_VERSION, "commands": commands}
+
+
+def _span_from_json(span) -> Optional[Tuple[int, int]]:
+    if span is None:
+        return None
+    if type(span) is not list or len(span) != 2 or type(span[0]) is not int or type(span[1]) is not int:
+        raise SerializationException("Invalid span {0!r}".format(span))
+    return (span[0], span[1])
+
+
+def _word_from_json(word, span) -> Word:
+    if type(word) is not str:
+        raise SerializationException("Invalid word {0!r}".format(word))
+    return Word(word, _span_from_json(span))
+
+
+def _descriptor_from_dict(encoded):
+    if encoded.get("closed") is True:
+        return _COMMAND_DESCRIPTOR_CLOSED
+    operator = _OPERATORS_BY_NAME.get(encoded.get("operator"))
+    if operator is None:
+        raise SerializationException("Invalid descriptor operator {0!r}".format(encoded.get("operator")))
+    if "file" in encoded:
+        name = encoded["file"]
+        if type(name) is not str:
+            raise SerializationException("Invalid file name {0!r}".format(name))
+        target = File(name, _span_from_json(encoded.get("span")))
+    else:
+        default_target = _TARGETS_BY_NAME.get(encoded.get("default"))
+        if default_target is None:
+            raise SerializationException("Invalid descriptor target {0!r}".format(encoded.get("default")))
+        target = DefaultFile(target=default_target)
+    return CommandDescriptor(
+        mode=_DESCRIPTOR_READ if operator is _REDIRECTION_INPUT else _DESCRIPTOR_WRITE,
+        descriptor=CommandFileDescriptor(target=target, operator=operator),
+    )
+
+
+def _descriptors_from_dict(encoded) -> CommandDescriptors:
+    if encoded is None:
+        return _DEFAULT_COMMAND_DESCRIPTORS
+    descriptors = dict(_DEFAULT_DESCRIPTOR_TABLE)
+    for fd, descriptor in encoded.items():
+        if not fd.isdigit():
+            raise SerializationException("Invalid file descriptor {0!r}".format(fd))
+        if descriptor is None:
+            descriptors.pop(int(fd), None)
+        else:
+            descriptors[int(fd)] = _descriptor_from_dict(descriptor)
+    return CommandDescriptors(descriptors=MappingProxyType(descriptors))
+
+
+def _command_from_dict(encoded, pipe_command: Optional[Command], next_command: Optional[Command]) -> Command:
+    args = encoded["args"]
+    if type(args) is not list:
+        raise SerializationException("Invalid arguments {0!r}".format(args))
+    arg_spans = encoded.get("arg_spans")
+    if arg_spans is None:
+        arg_spans = (None,) * len(args)
+    elif len(arg_spans) != len(args):
+        raise SerializationException("Expected {0} argument spans".format(len(args)))
+
+    asynchronous = encoded.get("async", False)
+    if type(asynchronous) is not bool:
+        raise SerializationException("Invalid async flag {0!r}".format(asynchronous))
+    operator = encoded.get("operator")
+    next_command_operator = None
+    if operator is not None:
+        next_command_operator = _CHAIN_OPERATORS_BY_NAME.get(operator)
+        if next_command_operator is None:
+            raise SerializationException("Invalid operator {0!r}".format(operator))
+    return Command(
+        command=_word_from_json(encoded["command"], encoded.get("command_span")),
+        descriptors=_descriptors_from_dict(encoded.get("descriptors")),
+        args=tuple(_word_from_json(arg, span) for arg, span in zip(args, arg_spans)),
+        pipe_command=pipe_command,
+        next_command=next_command,
+        next_command_operator=next_command_operator,
+        asynchronous=asynchronous,
+        span=_span_from_json(encoded.get("span")),
+    )
+
+
+def from_dict(data: Dict[str, Any]) -> Command:
+    """
+    Converts a dictionary made by :func:`to_dict` back to a statement.
+
+    :param data: The statement, as returned by :func:`to_dict`.
+    :type data: Dict[str, Any]
+    :returns: The first command of the statement.
+    :rtype: Command
+    :raises SerializationException: If the dictionary is not a statement in a
+                                    supported version of the schema.
+    """
+
+    try:
+        version = data["version"]
+        if version != SCHEMA_VERSION:
+            raise SerializationException("Unsupported schema version {0!r}".format(version))
+        commands = data["commands"]
+        if not commands:
+            raise SerializationException("A statement needs at least one command")
+
+        # Every command links to commands after it, so building the list
+        # backwards means they have always been built already.
+        built: List[Optional[Command]] = [None] * len(commands)
+        for i in range(len(commands) - 1, -1, -1):
+            encoded = commands[i]
+            links = []
+            for link in ("pipe", "next"):
+                index = encoded.get(link)
+                if index is None:
+                    links.append(None)
+                    continue
+                if type(index) is not int or not i < index < len(commands) or built[index] is None:
+                    raise SerializationException("Invalid {0} index {1!r}".format(link, index))
+                links.append(built[index])
+                # Each command can only be linked to once.
+                built[index] = None
+            built[i] = _command_from_dict(encoded, links[0], links[1])
+    except SerializationException:
+        raise
+    except (
+        KeyError, TypeError, ValueError, AttributeError, IndexError,
+        InvalidCommandDataException, InvalidDescriptorDataException, InvalidFileDescriptorException,
+    ) as e:
+        raise SerializationException("Invalid statement: {0}".format(e)) from e
+
+    if any(cmd is not None for cmd in built[1:]):
+        raise SerializationException("Every command but the first must be linked to")
+    return built[0]
+
+
+def to_json(first_cmd: Command) -> str:
+    """
+    Serializes a parsed statement as compact JSON, in the layout made by
+    :func:`to_dict`.
+
+    :param first_cmd: The first command of the statement, as returned by
+                      :func:`shell_parser.parser.Parser.parse`.
+    :type first_cmd: Command
+    :returns: The JSON document. It is ASCII only, and never spans more than
+              one line.
+    :rtype: str
+    :raises SerializationException: If the statement holds anything the
+                                    parser can't produce.
+    """
+    return json.dumps(to_dict(first_cmd), separators=_SEPARATORS)
+
+
+def from_json(document: str) -> Command:
+    """
+    Deserializes a statement from JSON made by :func:`to_json`.
+
+    :param document: The JSON document.
+    :type document: str
+    :returns: The first command of the statement.
+    :rtype: Command
+    :raises SerializationException: If the document is not valid JSON, or not
+                                    a statement in a supported version of the
+                                    schema.
+    """
+
+    try:
+        data = json.loads(document)
+    except ValueError as e:
+        raise SerializationException("Invalid JSON: {0}".format(e)) from e
+    if type(data) is not dict:
+        raise SerializationException("Invalid statement: expected an object")
+    return from_dict(data)
+
+
+class NDJSONWriter(object):
+    """
+    Writes parsed statements to a text stream as newline-delimited JSON, one
+    :func:`to_json` document per line.
+    """
+
+    def __init__(self, stream: IO[str]):
+        """
+        :param stream: The text stream to write to. It is not closed by the
+                       writer.
+        :type stream: IO[str]
+        """
+        self._stream = stream
+        self._encode = json.JSONEncoder(separators=_SEPARATORS).encode
+        self.count = 0
+
+    def write(self, first_cmd: Command):
+        """
+        Writes a statement as a single line.
+
+        :param first_cmd: The first command of the statement, as returned by
+                          :func:`shell_parser.parser.Parser.parse`.
+        :type first_cmd: Command
+        :raises SerializationException: If the statement holds anything the
+                                        parser can't produce.
+        """
+        self._stream.write(self._encode(to_dict(first_cmd)) + "\n")
+        self.count += 1
+
+    def add_statements(
+            self,
+            statements: Iterable[str],
+            parser: Optional[Parser] = None,
+            *,
+            workers: Optional[int] = None,
+            chunksize: int = 512,
+        ) -> List[Tuple[int, Exception]]:
+        """
+        Like :func:`shell_parser.table.CommandTable.add_statements`, but
+        writes every statement that was parsed to the stream.
+        """
+
+        return _parse_statements_into(self.write, statements, parser, workers, chunksize)
+
+
+class NDJSONReader(object):
+    """
+    Reads statements written by :class:`NDJSONWriter` back from a text
+    stream, one line at a time. Blank lines are skipped.
+    """
+
+    def __init__(self, stream: Iterable[str]):
+        """
+        :param stream: The text stream, or any other iterable of lines, to
+                       read from.
+        :type stream: Iterable[str]
+        """
+        self._stream = stream
+        self._decode = json.JSONDecoder().decode
+
+    def __iter__(self) -> Iterator[Command]:
+        decode = self._decode
+        for line_number, line in enumerate(self._stream, 1):
+            if not line.strip():
+                continue
+            try:
+                data = decode(line)
+                if type(data) is not dict:
+                    raise SerializationException("Invalid statement: expected an object")
+                first_cmd = from_dict(data)
+            except (ValueError, SerializationException) as e:
+                raise SerializationException("Line {0}: {1}".format(line_number, e)) from e
+            yield first_cmd
+
+
+class SerializationException(Exception):
+    pass
+
+
+__all__ = [
+    "SCHEMA_VERSION",
+    "to_dict",
+    "from_dict",
+    "to_json",
+    "from_json",
+    "NDJSONWriter",
+    "NDJSONReader",
+    "SerializationException",
+]
@@ -0,0 +1,172 @@
+from threading import Lock
+from typing import Dict, Optional, Tuple
+
+from .ast import Command
+from .handler import ASTBuilder
+
+
+COUNTERS = (
+    "statements",
+    "fast_path",
+    "failures",
+    "chars",
+    "chars.quoted",
+    "chars.escaped",
+    "chars.redirect",
+    "chars.operator",
+    "chars.descriptor",
+    "chars.word",
+    "chars.whitespace",
+    "builders",
+    "commands",
+    "words",
+    "files",
+    "descriptors.tables",
+    "descriptors.duplicated",
+    "descriptors.closed",
+    "scan_ns",
+    "create_ns",
+)
+
+
+class ParseStats(object):
+    """
+    Counters describing the work done by a
+    :class:`shell_parser.parser.Parser` created with ``stats=ParseStats()``.
+
+    Parsers don't collect any statistics unless given a ``ParseStats``, and
+    the parsing code itself is untouched when they aren't: a parser with
+    statistics turned on takes a separate, instrumented path through
+    :func:`shell_parser.parser.Parser.parse`.
+
+    The counters are:
+
+    * ``statements``, ``fast_path`` and ``failures``: the statements parsed,
+      how many of them had no shell metacharacters at all, and how many
+      failed to parse.
+    * ``chars`` and ``chars.*``: the characters parsed, split by the part of
+      the grammar that consumed them: ``quoted`` (quotes and the text inside
+      them), ``escaped`` (backslashes and the characters they escape),
+      ``redirect`` (redirection operators), ``operator`` (``;``, ``&``,
+      ``|``, ``&&`` and ``||``), ``descriptor`` (file descriptor numbers
+      found by looking ahead for a redirection), ``word`` and
+      ``whitespace``.
+    * ``builders``, ``commands``, ``words``, ``files`` and ``descriptors.*``:
+      the objects allocated while building the AST. Commands share a single
+      table of default stdin, stdout and stderr descriptors until they
+      redirect, duplicate or close one; ``descriptors.tables`` counts the
+      commands that needed a table of their own.
+    * ``scan_ns`` and ``create_ns``: the time spent, in nanoseconds, reading
+      the statement into command builders and creating the commands from
+      them with :func:`shell_parser.ast.CommandBuilder.create`.
+
+    It is safe to share a single ``ParseStats`` between several parsers and
+    threads.
+    """
+
+    def __init__(self):
+        self._counters: Dict[str, int] = dict.fromkeys(COUNTERS, 0)
+        self._lock = Lock()
+
+    def add(self, counts: Dict[str, int]):
+        """
+        Adds to the counters.
+
+        :param counts: The amount to add to each counter, by name.
+        :type counts: Dict[str, int]
+        """
+
+        with self._lock:
+            counters = self._counters
+            for name, value in counts.items():
+                counters[name] += value
+
+    def snapshot(self) -> Dict[str, int]:
+        """
+        :returns: A copy of every counter, by name.
+        :rtype: Dict[str, int]
+        """
+
+        with self._lock:
+            return dict(self._counters)
+
+    def reset(self):
+        """
+        Sets every counter back to zero.
+        """
+
+        with self._lock:
+            self._counters = dict.fromkeys(COUNTERS, 0)
+
+
+class _CountingASTBuilder(ASTBuilder):
+    # Builds the AST like ASTBuilder, while counting the objects allocated.
+
+    def __init__(self):
+        super().__init__()
+        self.builders = 1
+        self.words = 0
+        self.files = 0
+        self.duplicated = 0
+        self.closed = 0
+        self.commands = 0
+        self.tables = 0
+        self._has_table = False
+
+    def on_word(self, word: str, span: Optional[Tuple[int, int]]):
+        self.words += 1
+        super().on_word(word, span)
+
+    def on_redirect(self, fd: int, op: str, target: str, span: Optional[Tuple[int, int]]):
+        self.files += 1
+        super().on_redirect(fd, op, target, span)
+        self._count_table()
+
+    def on_dup(self, fd: int, src_fd: int):
+        self.duplicated += 1
+        super().on_dup(fd, src_fd)
+        self._count_table()
+
+    def on_close(self, fd: int):
+        self.closed += 1
+        super().on_close(fd)
+        self._count_table()
+
+    def on_pipe(self, command_span: Optional[Tuple[int, int]]):
+        self.builders += 1
+        self._has_table = False
+        super().on_pipe(command_span)
+
+    def on_statement_end(self, asynchronous: bool, command_span: Optional[Tuple[int, int]]):
+        self.builders += 1
+        self._has_table = False
+        super().on_statement_end(asynchronous, command_span)
+
+    def _count_table(self):
+        # The first change to a command's descriptors copies the shared
+        # default table.
+        if not self._has_table:
+            self.tables += 1
+            self._has_table = True
+
+    def result(self) -> Command:
+        result = super().result()
+        # Every builder but the one left waiting for a next statement became
+        # a command.
+        self.commands = self.builders - 1
+        return result
+
+    def count(self, counts: Dict[str, int]):
+        counts["builders"] = self.builders
+        counts["commands"] = self.commands
+        counts["words"] = self.words
+        counts["files"] = self.files
+        counts["descriptors.tables"] = self.tables
+        counts["descriptors.duplicated"] = self.duplicated
+        counts["descriptors.closed"] = self.closed
+
+
+__all__ = [
+    "COUNTERS",
+    "ParseStats",
+]
@@ -0,0 +1,278 @@
+import mmap
+import struct
+import sys
+from array import array
+from typing import IO, Iterable, Iterator, List, Optional, Tuple
+
+from .ast import Command, _flatten_command, _unflatten_command
+from .parser import Parser, _parse_statements_into
+
+
+# A store starts with a header, followed by one record per statement, the
+# offset index and a footer:
+#
+#   header   magic, format version and reserved bytes (16 bytes)
+#   records  each statement flattened as for pickling, then encoded with
+#            _encode_value
+#   index    the little-endian 64-bit offset of every record, and the
+#            offset just past the last one
+#   footer   the offset of the index, the number of records and the magic
+#            again (24 bytes)
+#
+# The footer is only written once the store is closed, so a store that was
+# never finished is rejected instead of being read partially.
+_MAGIC = b"SHPCMDS\x00"
+_VERSION = 1
+_HEADER = struct.Struct("<8sI4x")
+_FOOTER = struct.Struct("<QQ8s")
+_OFFSETS = struct.Struct("<QQ")
+
+_TAG_NONE = 0
+_TAG_INT = 1
+_TAG_STR = 2
+_TAG_TUPLE = 3
+
+# Words decoded with surrogateescape by Parser.parse_bytes contain lone
+# surrogates, which plain UTF-8 refuses to encode.
+_STR_ERRORS = "surrogatepass"
+
+
+def _write_varint(out: bytearray, value: int):
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _encode_value(out: bytearray, value):
+    # Only the types that flattened commands made by the parser are built
+    # from can be encoded. Every value is a tag byte followed by a varint:
+    # zero for None, the zigzag-encoded value of an integer, so that small
+    # negative numbers stay short, or the length of a string or tuple.
+    value_type = type(value)
+    if value is None:
+        out.append(_TAG_NONE)
+        out.append(0)
+    elif value_type is int:
+        out.append(_TAG_INT)
+        _write_varint(out, value * 2 if value >= 0 else -value * 2 - 1)
+    elif value_type is str:
+        encoded = value.encode("utf-8", _STR_ERRORS)
+        out.append(_TAG_STR)
+        _write_varint(out, len(encoded))
+        out += encoded
+    elif value_type is tuple:
+        out.append(_TAG_TUPLE)
+        _write_varint(out, len(value))
+        for item in value:
+            _encode_value(out, item)
+    else:
+        raise CommandStoreException("Cannot store {0!r}".format(value))
+
+
+def _decode_value(data: bytes, pos: int) -> Tuple[object, int]:
+    tag = data[pos]
+    value = data[pos + 1]
+    pos += 2
+    if value > 0x7f:
+        # Most varints fit in a single byte.
+        value, pos = _read_varint(data, pos - 1)
+    if tag == _TAG_STR:
+        return data[pos:pos + value].decode("utf-8", _STR_ERRORS), pos + value
+    if tag == _TAG_INT:
+        return (value >> 1) if not value & 1 else -((value + 1) >> 1), pos
+    if tag == _TAG_TUPLE:
+        items = []
+        for _ in range(value):
+            item, pos = _decode_value(data, pos)
+            items.append(item)
+        return tuple(items), pos
+    if tag == _TAG_NONE:
+        return None, pos
+    raise CommandStoreException("Corrupt record")
+
+
+class CommandStoreWriter(object):
+    """
+    Writes parsed statements to a command store file, one at a time, for
+    reading back later with :class:`CommandStore`.
+
+    Records are written to the file as statements are appended. Only the
+    offset of each record (8 bytes per statement) is held in memory until
+    the store is closed. A store that is never closed can't be opened.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: The path of the file to write. An existing file is
+                     overwritten.
+        :type path: str
+        """
+        self._file: IO[bytes] = open(path, "wb")
+        self._file.write(_HEADER.pack(_MAGIC, _VERSION))
+        self._offsets = array("Q", (_HEADER.size,))
+        self._closed = False
+
+    def __enter__(self) -> "CommandStoreWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            # Leave the store unfinished, so that it can't be mistaken for a
+            # complete one.
+            self._closed = True
+            self._file.close()
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def append(self, first_cmd: Command) -> int:
+        """
+        Writes a parsed statement to the store.
+
+        :param first_cmd: The first command of the statement, as returned by
+                          :func:`shell_parser.parser.Parser.parse`.
+        :type first_cmd: Command
+        :returns: The index of the statement in the store.
+        :rtype: int
+        :raises CommandStoreException: If the statement holds anything the
+                                       parser can't produce.
+        """
+
+        if self._closed:
+            raise CommandStoreException("The store is closed")
+        record = bytearray()
+        _encode_value(record, _flatten_command(first_cmd))
+        self._file.write(record)
+        self._offsets.append(self._offsets[-1] + len(record))
+        return len(self._offsets) - 2
+
+    def add_statements(
+            self,
+            statements: Iterable[str],
+            parser: Optional[Parser] = None,
+            *,
+            workers: Optional[int] = None,
+            chunksize: int = 512,
+        ) -> List[Tuple[int, Exception]]:
+        """
+        Like :func:`shell_parser.table.CommandTable.add_statements`, but
+        writes every statement that was parsed to the store.
+        """
+
+        return _parse_statements_into(self.append, statements, parser, workers, chunksize)
+
+    def close(self):
+        """
+        Writes the index and footer, and closes the file. Does nothing if the
+        store is already closed.
+        """
+
+        if self._closed:
+            return
+        self._closed = True
+        index_offset = self._offsets[-1]
+        offsets = self._offsets
+        if sys.byteorder != "little":
+            offsets = array("Q", offsets)
+            offsets.byteswap()
+        self._file.write(offsets.tobytes())
+        self._file.write(_FOOTER.pack(index_offset, len(self._offsets) - 1, _MAGIC))
+        self._file.close()
+
+
+class CommandStore(object):
+    """
+    Reads statements from a command store file written by
+    :class:`CommandStoreWriter`.
+
+    The file is memory-mapped, and only the footer is read when it is
+    opened. Accessing a statement reads its offsets from the index, and
+    decodes and materializes just that statement.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: The path of the store.
+        :type path: str
+        :raises CommandStoreException: If the file is not a complete command
+                                       store.
+        """
+
+        with open(path, "rb") as f:
+            try:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # The file is empty.
+                raise CommandStoreException("Not a command store")
+
+        try:
+            size = len(self._mmap)
+            if size < _HEADER.size + _FOOTER.size:
+                raise CommandStoreException("Not a command store")
+            magic, version = _HEADER.unpack_from(self._mmap, 0)
+            if magic != _MAGIC:
+                raise CommandStoreException("Not a command store")
+            if version != _VERSION:
+                raise CommandStoreException("Unsupported command store version {0}".format(version))
+            index_offset, count, magic = _FOOTER.unpack_from(self._mmap, size - _FOOTER.size)
+            if magic != _MAGIC or index_offset + (count + 1) * 8 != size - _FOOTER.size:
+                raise CommandStoreException("Incomplete command store")
+        except CommandStoreException:
+            self._mmap.close()
+            raise
+        self._index_offset = index_offset
+        self._count = count
+
+    def __enter__(self) -> "CommandStore":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: int) -> Command:
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("store index out of range")
+        start, end = _OFFSETS.unpack_from(self._mmap, self._index_offset + index * 8)
+        records, _ = _decode_value(self._mmap[start:end], 0)
+        return _unflatten_command(records)
+
+    def __iter__(self) -> Iterator[Command]:
+        for index in range(self._count):
+            yield self[index]
+
+    def close(self):
+        """
+        Unmaps the file. Commands that were already materialized stay valid.
+        """
+        self._mmap.close()
+
+
+class CommandStoreException(Exception):
+    pass
+
+
+__all__ = [
+    "CommandStore",
+    "CommandStoreWriter",
+    "CommandStoreException",
+]
@@ -0,0 +1,402 @@
+import sys
+from array import array
+from types import MappingProxyType
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .ast import Command, CommandDescriptor, CommandDescriptorClosed, CommandDescriptors, DefaultFile, File, Word
+from .ast import DESCRIPTOR_DEFAULT_INDEX_STDIN, DESCRIPTOR_DEFAULT_INDEX_STDOUT, DESCRIPTOR_DEFAULT_INDEX_STDERR
+from .ast import _DEFAULT_COMMAND_DESCRIPTORS, _DEFAULT_DESCRIPTOR_TABLE, _MARKERS, _OPERATOR_TAGS, _TARGET_TAGS
+from .ast import _MARKER_DESCRIPTOR_CLOSED, _MARKER_REDIRECTION_INPUT, _COMMAND_DESCRIPTOR_CLOSED
+from .ast import _DESCRIPTOR_READ, _DESCRIPTOR_WRITE, _OPERATOR_AND, _OPERATOR_OR
+from .ast import _new_command, _new_descriptor, _new_descriptors, _new_file, _new_file_descriptor, _new_word
+from .parser import Parser, _parse_statements_into
+
+
+# Typecodes for the columns. Row numbers, string ids, file descriptors and
+# span offsets fit in a C int; offsets into the word and descriptor columns
+# may grow past that on large corpora.
+_INDEX = "i"
+_OFFSET = "q"
+
+_FLAG_ASYNCHRONOUS = 1
+_FLAG_OPERATOR_AND = 2
+_FLAG_OPERATOR_OR = 4
+
+_INDEX_MAX = 2 ** 31 - 1
+
+_DEFAULT_FDS = (DESCRIPTOR_DEFAULT_INDEX_STDIN, DESCRIPTOR_DEFAULT_INDEX_STDOUT, DESCRIPTOR_DEFAULT_INDEX_STDERR)
+
+
+class CommandTable(object):
+    """
+    A compact, columnar store for large numbers of parsed statements.
+
+    Instead of keeping a graph of :class:`shell_parser.ast.Command` objects,
+    every command becomes a row spread over flat :mod:`array` columns: its
+    words, the commands it pipes to and chains to, its operator and flags,
+    and only the descriptors that differ from the default stdin, stdout and
+    stderr. Words and file names are kept once each, in a pool of interned
+    strings. Commands are only materialized again when they are accessed.
+
+    Rows are numbered in the order the commands were added. The commands of
+    a statement are laid out in pre-order: each command, then the commands
+    it pipes to, then the commands it is chained to.
+    """
+
+    def __init__(self):
+        self._strings: List[str] = []
+        self._string_ids: Dict[str, int] = {}
+        self._statements = array(_INDEX)
+
+        # One entry per row.
+        self._word_offsets = array(_OFFSET, (0,))
+        self._descriptor_offsets = array(_OFFSET, (0,))
+        self._pipe_rows = array(_INDEX)
+        self._next_rows = array(_INDEX)
+        self._flags = array("B")
+        self._spans = array(_INDEX)
+
+        # One entry per word, command words included.
+        self._words = array(_INDEX)
+        self._word_spans = array(_INDEX)
+
+        # One entry per descriptor that isn't one of the defaults.
+        self._descriptor_fds = array(_INDEX)
+        self._descriptor_kinds = array("B")
+        self._descriptor_targets = array(_INDEX)
+        self._descriptor_spans = array(_INDEX)
+
+    def __len__(self) -> int:
+        return len(self._statements)
+
+    def __getitem__(self, index: int) -> Command:
+        return self.command(self._statements[index])
+
+    def __iter__(self) -> Iterator[Command]:
+        for row in self._statements:
+            yield self.command(row)
+
+    @property
+    def rows(self) -> int:
+        """
+        :returns: The number of commands in the table, across all statements.
+        :rtype: int
+        """
+        return len(self._pipe_rows)
+
+    def append(self, first_cmd: Command) -> int:
+        """
+        Adds a parsed statement to the table.
+
+        :param first_cmd: The first command of the statement, as returned by
+                          :func:`shell_parser.parser.Parser.parse`.
+        :type first_cmd: Command
+        :returns: The index of the statement in the table.
+        :rtype: int
+        :raises CommandTableException: If the statement holds anything the
+                                       parser can't produce, such as words
+                                       that aren't :class:`Word` objects.
+        """
+
+        # Number the commands first, so that links can be written as rows.
+        cmds = []
+        stack = [first_cmd]
+        while stack:
+            cmd = stack.pop()
+            cmds.append(cmd)
+            if cmd.next_command is not None:
+                stack.append(cmd.next_command)
+            if cmd.pipe_command is not None:
+                stack.append(cmd.pipe_command)
+        first_row = self.rows
+        rows = {id(cmd): first_row + i for i, cmd in enumerate(cmds)}
+
+        # Check and encode everything before touching the columns, so that a
+        # rejected statement leaves the table as it was.
+        encoded = [self._encode_command(cmd, rows) for cmd in cmds]
+        for words, word_spans, descriptors, pipe_row, next_row, flags, span in encoded:
+            for word in words:
+                self._words.append(self._intern(word))
+            self._word_spans.extend(word_spans)
+            self._word_offsets.append(len(self._words))
+            for fd, kind, target, target_span in descriptors:
+                self._descriptor_fds.append(fd)
+                self._descriptor_kinds.append(kind)
+                self._descriptor_targets.append(self._intern(target) if type(target) is str else target)
+                self._descriptor_spans.extend(target_span)
+            self._descriptor_offsets.append(len(self._descriptor_fds))
+            self._pipe_rows.append(pipe_row)
+            self._next_rows.append(next_row)
+            self._flags.append(flags)
+            self._spans.extend(span)
+
+        self._statements.append(first_row)
+        return len(self._statements) - 1
+
+    def add_statements(
+            self,
+            statements: Iterable[str],
+            parser: Optional[Parser] = None,
+            *,
+            workers: Optional[int] = None,
+            chunksize: int = 512,
+        ) -> List[Tuple[int, Exception]]:
+        """
+        Parses many command line strings with
+        :func:`shell_parser.parser.Parser.parse_many`, and adds every
+        statement that was parsed to the table, in input order.
+
+        :param statements: The command line strings to be parsed.
+        :type statements: Iterable[str]
+        :param parser: The parser to use. Defaults to a parser with the
+                       default settings.
+        :type parser: Parser
+        :param workers: The number of worker processes to use. Defaults to the
+                        number of CPUs on the machine.
+        :type workers: int
+        :param chunksize: The number of statements sent to a worker process
+                          in one go.
+        :type chunksize: int
+        :returns: The position in ``statements`` and the exception for every
+                  statement that could not be parsed.
+        :rtype: List[Tuple[int, Exception]]
+        """
+
+        return _parse_statements_into(self.append, statements, parser, workers, chunksize)
+
+    def command_name(self, row: int) -> str:
+        """
+        :param row: The row of the command.
+        :type row: int
+        :returns: The name of the command, without materializing it.
+        :rtype: str
+        """
+        return self._strings[self._words[self._word_offsets[self._row(row)]]]
+
+    def args(self, row: int) -> Tuple[str, ...]:
+        """
+        :param row: The row of the command.
+        :type row: int
+        :returns: The arguments of the command, without materializing it.
+        :rtype: Tuple[str, ...]
+        """
+        row = self._row(row)
+        strings = self._strings
+        words = self._words
+        return tuple(strings[words[i]] for i in range(self._word_offsets[row] + 1, self._word_offsets[row + 1]))
+
+    def command(self, row: int) -> Command:
+        """
+        Materializes the command in a row, along with every command it pipes
+        to or is chained to.
+
+        :param row: The row of the command.
+        :type row: int
+        :returns: A command equal to the one that was added to the table.
+        :rtype: Command
+        """
+
+        row = self._row(row)
+        # Build the commands after the commands they link to, in the same
+        # way as CommandBuilder.create.
+        rows = []
+        stack = [row]
+        while stack:
+            current = stack.pop()
+            rows.append(current)
+            if self._next_rows[current] >= 0:
+                stack.append(self._next_rows[current])
+            if self._pipe_rows[current] >= 0:
+                stack.append(self._pipe_rows[current])
+
+        created: Dict[int, Command] = {}
+        for current in reversed(rows):
+            words = self._decode_words(current)
+            pipe_row = self._pipe_rows[current]
+            next_row = self._next_rows[current]
+            flags = self._flags[current]
+            if flags & _FLAG_OPERATOR_AND:
+                operator = _OPERATOR_AND
+            elif flags & _FLAG_OPERATOR_OR:
+                operator = _OPERATOR_OR
+            else:
+                operator = None
+            created[current] = _new_command(
+                words[0],
+                self._decode_descriptors(current),
+                tuple(words[1:]),
+                created[pipe_row] if pipe_row >= 0 else None,
+                created[next_row] if next_row >= 0 else None,
+                operator,
+                bool(flags & _FLAG_ASYNCHRONOUS),
+                self._decode_span(self._spans, current),
+            )
+        return created[row]
+
+    def memory_usage(self) -> int:
+        """
+        :returns: The number of bytes used by the columns and the string
+                  pool, not counting the interpreter's overhead for the
+                  table object itself.
+        :rtype: int
+        """
+
+        size = 0
+        for column in (
+            self._statements,
+            self._word_offsets,
+            self._descriptor_offsets,
+            self._pipe_rows,
+            self._next_rows,
+            self._flags,
+            self._spans,
+            self._words,
+            self._word_spans,
+            self._descriptor_fds,
+            self._descriptor_kinds,
+            self._descriptor_targets,
+            self._descriptor_spans,
+        ):
+            size += column.buffer_info()[1] * column.itemsize
+        size += sys.getsizeof(self._strings) + sys.getsizeof(self._string_ids)
+        size += sum(sys.getsizeof(string) for string in self._strings)
+        return size
+
+    def _row(self, row: int) -> int:
+        rows = self.rows
+        if row < 0:
+            row += rows
+        if not 0 <= row < rows:
+            raise IndexError("row out of range")
+        return row
+
+    def _intern(self, string: str) -> int:
+        string_id = self._string_ids.get(string)
+        if string_id is None:
+            string_id = len(self._strings)
+            self._strings.append(string)
+            self._string_ids[string] = string_id
+        return string_id
+
+    def _encode_command(self, cmd: Command, rows: Dict[int, int]) -> tuple:
+        words = [cmd.command]
+        words.extend(cmd.args)
+        word_strings = []
+        word_spans = []
+        for word in words:
+            if type(word) is not Word:
+                raise CommandTableException("Only Word objects can be stored as words")
+            word_strings.append(word.word)
+            word_spans.extend(_encode_span(word.span))
+
+        descriptors = cmd.descriptors
+        if type(descriptors) is not CommandDescriptors:
+            raise CommandTableException("Only CommandDescriptors objects can be stored as descriptors")
+        table = descriptors.descriptors
+        for fd in _DEFAULT_FDS:
+            if fd not in table:
+                raise CommandTableException("Descriptor {0} is missing".format(fd))
+        encoded_descriptors = []
+        for fd, descriptor in table.items():
+            if fd in _DEFAULT_FDS and descriptor == _DEFAULT_DESCRIPTOR_TABLE[fd]:
+                continue
+            encoded_descriptors.append(_encode_descriptor(fd, descriptor))
+
+        flags = 0
+        if cmd.asynchronous:
+            flags |= _FLAG_ASYNCHRONOUS
+        if cmd.next_command_operator is _OPERATOR_AND:
+            flags |= _FLAG_OPERATOR_AND
+        elif cmd.next_command_operator is _OPERATOR_OR:
+            flags |= _FLAG_OPERATOR_OR
+        elif cmd.next_command_operator is not None:
+            raise CommandTableException("Unknown command operator {0!r}".format(cmd.next_command_operator))
+        return (
+            word_strings,
+            word_spans,
+            encoded_descriptors,
+            rows[id(cmd.pipe_command)] if cmd.pipe_command is not None else -1,
+            rows[id(cmd.next_command)] if cmd.next_command is not None else -1,
+            flags,
+            _encode_span(cmd.span),
+        )
+
+    def _decode_words(self, row: int) -> List[Word]:
+        strings = self._strings
+        words = self._words
+        word_spans = self._word_spans
+        return [
+            _new_word(strings[words[i]], self._decode_span(word_spans, i))
+            for i in range(self._word_offsets[row], self._word_offsets[row + 1])
+        ]
+
+    def _decode_descriptors(self, row: int) -> CommandDescriptors:
+        start = self._descriptor_offsets[row]
+        end = self._descriptor_offsets[row + 1]
+        if start == end:
+            return _DEFAULT_COMMAND_DESCRIPTORS
+
+        descriptors = dict(_DEFAULT_DESCRIPTOR_TABLE)
+        for i in range(start, end):
+            kind = self._descriptor_kinds[i]
+            if kind == _MARKER_DESCRIPTOR_CLOSED:
+                descriptors[self._descriptor_fds[i]] = _COMMAND_DESCRIPTOR_CLOSED
+                continue
+            target_code = self._descriptor_targets[i]
+            if target_code < 0:
+                target = DefaultFile(target=_MARKERS[-1 - target_code])
+            else:
+                target = _new_file(self._strings[target_code], self._decode_span(self._descriptor_spans, i))
+            descriptors[self._descriptor_fds[i]] = _new_descriptor(
+                _DESCRIPTOR_READ if kind == _MARKER_REDIRECTION_INPUT else _DESCRIPTOR_WRITE,
+                _new_file_descriptor(target, _MARKERS[kind]),
+            )
+        return _new_descriptors(MappingProxyType(descriptors))
+
+    @staticmethod
+    def _decode_span(spans: array, index: int) -> Optional[Tuple[int, int]]:
+        start = spans[index * 2]
+        if start < 0:
+            return None
+        return (start, spans[index * 2 + 1])
+
+
+def _encode_span(span: Optional[Tuple[int, int]]) -> Tuple[int, int]:
+    if span is None:
+        return (-1, -1)
+    return span
+
+
+def _encode_descriptor(fd: int, descriptor: Union[CommandDescriptor, CommandDescriptorClosed]) -> tuple:
+    # Descriptors are stored as (fd, kind, target, span). The kind is the
+    # marker tag of the redirection operator, or of CommandDescriptorClosed.
+    # The target is a file name, or minus one minus the marker tag of a
+    # default file target.
+    if fd > _INDEX_MAX:
+        raise CommandTableException("File descriptor {0} is too large".format(fd))
+    if descriptor is _COMMAND_DESCRIPTOR_CLOSED:
+        return (fd, _MARKER_DESCRIPTOR_CLOSED, -1, (-1, -1))
+    if type(descriptor) is not CommandDescriptor:
+        raise CommandTableException("Unknown descriptor {0!r}".format(descriptor))
+    file_descriptor = descriptor.descriptor
+    kind = _OPERATOR_TAGS.get(type(file_descriptor.operator))
+    if kind is None:
+        raise CommandTableException("Unknown redirection operator {0!r}".format(file_descriptor.operator))
+    target = file_descriptor.target
+    if type(target) is File:
+        return (fd, kind, target.name, _encode_span(target.span))
+    if type(target) is DefaultFile:
+        target_tag = _TARGET_TAGS.get(type(target.target))
+        if target_tag is not None:
+            return (fd, kind, -1 - target_tag, (-1, -1))
+    raise CommandTableException("Unknown redirection target {0!r}".format(target))
+
+
+class CommandTableException(Exception):
+    pass
+
+
+__all__ = [
+    "CommandTable",
+    "CommandTableException",
+]
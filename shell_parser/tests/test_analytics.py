@@ -0,0 +1,51 @@
+import pytest
+
+from shell_parser.parser import Parser
+from shell_parser.table import CommandTable
+
+numpy = pytest.importorskip("numpy")
+
+from shell_parser import analytics  # noqa: E402
+
+
+STATEMENTS = (
+    "cat in.txt | grep a | sort > out.txt 2>&1",
+    "make && make test || echo failed > log.txt",
+    "sleep 10 & ls 3>&- < in.txt",
+    "grep b log.txt | sort",
+)
+
+
+@pytest.fixture
+def table() -> CommandTable:
+    table = CommandTable()
+    parser = Parser()
+    for line in STATEMENTS:
+        table.append(parser.parse(line))
+    return table
+
+
+def test_command_name_counts(table: CommandTable):
+    counts = analytics.command_name_counts(table)
+    assert counts == {"cat": 1, "grep": 2, "sort": 2, "make": 2, "echo": 1, "sleep": 1, "ls": 1}
+    assert list(counts)[:3] == ["grep", "sort", "make"]
+
+
+def test_pipeline_length_histogram(table: CommandTable):
+    assert analytics.pipeline_length_histogram(table) == {1: 5, 2: 1, 3: 1}
+
+
+def test_redirect_target_counts(table: CommandTable):
+    assert analytics.redirect_target_counts(table) == {"out.txt": 2, "log.txt": 1, "in.txt": 1}
+
+
+def test_operator_counts(table: CommandTable):
+    assert analytics.operator_counts(table) == {"&&": 1, "||": 1, "&": 1}
+
+
+def test_empty_table():
+    table = CommandTable()
+    assert analytics.command_name_counts(table) == {}
+    assert analytics.pipeline_length_histogram(table) == {}
+    assert analytics.redirect_target_counts(table) == {}
+    assert analytics.operator_counts(table) == {"&&": 0, "||": 0, "&": 0}
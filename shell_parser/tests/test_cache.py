@@ -0,0 +1,117 @@
+import pytest
+
+from shell_parser.cache import ParseCache, estimate_size
+from shell_parser.parser import Parser, EmptyInputException, UnclosedQuoteParserFailure
+
+
+def test_hits_and_misses():
+    cache = ParseCache()
+    parser = Parser(cache=cache)
+
+    first = parser.parse("git status")
+    second = parser.parse("git status")
+    assert second is first
+    assert parser.parse("ls -la") == Parser().parse("ls -la")
+
+    assert cache.stats() == {
+        "hits": 1,
+        "misses": 2,
+        "evictions": 0,
+        "entries": 2,
+        "size_bytes": cache.size_bytes,
+    }
+    assert cache.size_bytes > 0
+    assert len(cache) == 2
+    assert "git status" in cache
+
+
+def test_failures_are_replayed():
+    cache = ParseCache()
+    parser = Parser(cache=cache)
+
+    with pytest.raises(UnclosedQuoteParserFailure) as first_excinfo:
+        parser.parse("cmd 'unclosed")
+    with pytest.raises(UnclosedQuoteParserFailure) as second_excinfo:
+        parser.parse("cmd 'unclosed")
+
+    assert second_excinfo.value is not first_excinfo.value
+    assert str(second_excinfo.value) == str(first_excinfo.value)
+    assert second_excinfo.value.pos == first_excinfo.value.pos == 13
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+    with pytest.raises(EmptyInputException):
+        parser.parse("   ")
+    with pytest.raises(EmptyInputException):
+        parser.parse("   ")
+    assert cache.hits == 2
+
+
+def test_entry_limit_evicts_least_recently_used():
+    cache = ParseCache(max_entries=2)
+    parser = Parser(cache=cache)
+
+    parser.parse("cmd1")
+    parser.parse("cmd2")
+    parser.parse("cmd1")
+    parser.parse("cmd3")
+
+    assert "cmd1" in cache
+    assert "cmd2" not in cache
+    assert "cmd3" in cache
+    assert cache.evictions == 1
+
+
+def test_byte_limit():
+    first_cmd = Parser().parse("cmd1 arg")
+    entry_size = estimate_size("cmd1 arg", first_cmd)
+
+    cache = ParseCache(max_entries=None, max_bytes=entry_size * 2)
+    parser = Parser(cache=cache)
+    for i in range(10):
+        parser.parse("cmd{0} arg".format(i))
+
+    assert len(cache) == 2
+    assert cache.evictions == 8
+    assert cache.size_bytes <= entry_size * 2
+
+
+def test_longer_statements_are_larger():
+    parser = Parser()
+    short = estimate_size("cmd", parser.parse("cmd"))
+    long = estimate_size("cmd1 arg | cmd2 arg", parser.parse("cmd1 arg | cmd2 arg"))
+    assert long > short
+
+
+def test_clear():
+    cache = ParseCache()
+    parser = Parser(cache=cache)
+    parser.parse("cmd")
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.size_bytes == 0
+    assert cache.misses == 1
+
+
+def test_parse_many_workers():
+    cache = ParseCache()
+    parser = Parser(cache=cache)
+    parser.parse("ls -la")
+    lines = ["ls -la", "cmd 'unclosed", "git status", "ls -la", "sort < in"] * 3
+
+    results = list(parser.parse_many(lines, workers=2, chunksize=2))
+    expected = list(Parser().parse_many(lines, workers=1))
+    assert [type(result) for result in results] == [type(result) for result in expected]
+    assert [result for result in results if not isinstance(result, Exception)] == [
+        result for result in expected if not isinstance(result, Exception)
+    ]
+    assert "git status" in cache
+    assert "cmd 'unclosed" in cache
+    assert cache.hits >= 6
+
+    # Everything is cached now, so every statement is a hit.
+    hits = cache.hits
+    misses = cache.misses
+    assert len(list(parser.parse_many(lines, workers=2, chunksize=2))) == len(lines)
+    assert cache.hits == hits + len(lines)
+    assert cache.misses == misses
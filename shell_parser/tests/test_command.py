@@ -3,7 +3,7 @@ import pytest
 import dataclasses
 import re
 
-from shell_parser.ast import Command, InvalidCommandDataException, Word, File, RedirectionOutput, RedirectionAppend, OperatorAnd, OperatorOr
+from shell_parser.ast import Command, CommandDescriptorsBuilder, InvalidCommandDataException, Word, File, RedirectionOutput, RedirectionAppend, OperatorAnd, OperatorOr
 
 
 def make_match(msg: str) -> str:
@@ -41,3 +41,56 @@ def test_immutability():
         cmd.next_command_operator = None
     with pytest.raises(dataclasses.FrozenInstanceError):
         cmd.asynchronous = True
+
+
+def make_chain(length: int, *, pipe: bool = False, last_word: str = "cmd") -> Command:
+    descriptors = CommandDescriptorsBuilder().create()
+    cmd = Command(command=Word(last_word), descriptors=descriptors)
+    for i in range(length - 1):
+        if pipe:
+            cmd = Command(command=Word("cmd"), descriptors=descriptors, pipe_command=cmd)
+        else:
+            cmd = Command(command=Word("cmd"), descriptors=descriptors, next_command=cmd, next_command_operator=OperatorAnd())
+    return cmd
+
+
+def test_equality_and_hashing():
+    cmd1 = Command(command=Word("cmd"), descriptors=CommandDescriptorsBuilder().create(), args=(Word("arg"),))
+    cmd2 = Command(command=Word("cmd"), descriptors=CommandDescriptorsBuilder().create(), args=(Word("arg"),))
+    cmd3 = Command(command=Word("cmd"), descriptors=CommandDescriptorsBuilder().create(), args=(Word("other"),))
+    assert cmd1 == cmd2
+    assert hash(cmd1) == hash(cmd2)
+    assert cmd1 != cmd3
+    assert cmd1 != "cmd arg"
+    assert len({cmd1, cmd2, cmd3}) == 2
+
+
+def test_repr():
+    cmd = Command(
+        command=Word("cmd1"),
+        descriptors={},
+        pipe_command=Command(command=Word("cmd2"), descriptors={}),
+        next_command=Command(command=Word("cmd3"), descriptors={}, asynchronous=True),
+        next_command_operator=OperatorOr(),
+    )
+    assert repr(cmd) == (
+        "Command(command=<Word word=cmd1>, descriptors={}, args=(), "
+        "pipe_command=Command(command=<Word word=cmd2>, descriptors={}, args=(), pipe_command=None, "
+        "next_command=None, next_command_operator=None, asynchronous=False), "
+        "next_command=Command(command=<Word word=cmd3>, descriptors={}, args=(), pipe_command=None, "
+        "next_command=None, next_command_operator=None, asynchronous=True), "
+        "next_command_operator=<OperatorOr>, asynchronous=False)"
+    )
+
+
+@pytest.mark.parametrize("pipe", (False, True))
+def test_long_chains(pipe: bool):
+    # None of these may recurse, or they would hit the recursion limit.
+    cmd1 = make_chain(10000, pipe=pipe)
+    cmd2 = make_chain(10000, pipe=pipe)
+    cmd3 = make_chain(10000, pipe=pipe, last_word="different")
+
+    assert cmd1 == cmd2
+    assert cmd1 != cmd3
+    assert hash(cmd1) == hash(cmd2)
+    assert repr(cmd1).count("Command(") == 10000
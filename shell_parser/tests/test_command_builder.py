@@ -2,7 +2,10 @@ import pytest
 
 import re
 
-from shell_parser.ast import CommandBuilder, CommandBuilderCreateException
+from shell_parser.ast import CommandBuilder, CommandBuilderCreateException, OperatorAnd, Word
+from shell_parser.ast import InvalidCommandDataException
+from shell_parser.handler import ASTBuilder
+from shell_parser.parser import Parser
 
 
 def make_match(msg: str) -> str:
@@ -13,3 +16,65 @@ def test_no_words():
     builder = CommandBuilder()
     with pytest.raises(CommandBuilderCreateException, match=make_match("No command words added.")):
         builder.create()
+
+
+def test_no_words_in_linked_builder():
+    builder = CommandBuilder(words=[Word("cmd1")])
+    builder.next_command = CommandBuilder(words=[Word("cmd2")])
+    builder.next_command.pipe_command = CommandBuilder()
+    with pytest.raises(CommandBuilderCreateException, match=make_match("No command words added.")):
+        builder.create()
+
+
+def test_create_links():
+    builder = CommandBuilder(words=[Word("cmd1"), Word("arg1")])
+    builder.pipe_command = CommandBuilder(words=[Word("cmd2")])
+    builder.next_command = CommandBuilder(words=[Word("cmd3")], asynchronous=True)
+    builder.next_command_operator = OperatorAnd()
+    cmd = builder.create()
+
+    assert cmd.command == Word("cmd1")
+    assert cmd.args == (Word("arg1"),)
+    assert cmd.pipe_command.command == Word("cmd2")
+    assert cmd.pipe_command.next_command is None
+    assert cmd.next_command.command == Word("cmd3")
+    assert cmd.next_command.asynchronous is True
+    assert cmd.next_command_operator == OperatorAnd()
+
+
+@pytest.mark.parametrize("link", ("pipe_command", "next_command"))
+def test_create_long_chain(link: str):
+    first_builder = builder = CommandBuilder(words=[Word("cmd0")])
+    for i in range(1, 10000):
+        next_builder = CommandBuilder(words=[Word("cmd{0}".format(i))])
+        setattr(builder, link, next_builder)
+        builder = next_builder
+
+    cmd = first_builder.create()
+    count = 0
+    while cmd is not None:
+        assert cmd.command == Word("cmd{0}".format(count))
+        count += 1
+        cmd = getattr(cmd, link)
+    assert count == 10000
+
+
+def test_create_validates():
+    builder = CommandBuilder(words=[Word("cmd1")])
+    builder.next_command_operator = OperatorAnd()
+    with pytest.raises(InvalidCommandDataException):
+        builder.create()
+
+
+@pytest.mark.parametrize("line", (
+    "cmd1 arg1",
+    "cmd1 'arg 1' < in.txt 2>&1 3>&- | cmd2 >> out.txt && cmd3 & cmd4 || cmd5",
+))
+def test_parser_matches_create(line: str):
+    # The parser skips the checks made by create, and must end up with the
+    # same commands.
+    handler = ASTBuilder()
+    Parser().parse_events(line, handler)
+    cmd = handler.first_command_builder.create()
+    assert Parser().parse(line) == cmd
+    assert repr(Parser().parse(line)) == repr(cmd)
@@ -3,7 +3,7 @@ import pytest
 from dataclasses import FrozenInstanceError
 import re
 
-from shell_parser.ast import CommandDescriptorsBuilder, CommandDescriptor, CommandFileDescriptor, File
+from shell_parser.ast import CommandDescriptorsBuilder, CommandDescriptor, CommandDescriptorClosed, CommandFileDescriptor, File
 from shell_parser.ast import RedirectionOutput, DescriptorWrite
 from shell_parser.ast import BadFileDescriptorException, InvalidFileDescriptorException
 from shell_parser.ast import (
@@ -88,6 +88,47 @@ def test_default_create():
         descriptor_container.descriptors = {}
 
 
+def test_default_create_shared():
+    builder1 = CommandDescriptorsBuilder()
+    builder2 = CommandDescriptorsBuilder()
+    assert builder1.create() is builder2.create()
+
+
+def test_copy_on_write():
+    builder1 = CommandDescriptorsBuilder()
+    builder2 = CommandDescriptorsBuilder()
+    builder1.close_descriptor(DESCRIPTOR_DEFAULT_INDEX_STDOUT)
+    assert isinstance(builder1.descriptors[DESCRIPTOR_DEFAULT_INDEX_STDOUT], CommandDescriptorClosed)
+    assert builder2.descriptors[DESCRIPTOR_DEFAULT_INDEX_STDOUT].descriptor.is_default_file is True
+    default = CommandDescriptorsBuilder().create()
+    assert default.descriptors[DESCRIPTOR_DEFAULT_INDEX_STDOUT].descriptor.is_default_file is True
+
+
+def test_create_after_change():
+    builder = CommandDescriptorsBuilder()
+    builder.duplicate_descriptor(DESCRIPTOR_DEFAULT_INDEX_STDOUT, DESCRIPTOR_DEFAULT_INDEX_STDERR)
+    first = builder.create()
+    builder.close_descriptor(DESCRIPTOR_DEFAULT_INDEX_STDIN)
+    second = builder.create()
+    assert first.descriptors[DESCRIPTOR_DEFAULT_INDEX_STDIN].descriptor.is_default_file is True
+    assert isinstance(second.descriptors[DESCRIPTOR_DEFAULT_INDEX_STDIN], CommandDescriptorClosed)
+    assert first.descriptors[DESCRIPTOR_DEFAULT_INDEX_STDERR] == second.descriptors[DESCRIPTOR_DEFAULT_INDEX_STDERR]
+
+
+def test_direct_changes():
+    builder = CommandDescriptorsBuilder()
+    builder.descriptors[3] = CommandDescriptorClosed()
+    first = builder.create()
+    assert isinstance(first.descriptors[3], CommandDescriptorClosed)
+
+    builder.descriptors[4] = CommandDescriptorClosed()
+    del builder.descriptors[DESCRIPTOR_DEFAULT_INDEX_STDIN]
+    second = builder.create()
+    assert first.descriptors.keys() == DEFAULT_DESCRIPTOR_FDS | {3}
+    assert second.descriptors.keys() == {DESCRIPTOR_DEFAULT_INDEX_STDOUT, DESCRIPTOR_DEFAULT_INDEX_STDERR, 3, 4}
+    assert CommandDescriptorsBuilder().create().descriptors.keys() == DEFAULT_DESCRIPTOR_FDS
+
+
 def test_non_equality():
     builder1 = CommandDescriptorsBuilder()
     builder2 = CommandDescriptorsBuilder()
@@ -0,0 +1,97 @@
+import pytest
+
+import random
+
+from shell_parser.ast import BadFileDescriptorException
+from shell_parser.parser import ENGINES, Parser, ParseResult, Diagnostic, EmptyInputException
+from shell_parser.parser import UnclosedQuoteParserFailure, EmptyStatementParserFailure, EmptyRedirectParserFailure
+from shell_parser.parser import UnexpectedStatementFinishParserFailure, InvalidRedirectionParserFailure
+
+
+ALPHABET = (" ", "\t", "\\", "'", '"', ";", ">", "<", "&", "|", "-", "$", "0", "1", "2", "12", "a", "b", "cmd", "file")
+
+EMPTY_STATEMENT = "Statement terminator found without any preceding statement."
+
+
+@pytest.fixture(params=ENGINES)
+def parser(request) -> Parser:
+    return Parser(engine=request.param)
+
+
+def summarize(result: ParseResult):
+    return [(diagnostic.exception_class, diagnostic.pos) for diagnostic in result.diagnostics]
+
+
+def test_valid_statement(parser: Parser):
+    result = parser.parse_with_diagnostics("cmd a > f && b | c")
+    assert result.ok
+    assert result.command == parser.parse("cmd a > f && b | c")
+    assert result.diagnostics == ()
+
+
+def test_empty_statement(parser: Parser):
+    result = parser.parse_with_diagnostics("  ")
+    assert not result.ok
+    assert result.command is None
+    assert result.diagnostics == (
+        Diagnostic(EmptyInputException, "Input statement was empty or contained only whitespace.", None),
+    )
+
+
+def test_reports_every_failure(parser: Parser):
+    result = parser.parse_with_diagnostics("  a >; b | ; c 'x;' && d >>& e; f \\; g >")
+    assert not result.ok
+    assert result.command is None
+    assert summarize(result) == [
+        (EmptyRedirectParserFailure, 3),
+        (EmptyStatementParserFailure, 9),
+        (InvalidRedirectionParserFailure, 24),
+        (UnexpectedStatementFinishParserFailure, 37),
+    ]
+    assert result.diagnostics[1].message == EMPTY_STATEMENT
+
+
+def test_resync_steps_over_double_operators(parser: Parser):
+    result = parser.parse_with_diagnostics("; && || a ; ;")
+    assert summarize(result) == [
+        (EmptyStatementParserFailure, 0),
+        (EmptyStatementParserFailure, 2),
+        (EmptyStatementParserFailure, 5),
+        (EmptyStatementParserFailure, 12),
+    ]
+
+
+def test_resync_unclosed_quote(parser: Parser):
+    result = parser.parse_with_diagnostics("a >; b 'c; d")
+    assert summarize(result) == [
+        (EmptyRedirectParserFailure, 3),
+        (UnclosedQuoteParserFailure, 12),
+    ]
+
+
+def test_failure_without_position(parser: Parser):
+    result = parser.parse_with_diagnostics("a >; b 4>&3; c >")
+    assert result.diagnostics == (
+        Diagnostic(EmptyRedirectParserFailure, "No redirect filename provided.", 3),
+        Diagnostic(BadFileDescriptorException, "Bad file descriptor 3", None),
+    )
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_first_diagnostic_matches_parse(seed: int):
+    rng = random.Random(seed)
+    for engine in ENGINES:
+        parser = Parser(engine=engine)
+        for _ in range(300):
+            line = "".join(rng.choice(ALPHABET) for _ in range(rng.randint(1, 20)))
+            result = parser.parse_with_diagnostics(line)
+            try:
+                cmd = parser.parse(line)
+            except Exception as e:
+                assert result.command is None
+                assert result.diagnostics[0] == Diagnostic(e.__class__, str(e), getattr(e, "pos", None)), line
+                positions = [d.pos for d in result.diagnostics if d.pos is not None]
+                assert positions == sorted(positions), line
+            else:
+                assert result.command == cmd
+                assert result.diagnostics == ()
@@ -0,0 +1,202 @@
+import multiprocessing
+import os
+
+import pytest
+
+from shell_parser import disk_cache
+from shell_parser.ast import BadFileDescriptorException
+from shell_parser.disk_cache import DiskParseCache, DiskParseCacheException
+from shell_parser.parser import Parser, EmptyInputException, UnclosedQuoteParserFailure
+
+
+STATEMENTS = [
+    "git status",
+    "cat 'a b' < in.txt | sort -r > out.txt 2>&1 && echo done & wait",
+    "cmd1 || cmd2; cmd3 3>&- 4< /dev/null",
+    "echo \\$HOME \"quoted $word\" >> log.txt",
+]
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "cache.sqlite")
+
+
+def spans(first_cmd):
+    result = []
+    cmd = first_cmd
+    while cmd is not None:
+        result.append((cmd.span, tuple(arg.span for arg in cmd.args)))
+        pipe_cmd = cmd.pipe_command
+        while pipe_cmd is not None:
+            result.append((pipe_cmd.span, tuple(arg.span for arg in pipe_cmd.args)))
+            pipe_cmd = pipe_cmd.pipe_command
+        cmd = cmd.next_command
+    return result
+
+
+def test_hits_and_misses(path):
+    with DiskParseCache(path) as cache:
+        parser = Parser(cache=cache)
+        for statement in STATEMENTS:
+            parser.parse(statement)
+        for statement in STATEMENTS:
+            first_cmd = parser.parse(statement)
+            assert first_cmd == Parser().parse(statement)
+            assert spans(first_cmd) == spans(Parser().parse(statement))
+
+        assert cache.stats() == {
+            "hits": 4,
+            "misses": 4,
+            "evictions": 0,
+            "entries": 4,
+            "size_bytes": cache.stats()["size_bytes"],
+        }
+        assert cache.stats()["size_bytes"] > 0
+        assert len(cache) == 4
+        assert "git status" in cache
+        assert "git log" not in cache
+
+
+def test_survives_restart(path):
+    with DiskParseCache(path) as cache:
+        Parser(cache=cache).parse("git status")
+
+    with DiskParseCache(path) as cache:
+        assert cache.get("git status") == Parser().parse("git status")
+        assert cache.hits == 1
+        assert cache.misses == 0
+
+
+def test_failures_are_replayed(path):
+    with DiskParseCache(path) as cache:
+        parser = Parser(cache=cache)
+        with pytest.raises(UnclosedQuoteParserFailure) as first_excinfo:
+            parser.parse("cmd 'unclosed")
+        with pytest.raises(EmptyInputException):
+            parser.parse("   ")
+        with pytest.raises(BadFileDescriptorException):
+            parser.parse("cmd 2>&7")
+
+    with DiskParseCache(path) as cache:
+        parser = Parser(cache=cache)
+        with pytest.raises(UnclosedQuoteParserFailure) as second_excinfo:
+            parser.parse("cmd 'unclosed")
+        assert str(second_excinfo.value) == str(first_excinfo.value)
+        assert second_excinfo.value.pos == first_excinfo.value.pos == 13
+        with pytest.raises(EmptyInputException):
+            parser.parse("   ")
+        with pytest.raises(BadFileDescriptorException):
+            parser.parse("cmd 2>&7")
+        assert cache.hits == 3
+        assert cache.misses == 0
+
+
+def test_unknown_exceptions_are_not_stored(path):
+    with DiskParseCache(path) as cache:
+        cache.put("cmd", ValueError("not from the parser"))
+        assert "cmd" not in cache
+        assert len(cache) == 0
+
+
+def test_keys_include_the_version(path, monkeypatch):
+    with DiskParseCache(path) as cache:
+        cache.put("git status", Parser().parse("git status"))
+        monkeypatch.setattr(disk_cache, "_KEY_SALT", b"another version\x00")
+        assert cache.get("git status") is None
+
+
+def test_entry_limit_evicts_least_recently_used(path, monkeypatch):
+    times = iter(range(0, 1000, 100))
+    monkeypatch.setattr(disk_cache.time, "time", lambda: next(times))
+
+    with DiskParseCache(path, max_entries=2) as cache:
+        parser = Parser(cache=cache)
+        parser.parse("cmd1")
+        parser.parse("cmd2")
+        parser.parse("cmd1")
+        parser.parse("cmd3")
+
+        assert "cmd1" in cache
+        assert "cmd2" not in cache
+        assert "cmd3" in cache
+        assert cache.evictions == 1
+
+
+def test_byte_limit(path):
+    with DiskParseCache(path, max_entries=None) as cache:
+        cache.put("cmd0 arg", Parser().parse("cmd0 arg"))
+        entry_size = cache.stats()["size_bytes"]
+
+    with DiskParseCache(path, max_entries=None, max_bytes=entry_size * 2) as cache:
+        parser = Parser(cache=cache)
+        for i in range(10):
+            parser.parse("cmd{0} arg".format(i))
+
+        assert len(cache) == 2
+        assert cache.evictions == 8
+        assert cache.stats()["size_bytes"] == entry_size * 2
+
+
+def test_replacing_an_entry(path):
+    with DiskParseCache(path) as cache:
+        cache.put("cmd", Parser().parse("cmd"))
+        cache.put("cmd", Parser().parse("cmd with more arguments"))
+        assert len(cache) == 1
+        assert cache.get("cmd") == Parser().parse("cmd with more arguments")
+
+
+def test_clear(path):
+    with DiskParseCache(path) as cache:
+        parser = Parser(cache=cache)
+        parser.parse("cmd1")
+        parser.parse("cmd1")
+        cache.clear()
+
+        assert len(cache) == 0
+        assert cache.stats()["size_bytes"] == 0
+        assert cache.hits == 1
+
+
+def _fill(path, start):
+    with DiskParseCache(path) as cache:
+        parser = Parser(cache=cache)
+        for i in range(200):
+            parser.parse("cmd{0} arg | sort".format(start + i))
+
+
+def test_shared_between_processes(path):
+    DiskParseCache(path).close()
+    processes = [multiprocessing.Process(target=_fill, args=(path, start)) for start in (0, 100, 200, 300)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    with DiskParseCache(path) as cache:
+        assert len(cache) == 500
+        assert cache.get("cmd42 arg | sort") == Parser().parse("cmd42 arg | sort")
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires fork")
+def test_not_usable_after_fork(path):
+    with DiskParseCache(path) as cache:
+        pid = os.fork()
+        if pid == 0:
+            try:
+                cache.get("cmd")
+            except DiskParseCacheException:
+                os._exit(0)
+            os._exit(1)
+        _, status = os.waitpid(pid, 0)
+        assert status == 0
+
+
+def test_lone_surrogates(path):
+    statement = "cat \udcff"
+    with DiskParseCache(path) as cache:
+        parser = Parser(cache=cache)
+        expected = parser.parse(statement)
+        assert parser.parse(statement) == expected
+        assert cache.hits == 1
@@ -0,0 +1,93 @@
+import pytest
+
+import random
+import re
+
+from shell_parser.ast import Command, File
+from shell_parser.handler import ASTBuilder
+from shell_parser.parser import ENGINE_SCANNER, ENGINE_STATE_MACHINE, ENGINES, Parser
+from shell_parser.parser import UnknownParserEngineException
+
+
+ALPHABET = (" ", "\t", "\\", "'", '"', ";", ">", "<", "&", "|", "-", "$", "0", "1", "2", "12", "a", "b", "cmd", "file")
+
+
+def make_match(msg: str) -> str:
+    return "^" + re.escape(msg) + "$"
+
+
+def collect_spans(first_cmd: Command):
+    # Spans don't take part in AST comparisons, so gather them separately.
+    spans = []
+    stack = [first_cmd]
+    while stack:
+        cmd = stack.pop()
+        spans.append(cmd.span)
+        spans.append(tuple(word.span for word in [cmd.command, *cmd.args]))
+        for fd, descriptor in sorted(cmd.descriptors.descriptors.items()):
+            target = getattr(getattr(descriptor, "descriptor", None), "target", None)
+            if isinstance(target, File):
+                spans.append((fd, target.span))
+        if cmd.next_command is not None:
+            stack.append(cmd.next_command)
+        if cmd.pipe_command is not None:
+            stack.append(cmd.pipe_command)
+    return spans
+
+
+def parse_outcome(parser: Parser, line: str):
+    try:
+        cmd = parser.parse(line)
+    except Exception as e:
+        return ("error", e.__class__, str(e), getattr(e, "pos", None))
+    return ("ok", cmd, collect_spans(cmd))
+
+
+def test_default_engine():
+    assert Parser().engine == ENGINE_STATE_MACHINE
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_engine_selection(engine: str):
+    assert Parser(engine=engine).engine == engine
+
+
+def test_unknown_engine():
+    with pytest.raises(UnknownParserEngineException, match=make_match("Unknown parser engine 'bogus'.")):
+        Parser(engine="bogus")
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_engines_agree_on_random_input(seed: int):
+    # Both engines must produce identical ASTs, and fail in exactly the same
+    # way (same exception, message and position) for malformed input.
+    rng = random.Random(seed)
+    state_machine = Parser(engine=ENGINE_STATE_MACHINE)
+    scanner = Parser(engine=ENGINE_SCANNER)
+    for _ in range(500):
+        line = "".join(rng.choice(ALPHABET) for _ in range(rng.randint(1, 16)))
+        assert parse_outcome(scanner, line) == parse_outcome(state_machine, line), line
+
+
+PLAIN_ALPHABET = (" ", "\t", "-", "$", "0", "1", "12", "a", "b", "cmd", "file", "é", "\xa0", "　", "\x1c", "\n")
+
+
+@pytest.mark.parametrize("spans", (True, False))
+@pytest.mark.parametrize("seed", range(5))
+def test_plain_statements_match_state_machine(seed: int, spans: bool):
+    # Statements without metacharacters skip the engines altogether, and
+    # must come out exactly as the state machine would have parsed them.
+    rng = random.Random(seed)
+    parser = Parser(spans=spans)
+    for _ in range(500):
+        line = "".join(rng.choice(PLAIN_ALPHABET) for _ in range(rng.randint(1, 16)))
+        stripped = line.strip()
+        if not stripped:
+            continue
+        lead = len(line) - len(line.lstrip())
+        handler = ASTBuilder()
+        parser._parse_state_machine(stripped, lead, handler)
+        expected = handler.result()
+        cmd = parser.parse(line)
+        assert cmd == expected, line
+        assert collect_spans(cmd) == collect_spans(expected), line
@@ -0,0 +1,160 @@
+import pytest
+
+import random
+
+from shell_parser.handler import ParseHandler, ASTBuilder
+from shell_parser.parser import ENGINES, Parser, EmptyInputException, EmptyRedirectParserFailure
+
+
+ALPHABET = (" ", "\t", "\\", "'", '"', ";", ">", "<", "&", "|", "-", "$", "0", "1", "2", "12", "a", "b", "cmd", "file")
+
+
+class RecordingHandler(ParseHandler):
+    def __init__(self):
+        self.events = []
+
+    def on_word(self, word, span):
+        self.events.append(("word", word, span))
+
+    def on_redirect(self, fd, op, target, span):
+        self.events.append(("redirect", fd, op, target, span))
+
+    def on_dup(self, fd, src_fd):
+        self.events.append(("dup", fd, src_fd))
+
+    def on_close(self, fd):
+        self.events.append(("close", fd))
+
+    def on_pipe(self, command_span):
+        self.events.append(("pipe", command_span))
+
+    def on_operator(self, op):
+        self.events.append(("operator", op))
+
+    def on_statement_end(self, asynchronous, command_span):
+        self.events.append(("end", asynchronous, command_span))
+
+
+class CountingHandler(ParseHandler):
+    def __init__(self):
+        self.words = 0
+        self.statements = 0
+
+    def on_word(self, word, span):
+        self.words += 1
+
+    def on_statement_end(self, asynchronous, command_span):
+        self.statements += 1
+
+
+def record(parser: Parser, line: str):
+    handler = RecordingHandler()
+    try:
+        parser.parse_events(line, handler)
+    except Exception as e:
+        return handler.events, (e.__class__, str(e), getattr(e, "pos", None))
+    return handler.events, None
+
+
+@pytest.fixture(params=ENGINES)
+def parser(request) -> Parser:
+    return Parser(engine=request.param)
+
+
+def test_events(parser: Parser):
+    handler = RecordingHandler()
+    parser.parse_events(" cat 'a b' < in 2>&1 3>&- | sort >> out && x || y & z;", handler)
+    assert handler.events == [
+        ("word", "cat", (1, 4)),
+        ("word", "a b", (5, 10)),
+        ("redirect", 0, "<", "in", (13, 15)),
+        ("dup", 2, 1),
+        ("close", 3),
+        ("pipe", (1, 25)),
+        ("word", "sort", (28, 32)),
+        ("redirect", 1, ">>", "out", (36, 39)),
+        ("operator", "&&"),
+        ("end", False, (28, 39)),
+        ("word", "x", (43, 44)),
+        ("operator", "||"),
+        ("end", False, (43, 44)),
+        ("word", "y", (48, 49)),
+        ("end", True, (48, 49)),
+        ("word", "z", (52, 53)),
+        ("end", False, (52, 53)),
+    ]
+
+
+def test_plain_statement(parser: Parser):
+    handler = RecordingHandler()
+    parser.parse_events("  ls -la  /tmp ", handler)
+    assert handler.events == [
+        ("word", "ls", (2, 4)),
+        ("word", "-la", (5, 8)),
+        ("word", "/tmp", (10, 14)),
+        ("end", False, (2, 14)),
+    ]
+
+
+def test_without_spans():
+    handler = RecordingHandler()
+    Parser(spans=False).parse_events("ls > out | wc", handler)
+    assert handler.events == [
+        ("word", "ls", None),
+        ("redirect", 1, ">", "out", None),
+        ("pipe", None),
+        ("word", "wc", None),
+        ("end", False, None),
+    ]
+
+
+def test_events_up_to_failure(parser: Parser):
+    handler = RecordingHandler()
+    with pytest.raises(EmptyRedirectParserFailure):
+        parser.parse_events("a; b > ;", handler)
+    assert handler.events == [("word", "a", (0, 1)), ("end", False, (0, 1)), ("word", "b", (3, 4))]
+
+
+def test_empty(parser: Parser):
+    with pytest.raises(EmptyInputException):
+        parser.parse_events("  ", RecordingHandler())
+
+
+def test_counting_handler(parser: Parser):
+    handler = CountingHandler()
+    parser.parse_events("a b c | d e; f && g", handler)
+    assert handler.words == 7
+    assert handler.statements == 3
+
+
+def test_base_handler_ignores_events(parser: Parser):
+    assert parser.parse_events("a > b 2>&1 3>&- | c && d & e", ParseHandler()) is None
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_ast_builder_matches_parse(seed: int):
+    rng = random.Random(seed)
+    for engine in ENGINES:
+        parser = Parser(engine=engine)
+        for _ in range(300):
+            line = "".join(rng.choice(ALPHABET) for _ in range(rng.randint(1, 20)))
+            handler = ASTBuilder()
+            try:
+                expected = parser.parse(line)
+            except Exception as e:
+                with pytest.raises(e.__class__):
+                    parser.parse_events(line, handler)
+                    handler.result()
+            else:
+                parser.parse_events(line, handler)
+                assert handler.result() == expected, line
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_engines_emit_same_events(seed: int):
+    rng = random.Random(seed)
+    parsers = [Parser(engine=engine) for engine in ENGINES]
+    for _ in range(500):
+        line = "".join(rng.choice(ALPHABET) for _ in range(rng.randint(1, 20)))
+        outcomes = [record(parser, line) for parser in parsers]
+        assert all(outcome == outcomes[0] for outcome in outcomes[1:]), line
@@ -0,0 +1,104 @@
+import pytest
+
+import random
+import re
+
+from shell_parser.ast import Word
+from shell_parser.parser import ENGINE_SCANNER, Parser, EmptyInputException, UnsupportedEncodingException
+
+
+ALPHABET = (" ", "\t", "\\", "'", '"', ";", ">", "<", "&", "|", "-", "$", "0", "1", "2", "12", "a", "cmd", "é", "日本", "\xa0")
+
+
+def make_match(msg: str) -> str:
+    return "^" + re.escape(msg) + "$"
+
+
+def parse_outcome(parse, line):
+    try:
+        return ("ok", parse(line))
+    except Exception as e:
+        return ("error", e.__class__, str(e), getattr(e, "pos", None))
+
+
+@pytest.fixture
+def parser() -> Parser:
+    return Parser()
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_matches_parse_on_random_input(seed: int):
+    rng = random.Random(seed)
+    parser = Parser(engine=ENGINE_SCANNER)
+    for _ in range(300):
+        line = "".join(rng.choice(ALPHABET) for _ in range(rng.randint(1, 16))).strip()
+        if not line:
+            continue
+        expected = parse_outcome(parser.parse, line)
+        outcome = parse_outcome(parser.parse_bytes, line.encode("utf-8"))
+        if not line.isascii():
+            # Failure positions are byte offsets, so only match for ASCII.
+            expected = expected[:3]
+            outcome = outcome[:3]
+        assert outcome == expected, line
+
+
+@pytest.mark.parametrize("data_type", (bytes, bytearray, memoryview))
+def test_input_types(parser: Parser, data_type):
+    cmd = parser.parse_bytes(data_type("grep 'ünïcode' > fïle.txt".encode("utf-8")))
+    assert cmd == parser.parse("grep 'ünïcode' > fïle.txt")
+
+
+def test_encoding(parser: Parser):
+    cmd = parser.parse_bytes("cat été".encode("latin-1"), encoding="latin-1")
+    assert cmd.args == (Word("été"),)
+
+
+@pytest.mark.parametrize("encoding, line", (
+    ("utf-8", "echo é > out.txt"),
+    ("latin-1", "echo é > out.txt"),
+    ("cp1252", "echo é > out.txt"),
+    ("koi8_r", "echo ж > out.txt"),
+    ("euc_kr", "echo 표 > out.txt"),
+))
+def test_compatible_encodings(parser: Parser, encoding: str, line: str):
+    assert parser.parse_bytes(line.encode(encoding), encoding=encoding) == parser.parse(line)
+
+
+def test_shift_jis_is_rejected(parser: Parser):
+    # The second byte of 表 in Shift_JIS is a backslash.
+    data = "echo 表 a".encode("shift_jis")
+    assert b"\\" in data
+    with pytest.raises(UnsupportedEncodingException):
+        parser.parse_bytes(data, encoding="shift_jis")
+
+
+def test_errors(parser: Parser):
+    with pytest.raises(UnicodeDecodeError):
+        parser.parse_bytes(b"cat \xff")
+    cmd = parser.parse_bytes(b"cat \xff", errors="surrogateescape")
+    assert cmd.args == (Word("\udcff"),)
+    cmd = parser.parse_bytes(b"cat \xff", errors="replace")
+    assert cmd.args == (Word("�"),)
+
+
+def test_spans_are_byte_offsets(parser: Parser):
+    data = "  échō 'ä b' >ö".encode("utf-8")
+    cmd = parser.parse_bytes(data)
+    start, end = cmd.args[0].span
+    assert data[start:end] == "'ä b'".encode("utf-8")
+    start, end = cmd.descriptors.descriptors[1].descriptor.target.span
+    assert data[start:end] == "ö".encode("utf-8")
+    assert cmd.span == (2, len(data))
+
+
+@pytest.mark.parametrize("data", (b"", b"  \t\r\n"))
+def test_empty(parser: Parser, data: bytes):
+    with pytest.raises(EmptyInputException, match=make_match("Input statement was empty or contained only whitespace.")):
+        parser.parse_bytes(data)
+
+
+@pytest.mark.parametrize("encoding", ("utf-16", "utf-32", "cp500", "shift_jis", "cp932", "big5", "gbk", "utf-7"))
+def test_unsupported_encoding(parser: Parser, encoding: str):
+    with pytest.raises(UnsupportedEncodingException, match=make_match("Encoding '{0}' is not ASCII-compatible.".format(encoding))):
+        parser.parse_bytes(b"cmd", encoding=encoding)
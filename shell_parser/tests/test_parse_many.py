@@ -0,0 +1,88 @@
+import pytest
+
+import pickle
+import re
+
+from shell_parser.ast import BadFileDescriptorException
+from shell_parser.parser import ENGINES, Parser, EmptyInputException
+from shell_parser.parser import EmptyStatementParserFailure, UnclosedQuoteParserFailure
+
+
+LINES = (
+    "git status",
+    "ls -la | grep foo > out.txt 2>&1",
+    "",
+    "cmd1 'unclosed",
+    "make && make test || echo failed; echo done",
+    "; cmd",
+    "cmd 3>&4",
+    "cat < in.txt | sort | uniq -c",
+)
+
+
+def make_match(msg: str) -> str:
+    return "^" + re.escape(msg) + "$"
+
+
+def outcome(result):
+    if isinstance(result, Exception):
+        return (result.__class__, str(result), getattr(result, "pos", None))
+    return result
+
+
+def expected_outcomes(parser: Parser, lines):
+    outcomes = []
+    for line in lines:
+        try:
+            outcomes.append(parser.parse(line))
+        except Exception as e:
+            outcomes.append(outcome(e))
+    return outcomes
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_parse_many_in_process(engine: str):
+    parser = Parser(engine=engine)
+    results = list(parser.parse_many(LINES, workers=1))
+    assert [outcome(result) for result in results] == expected_outcomes(parser, LINES)
+
+    assert isinstance(results[2], EmptyInputException)
+    assert isinstance(results[3], UnclosedQuoteParserFailure)
+    assert isinstance(results[5], EmptyStatementParserFailure)
+    assert results[5].pos == 0
+    assert isinstance(results[6], BadFileDescriptorException)
+
+
+@pytest.mark.parametrize("chunksize", (1, 3, 100))
+def test_parse_many_process_pool(chunksize: int):
+    parser = Parser()
+    lines = LINES * 5
+    results = list(parser.parse_many(lines, workers=2, chunksize=chunksize))
+    assert [outcome(result) for result in results] == expected_outcomes(parser, lines)
+
+
+def test_parse_many_lazy_input():
+    parser = Parser()
+    lines = ("cmd{0} arg".format(i) for i in range(50))
+    results = list(parser.parse_many(lines, workers=2, chunksize=7))
+    assert [str(result) for result in results] == ["cmd{0} arg".format(i) for i in range(50)]
+
+
+def test_parse_many_invalid_chunksize():
+    with pytest.raises(ValueError, match=make_match("chunksize must be >= 1")):
+        Parser().parse_many(LINES, chunksize=0)
+
+
+def test_parser_failure_pickling():
+    parser = Parser()
+    with pytest.raises(EmptyStatementParserFailure) as excinfo:
+        parser.parse("cmd1 ; ;")
+    restored = pickle.loads(pickle.dumps(excinfo.value))
+    assert restored.__class__ is EmptyStatementParserFailure
+    assert str(restored) == str(excinfo.value)
+    assert restored.pos == 7
+
+
+def test_command_pickling():
+    first_cmd = Parser().parse("cmd1 arg1 > out.txt 2>&1 | cmd2 && cmd3 3<&-")
+    assert pickle.loads(pickle.dumps(first_cmd)) == first_cmd
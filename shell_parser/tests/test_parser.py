@@ -9,7 +9,7 @@ from shell_parser.ast import DescriptorRead, DescriptorWrite, CommandDescriptorC
 from shell_parser.ast import Command
 from shell_parser.ast import BadFileDescriptorException
 from shell_parser.formatter import Formatter
-from shell_parser.parser import Parser, EmptyInputException
+from shell_parser.parser import ENGINES, Parser, EmptyInputException
 from shell_parser.parser import UnclosedQuoteParserFailure, EmptyStatementParserFailure, EmptyRedirectParserFailure
 from shell_parser.parser import UnexpectedStatementFinishParserFailure, InvalidRedirectionParserFailure, AmbiguousRedirectParserFailure
 
@@ -79,9 +79,9 @@ def assert_descriptors(
     assert checked_fds == descriptors.keys()
 
 
-@pytest.fixture(scope="module")
-def parser() -> Parser:
-    return Parser()
+@pytest.fixture(scope="module", params=ENGINES)
+def parser(request) -> Parser:
+    return Parser(engine=request.param)
 
 
 @pytest.fixture(scope="module")
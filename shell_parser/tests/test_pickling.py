@@ -0,0 +1,151 @@
+import pytest
+
+import pickle
+from types import MappingProxyType
+
+from shell_parser.ast import Word, File, StdinTarget, StdoutTarget, StderrTarget, DefaultFile
+from shell_parser.ast import RedirectionInput, RedirectionOutput, RedirectionAppend, OperatorAnd, OperatorOr
+from shell_parser.ast import DescriptorRead, DescriptorWrite, CommandDescriptorClosed, CommandFileDescriptor, CommandDescriptor
+from shell_parser.ast import CommandDescriptors, Command, CommandBuilder
+from shell_parser.parser import Parser
+
+
+class CustomWord(Word):
+    pass
+
+
+class CustomFile(File):
+    pass
+
+
+class CustomDefaultFile(DefaultFile):
+    pass
+
+
+class CustomFileDescriptor(CommandFileDescriptor):
+    pass
+
+
+class CustomDescriptor(CommandDescriptor):
+    pass
+
+
+class CustomArgs(list):
+    pass
+
+
+def round_trip(obj):
+    return pickle.loads(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+@pytest.mark.parametrize("obj", (
+    Word("word"),
+    File("file.txt"),
+    StdinTarget(),
+    StdoutTarget(),
+    StderrTarget(),
+    DefaultFile(target=StdinTarget()),
+    DefaultFile(target=StderrTarget()),
+    RedirectionInput(),
+    RedirectionOutput(),
+    RedirectionAppend(),
+    OperatorAnd(),
+    OperatorOr(),
+    DescriptorRead(),
+    DescriptorWrite(),
+    CommandDescriptorClosed(),
+    CommandFileDescriptor(target=File("file.txt"), operator=RedirectionAppend()),
+    CommandDescriptor(
+        mode=DescriptorRead(),
+        descriptor=CommandFileDescriptor(target=DefaultFile(target=StdinTarget()), operator=RedirectionInput()),
+    ),
+    CommandDescriptor(
+        mode=DescriptorWrite(),
+        descriptor=CommandFileDescriptor(target=DefaultFile(target=StdinTarget()), operator=RedirectionOutput()),
+    ),
+    CommandDescriptor(
+        mode=DescriptorWrite(),
+        descriptor=CommandFileDescriptor(target=File("out.txt"), operator=RedirectionOutput()),
+    ),
+    Parser().parse("cmd").descriptors,
+    Parser().parse("cmd < in.txt 2>&1 3>&-").descriptors,
+    CustomWord("word"),
+    CustomWord("word", (0, 4)),
+    CustomFile("file.txt"),
+    CustomDefaultFile(target=StdoutTarget()),
+    CustomFileDescriptor(target=File("file.txt"), operator=RedirectionAppend()),
+    CustomDescriptor(
+        mode=DescriptorRead(),
+        descriptor=CommandFileDescriptor(target=DefaultFile(target=StdinTarget()), operator=RedirectionInput()),
+    ),
+))
+def test_value_objects(obj):
+    restored = round_trip(obj)
+    assert restored == obj
+    assert type(restored) is type(obj)
+
+
+@pytest.mark.parametrize("line", (
+    "cmd",
+    "cmd arg1 '' \"arg 3\"",
+    "cmd > out.txt 2>&1 < in.txt",
+    "cmd 2>&1 1>&2 3>&- 4<&0 5>>log.txt",
+    "cmd1 | cmd2 | cmd3 > out.txt",
+    "cmd1 && cmd2 || cmd3; cmd4 & cmd5",
+    "cmd1 | cmd2 && cmd3 | cmd4 || cmd5 | cmd6 > out.txt; cmd7 & cmd8",
+))
+def test_parsed_commands(line: str):
+    first_cmd = Parser().parse(line)
+    restored = round_trip(first_cmd)
+    assert restored == first_cmd
+    assert isinstance(restored.descriptors.descriptors, MappingProxyType)
+
+
+def test_default_command_is_compact():
+    # Default descriptors and the empty chain are encoded as short tags, so
+    # a simple command costs little more than its words.
+    data = pickle.dumps(Parser().parse("git status"), protocol=pickle.HIGHEST_PROTOCOL)
+    assert len(data) < 100
+
+
+def test_user_constructed_command():
+    cmd = Command(command=Word("cmd"), descriptors={}, args=(Word("arg"),))
+    assert round_trip(cmd) == cmd
+
+    descriptors = CommandDescriptors(descriptors=MappingProxyType({}))
+    cmd = Command(command=Word("cmd"), descriptors=descriptors, next_command=cmd, next_command_operator=OperatorOr())
+    assert round_trip(cmd) == cmd
+
+
+@pytest.mark.parametrize("args_type", (tuple, list, CustomArgs))
+def test_args_container_is_kept(args_type):
+    descriptors = CommandBuilder().descriptors.create()
+    pipe_cmd = Command(command=Word("sort"), descriptors=descriptors, args=args_type([Word("-r")]))
+    cmd = Command(command=Word("cmd"), descriptors=descriptors, args=args_type([Word("arg", (4, 7))]), pipe_command=pipe_cmd)
+    restored = round_trip(cmd)
+    assert restored == cmd
+    assert type(restored.args) is args_type
+    assert type(restored.pipe_command.args) is args_type
+    assert restored.args[0].span == (4, 7)
+
+
+def test_long_chain():
+    descriptors = CommandBuilder().descriptors.create()
+    first_cmd = Command(command=Word("cmd19999"), descriptors=descriptors)
+    for i in range(19998, -1, -1):
+        first_cmd = Command(
+            command=Word("cmd{0}".format(i)),
+            descriptors=descriptors,
+            next_command=first_cmd,
+            next_command_operator=OperatorAnd(),
+        )
+
+    restored = round_trip(first_cmd)
+    count = 0
+    cmd = restored
+    while cmd is not None:
+        assert cmd.command == Word("cmd{0}".format(count))
+        assert cmd.next_command is None or isinstance(cmd.next_command_operator, OperatorAnd)
+        count += 1
+        cmd = cmd.next_command
+    assert count == 20000
@@ -0,0 +1,189 @@
+import pytest
+
+import io
+import json
+import random
+from types import MappingProxyType
+
+from shell_parser.ast import _flatten_command
+from shell_parser.ast import Command, CommandDescriptors, Word
+from shell_parser.parser import ENGINES, Parser
+from shell_parser.serialization import (
+    SCHEMA_VERSION,
+    NDJSONReader,
+    NDJSONWriter,
+    SerializationException,
+    from_dict,
+    from_json,
+    to_dict,
+    to_json,
+)
+
+
+ALPHABET = (" ", "\t", "\\", "'", '"', ";", ">", ">>", "<", "&", "|", "-", "$", "0", "1", "2", "12", "a", "b", "cmd", "file")
+
+STATEMENTS = (
+    "ls -la /tmp",
+    "cat 'a b' \\x < in 2>&1 3>&- | sort >> out; ls && x || y & z",
+    "cmd 0>&2 1<&0 >&- 70000>x",
+    "echo café \"☃\"",
+)
+
+
+@pytest.mark.parametrize("spans", (True, False))
+def test_round_trip(spans: bool):
+    parser = Parser(spans=spans)
+    for line in STATEMENTS:
+        expected = parser.parse(line)
+        first_cmd = from_json(to_json(expected))
+        assert first_cmd == expected
+        # The flattened form includes the spans and the descriptor order.
+        assert _flatten_command(first_cmd) == _flatten_command(expected)
+        assert from_dict(to_dict(expected)) == expected
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_round_trip_random(seed: int):
+    rng = random.Random(seed)
+    for engine in ENGINES:
+        parser = Parser(engine=engine)
+        for _ in range(300):
+            line = "".join(rng.choice(ALPHABET) for _ in range(rng.randint(1, 20)))
+            try:
+                expected = parser.parse(line)
+            except Exception:
+                continue
+            assert _flatten_command(from_json(to_json(expected))) == _flatten_command(expected)
+
+
+def test_layout():
+    first_cmd = Parser().parse("cat < in.txt 2>&1 | sort && echo done & wait")
+    assert to_dict(first_cmd) == {
+        "version": SCHEMA_VERSION,
+        "commands": [
+            {
+                "command": "cat",
+                "args": [],
+                "descriptors": {
+                    "0": {"operator": "<", "file": "in.txt", "span": [6, 12]},
+                    "2": {"operator": ">", "default": "stdout"},
+                },
+                "pipe": 1,
+                "next": 2,
+                "operator": "&&",
+                "span": [0, 17],
+                "command_span": [0, 3],
+            },
+            {
+                "command": "sort",
+                "args": [],
+                "span": [20, 24],
+                "command_span": [20, 24],
+            },
+            {
+                "command": "echo",
+                "args": ["done"],
+                "next": 3,
+                "async": True,
+                "span": [28, 37],
+                "command_span": [28, 32],
+                "arg_spans": [[33, 37]],
+            },
+            {
+                "command": "wait",
+                "args": [],
+                "span": [40, 44],
+                "command_span": [40, 44],
+            },
+        ],
+    }
+
+
+def test_default_descriptors_are_elided():
+    data = to_dict(Parser(spans=False).parse("ls -la"))
+    assert data == {"version": SCHEMA_VERSION, "commands": [{"command": "ls", "args": ["-la"]}]}
+
+
+def test_closed_and_removed_descriptors():
+    descriptors = dict(Parser().parse("cmd >&-").descriptors.descriptors)
+    del descriptors[0]
+    first_cmd = Command(command=Word("cmd"), descriptors=CommandDescriptors(descriptors=MappingProxyType(descriptors)))
+    data = to_dict(first_cmd)
+    assert data["commands"][0]["descriptors"] == {"0": None, "1": {"closed": True}}
+    assert from_dict(data) == first_cmd
+
+
+def test_long_chain():
+    first_cmd = Parser().parse(" | ".join(["cmd"] * 5000) + "; ls")
+    assert from_json(to_json(first_cmd)) == first_cmd
+
+
+def test_unsupported_nodes():
+    class MyWord(Word):
+        pass
+
+    with pytest.raises(SerializationException):
+        to_dict(Command(command=MyWord("cmd"), descriptors=Parser().parse("cmd").descriptors))
+
+
+@pytest.mark.parametrize("document, message", (
+    ("not json", "Invalid JSON"),
+    ("[]", "expected an object"),
+    ('{"version": 2, "commands": []}', "Unsupported schema version 2"),
+    ('{"version": 1, "commands": []}', "at least one command"),
+    ('{"version": 1}', "Invalid statement"),
+    ('{"version": 1, "commands": [{"args": []}]}', "Invalid statement"),
+    ('{"version": 1, "commands": [{"command": 1, "args": []}]}', "Invalid word 1"),
+    ('{"version": 1, "commands": [{"command": "a", "args": "b"}]}', "Invalid arguments"),
+    ('{"version": 1, "commands": [{"command": "a", "args": [], "pipe": 0}]}', "Invalid pipe index 0"),
+    ('{"version": 1, "commands": [{"command": "a", "args": []}, {"command": "b", "args": []}]}', "must be linked"),
+    ('{"version": 1, "commands": [{"command": "a", "args": [], "pipe": 1, "next": 1},'
+     ' {"command": "b", "args": []}]}', "Invalid next index 1"),
+    ('{"version": 1, "commands": [{"command": "a", "args": [], "operator": "&&"}]}', "Next command operator set"),
+    ('{"version": 1, "commands": [{"command": "a", "args": [], "span": [1]}]}', "Invalid span"),
+    ('{"version": 1, "commands": [{"command": "a", "args": [], "async": 1}]}', "Invalid async flag"),
+    ('{"version": 1, "commands": [{"command": "a", "args": [], "descriptors": {"x": null}}]}',
+     "Invalid file descriptor"),
+    ('{"version": 1, "commands": [{"command": "a", "args": [], "descriptors": {"1": {"operator": "<>"}}}]}',
+     "Invalid descriptor operator"),
+    ('{"version": 1, "commands": [{"command": "a", "args": [], "descriptors": {"1": {"operator": ">"}}}]}',
+     "Invalid descriptor target"),
+))
+def test_invalid_documents(document: str, message: str):
+    with pytest.raises(SerializationException) as excinfo:
+        from_json(document)
+    assert message in str(excinfo.value)
+
+
+def test_ndjson_round_trip():
+    parser = Parser()
+    stream = io.StringIO()
+    writer = NDJSONWriter(stream)
+    for line in STATEMENTS:
+        writer.write(parser.parse(line))
+    assert writer.count == len(STATEMENTS)
+
+    text = stream.getvalue()
+    lines = text.splitlines()
+    assert len(lines) == len(STATEMENTS)
+    assert all(json.loads(line)["version"] == SCHEMA_VERSION for line in lines)
+    assert all(ord(char) < 128 for char in text)
+
+    stream = io.StringIO("\n" + text + "\n")
+    assert list(NDJSONReader(stream)) == [parser.parse(line) for line in STATEMENTS]
+
+
+def test_ndjson_add_statements():
+    stream = io.StringIO()
+    writer = NDJSONWriter(stream)
+    failures = writer.add_statements(["ls", "cmd 'unclosed", "git status"], workers=1)
+    assert [i for i, _ in failures] == [1]
+    stream.seek(0)
+    assert list(NDJSONReader(stream)) == [Parser().parse("ls"), Parser().parse("git status")]
+
+
+def test_ndjson_reports_line_numbers():
+    stream = io.StringIO(to_json(Parser().parse("ls")) + "\n\n{}\n")
+    with pytest.raises(SerializationException) as excinfo:
+        list(NDJSONReader(stream))
+    assert str(excinfo.value).startswith("Line 3: ")
@@ -0,0 +1,129 @@
+import pytest
+
+import pickle
+import random
+from dataclasses import FrozenInstanceError
+
+from shell_parser.ast import Command, File, Word
+from shell_parser.parser import ENGINES, ENGINE_SCANNER, Parser, TOKEN_WORD, tokenize
+
+
+ALPHABET = (" ", "\t", "\\", "'", '"', ";", ">", "<", "&", "|", "-", "$", "0", "1", "2", "12", "a", "b", "cmd", "file")
+
+
+@pytest.fixture(params=ENGINES)
+def parser(request) -> Parser:
+    return Parser(engine=request.param)
+
+
+def word_spans(cmd: Command):
+    return [word.span for word in [cmd.command, *cmd.args]]
+
+
+def test_word_spans(parser: Parser):
+    line = "  cmd 'arg 1' a\\ b \"x\"y  "
+    cmd = parser.parse(line)
+    assert word_spans(cmd) == [(2, 5), (6, 13), (14, 18), (19, 23)]
+    assert [line[start:end] for start, end in word_spans(cmd)] == ["cmd", "'arg 1'", "a\\ b", '"x"y']
+    assert cmd.span == (2, 23)
+
+
+def test_file_spans(parser: Parser):
+    line = "cmd 2> err.log >>'out file' <in"
+    cmd = parser.parse(line)
+    assert cmd.descriptors.descriptors[0].descriptor.target.span == (29, 31)
+    assert cmd.descriptors.descriptors[1].descriptor.target.span == (17, 27)
+    assert cmd.descriptors.descriptors[2].descriptor.target.span == (7, 14)
+    assert cmd.span == (0, 31)
+
+
+def test_command_spans_cover_redirections(parser: Parser):
+    cmd = parser.parse("2>&1 cmd >&-")
+    assert word_spans(cmd) == [(5, 8)]
+    assert cmd.span == (0, 12)
+
+
+def test_chained_command_spans(parser: Parser):
+    line = " a | b x && c; d & e || f "
+    cmd = parser.parse(line)
+    spans = []
+    stack = [cmd]
+    while stack:
+        cur = stack.pop()
+        spans.append(line[cur.span[0]:cur.span[1]])
+        if cur.next_command is not None:
+            stack.append(cur.next_command)
+        if cur.pipe_command is not None:
+            stack.append(cur.pipe_command)
+    assert spans == ["a", "b x", "c", "d", "e", "f"]
+
+
+def test_spans_do_not_affect_equality(parser: Parser):
+    assert parser.parse("cmd a >f") == parser.parse("   cmd  a  >  f")
+    assert hash(parser.parse("cmd a >f")) == hash(parser.parse("   cmd  a  >  f"))
+    assert Word("a", (0, 1)) == Word("a")
+    assert File("f", (0, 1)) == File("f")
+
+
+def test_spans_are_read_only():
+    word = Word("a", (3, 4))
+    assert word.span == (3, 4)
+    assert File("f").span is None
+    with pytest.raises(FrozenInstanceError):
+        word.span = (0, 1)
+    with pytest.raises(FrozenInstanceError):
+        Command(command=word, descriptors=Parser().parse("a").descriptors, span=(3, 4)).span = None
+    assert word.span == (3, 4)
+
+
+def test_spans_disabled():
+    for engine in ENGINES:
+        cmd = Parser(engine=engine, spans=False).parse("cmd a >f | b")
+        assert cmd == Parser(engine=engine).parse("cmd a >f | b")
+        assert cmd.span is None
+        assert word_spans(cmd) == [None, None]
+        assert cmd.descriptors.descriptors[1].descriptor.target.span is None
+        assert cmd.pipe_command.span is None
+
+
+def test_spans_survive_pickling(parser: Parser):
+    cmd = parser.parse("cmd 'a b' >out | grep x && y")
+    restored = pickle.loads(pickle.dumps(cmd))
+    assert restored == cmd
+    assert restored.span == cmd.span
+    assert word_spans(restored) == word_spans(cmd)
+    assert restored.descriptors.descriptors[1].descriptor.target.span == (11, 14)
+    assert restored.pipe_command.span == cmd.pipe_command.span
+    assert restored.next_command.span == cmd.next_command.span
+    assert word_spans(restored.next_command) == [(27, 28)]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_word_spans_match_tokens(seed: int):
+    # Every word and redirect target found by the parser must sit exactly
+    # where the tokenizer found it.
+    rng = random.Random(seed)
+    parser = Parser(engine=ENGINE_SCANNER)
+    for _ in range(500):
+        line = "".join(rng.choice(ALPHABET) for _ in range(rng.randint(1, 16)))
+        try:
+            cmd = parser.parse(line)
+        except Exception:
+            continue
+
+        found = set()
+        stack = [cmd]
+        while stack:
+            cur = stack.pop()
+            found.update((word.span, word.word) for word in [cur.command, *cur.args])
+            for descriptor in cur.descriptors.descriptors.values():
+                target = getattr(getattr(descriptor, "descriptor", None), "target", None)
+                if isinstance(target, File):
+                    found.add((target.span, target.name))
+            if cur.next_command is not None:
+                stack.append(cur.next_command)
+            if cur.pipe_command is not None:
+                stack.append(cur.pipe_command)
+
+        tokens = {((token.start, token.end), token.value) for token in tokenize(line) if token.kind == TOKEN_WORD}
+        assert found <= tokens, line
@@ -0,0 +1,132 @@
+import pytest
+
+import random
+
+from shell_parser.parser import ENGINES, Parser, EmptyInputException, EmptyRedirectParserFailure
+from shell_parser.stats import COUNTERS, ParseStats
+
+
+ALPHABET = (" ", "\t", "\\", "'", '"', ";", ">", "<", "&", "|", "-", "$", "0", "1", "2", "12", "a", "b", "cmd", "file")
+
+
+@pytest.fixture(params=ENGINES)
+def engine(request) -> str:
+    return request.param
+
+
+def without_timings(snapshot):
+    return {name: value for name, value in snapshot.items() if not name.endswith("_ns")}
+
+
+def test_off_by_default():
+    assert Parser().stats is None
+
+
+def test_counts(engine: str):
+    stats = ParseStats()
+    Parser(engine=engine, stats=stats).parse(" cat 'a b' \\x < in 2>&1 3>&- | sort >> out; ls ")
+    snapshot = stats.snapshot()
+    assert snapshot["scan_ns"] > 0
+    assert snapshot["create_ns"] > 0
+    assert without_timings(snapshot) == {
+        "statements": 1,
+        "fast_path": 0,
+        "failures": 0,
+        "chars": 45,
+        "chars.quoted": 5,
+        "chars.escaped": 2,
+        "chars.redirect": 7,
+        "chars.operator": 2,
+        "chars.descriptor": 2,
+        "chars.word": 16,
+        "chars.whitespace": 11,
+        "builders": 4,
+        "commands": 3,
+        "words": 5,
+        "files": 2,
+        "descriptors.tables": 2,
+        "descriptors.duplicated": 1,
+        "descriptors.closed": 1,
+    }
+
+
+def test_fast_path(engine: str):
+    stats = ParseStats()
+    Parser(engine=engine, stats=stats).parse("ls -la /tmp")
+    snapshot = stats.snapshot()
+    assert snapshot["fast_path"] == 1
+    assert snapshot["chars"] == 11
+    assert snapshot["chars.word"] == 9
+    assert snapshot["chars.whitespace"] == 2
+    assert snapshot["commands"] == 1
+    assert snapshot["words"] == 3
+
+
+def test_failures(engine: str):
+    stats = ParseStats()
+    parser = Parser(engine=engine, stats=stats)
+    with pytest.raises(EmptyRedirectParserFailure):
+        parser.parse("a > ;")
+    with pytest.raises(EmptyInputException):
+        parser.parse("  ")
+    snapshot = stats.snapshot()
+    assert snapshot["statements"] == 2
+    assert snapshot["failures"] == 2
+    assert snapshot["commands"] == 0
+    assert snapshot["create_ns"] == 0
+
+
+def test_snapshot_and_reset():
+    stats = ParseStats()
+    parser = Parser(stats=stats)
+    parser.parse("a | b")
+    snapshot = stats.snapshot()
+    assert set(snapshot) == set(COUNTERS)
+    parser.parse("a | b")
+    assert snapshot["statements"] == 1
+    assert stats.snapshot()["statements"] == 2
+    stats.reset()
+    assert stats.snapshot() == dict.fromkeys(COUNTERS, 0)
+
+
+def test_shared_between_parsers():
+    stats = ParseStats()
+    for engine in ENGINES:
+        Parser(engine=engine, stats=stats).parse("a; b")
+    assert stats.snapshot()["commands"] == 4
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_results_unchanged(seed: int):
+    rng = random.Random(seed)
+    for engine in ENGINES:
+        parser = Parser(engine=engine)
+        instrumented = Parser(engine=engine, stats=ParseStats())
+        for _ in range(300):
+            line = "".join(rng.choice(ALPHABET) for _ in range(rng.randint(1, 20)))
+            try:
+                expected = parser.parse(line)
+            except Exception as e:
+                with pytest.raises(e.__class__):
+                    instrumented.parse(line)
+            else:
+                assert instrumented.parse(line) == expected, line
+        snapshot = instrumented.stats.snapshot()
+        assert snapshot["statements"] == 300
+        assert sum(snapshot[name] for name in COUNTERS if name.startswith("chars.")) == snapshot["chars"]
+
+
+def test_parse_many_workers():
+    lines = ["cat 'a b' < in | sort > out", "ls -la", "cmd >", "echo $HOME && exit"] * 5
+    serial = ParseStats()
+    parallel = ParseStats()
+    list(Parser(stats=serial).parse_many(lines, workers=1))
+    list(Parser(stats=parallel).parse_many(lines, workers=2, chunksize=3))
+
+    expected = serial.snapshot()
+    counts = parallel.snapshot()
+    assert counts["statements"] == 20
+    assert counts["failures"] == 5
+    # Timings differ between runs.
+    del expected["scan_ns"], expected["create_ns"], counts["scan_ns"], counts["create_ns"]
+    assert counts == expected
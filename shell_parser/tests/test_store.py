@@ -0,0 +1,123 @@
+import pytest
+
+import os
+import random
+
+from shell_parser.ast import Command, CommandDescriptors, Word
+from shell_parser.parser import ENGINES, Parser, UnexpectedStatementFinishParserFailure
+from shell_parser.store import CommandStore, CommandStoreException, CommandStoreWriter
+
+
+ALPHABET = (" ", "\t", "\\", "'", '"', ";", ">", ">>", "<", "&", "|", "-", "$", "0", "1", "2", "12", "a", "b", "cmd", "file")
+
+STATEMENTS = (
+    "ls -la /tmp",
+    "cat 'a b' \\x < in 2>&1 3>&- | sort >> out; ls && x || y & z",
+    "cmd 0>&2 1<&0 >&- 70000>x",
+)
+
+
+@pytest.fixture
+def path(tmp_path) -> str:
+    return str(tmp_path / "commands.store")
+
+
+@pytest.mark.parametrize("spans", (True, False))
+def test_round_trip(path: str, spans: bool):
+    parser = Parser(spans=spans)
+    with CommandStoreWriter(path) as writer:
+        for i, line in enumerate(STATEMENTS):
+            assert writer.append(parser.parse(line)) == i
+
+    with CommandStore(path) as store:
+        assert len(store) == len(STATEMENTS)
+        for line, cmd in zip(STATEMENTS, store):
+            expected = parser.parse(line)
+            assert cmd == expected
+            assert repr(cmd) == repr(expected)
+            assert cmd.span == expected.span
+            assert cmd.command.span == expected.command.span
+        assert store[-1] == parser.parse(STATEMENTS[-1])
+        with pytest.raises(IndexError):
+            store[len(STATEMENTS)]
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_round_trip_random(path: str, seed: int):
+    rng = random.Random(seed)
+    expected = []
+    with CommandStoreWriter(path) as writer:
+        for engine in ENGINES:
+            parser = Parser(engine=engine)
+            for _ in range(300):
+                line = "".join(rng.choice(ALPHABET) for _ in range(rng.randint(1, 20)))
+                try:
+                    cmd = parser.parse(line)
+                except Exception:
+                    continue
+                writer.append(cmd)
+                expected.append(cmd)
+    with CommandStore(path) as store:
+        assert list(store) == expected
+
+
+def test_undecodable_bytes(path: str):
+    cmd = Parser().parse_bytes(b"echo caf\xe9 > \xff.txt", errors="surrogateescape")
+    with CommandStoreWriter(path) as writer:
+        writer.append(cmd)
+    with CommandStore(path) as store:
+        assert store[0] == cmd
+
+
+def test_add_statements(path: str):
+    with CommandStoreWriter(path) as writer:
+        failures = writer.add_statements(["a b", "a >", "c | d"], workers=1)
+    assert len(failures) == 1
+    assert failures[0][0] == 1
+    assert isinstance(failures[0][1], UnexpectedStatementFinishParserFailure)
+    with CommandStore(path) as store:
+        assert list(store) == [Parser().parse("a b"), Parser().parse("c | d")]
+
+
+def test_empty(path: str):
+    CommandStoreWriter(path).close()
+    with CommandStore(path) as store:
+        assert len(store) == 0
+        assert list(store) == []
+
+
+def test_unsupported_command(path: str):
+    class Name(Word):
+        pass
+
+    with CommandStoreWriter(path) as writer:
+        writer.append(Parser().parse("a b"))
+        with pytest.raises(CommandStoreException):
+            writer.append(Command(command=Name("a"), descriptors=CommandDescriptors(descriptors={})))
+    with CommandStore(path) as store:
+        assert list(store) == [Parser().parse("a b")]
+
+
+def test_unfinished(path: str):
+    with pytest.raises(RuntimeError):
+        with CommandStoreWriter(path) as writer:
+            writer.append(Parser().parse("a b"))
+            raise RuntimeError()
+    with pytest.raises(CommandStoreException, match="^Incomplete command store$"):
+        CommandStore(path)
+
+
+@pytest.mark.parametrize("content", (b"", b"not a command store", b"\x00" * 64))
+def test_not_a_store(path: str, content: bytes):
+    with open(path, "wb") as f:
+        f.write(content)
+    with pytest.raises(CommandStoreException, match="^Not a command store$"):
+        CommandStore(path)
+
+
+def test_truncated(path: str):
+    with CommandStoreWriter(path) as writer:
+        writer.append(Parser().parse("a b"))
+    os.truncate(path, os.path.getsize(path) - 1)
+    with pytest.raises(CommandStoreException, match="^Incomplete command store$"):
+        CommandStore(path)
@@ -0,0 +1,109 @@
+import pytest
+
+import random
+
+from shell_parser.ast import Command, CommandDescriptors, File, Word
+from shell_parser.parser import ENGINES, Parser, UnexpectedStatementFinishParserFailure
+from shell_parser.table import CommandTable, CommandTableException
+
+
+ALPHABET = (" ", "\t", "\\", "'", '"', ";", ">", ">>", "<", "&", "|", "-", "$", "0", "1", "2", "12", "a", "b", "cmd", "file")
+
+STATEMENTS = (
+    "ls -la /tmp",
+    "cat 'a b' \\x < in 2>&1 3>&- | sort >> out; ls && x || y & z",
+    "cmd 0>&2 1<&0 >&-",
+)
+
+
+def spans(first_cmd: Command):
+    # Equality ignores spans, so they are compared separately.
+    result = []
+    stack = [first_cmd]
+    while stack:
+        cmd = stack.pop()
+        result.append(cmd.span)
+        result.extend(word.span for word in (cmd.command,) + tuple(cmd.args))
+        for descriptor in cmd.descriptors.descriptors.values():
+            target = getattr(getattr(descriptor, "descriptor", None), "target", None)
+            if isinstance(target, File):
+                result.append(target.span)
+        stack.extend(child for child in (cmd.next_command, cmd.pipe_command) if child is not None)
+    return result
+
+
+def assert_same(cmd: Command, expected: Command):
+    assert cmd == expected
+    assert repr(cmd) == repr(expected)
+    assert spans(cmd) == spans(expected)
+
+
+@pytest.mark.parametrize("spans", (True, False))
+def test_round_trip(spans: bool):
+    parser = Parser(spans=spans)
+    table = CommandTable()
+    for i, line in enumerate(STATEMENTS):
+        assert table.append(parser.parse(line)) == i
+    assert len(table) == len(STATEMENTS)
+    assert table.rows == 8
+    for line, cmd in zip(STATEMENTS, table):
+        assert_same(cmd, parser.parse(line))
+    assert_same(table[-1], parser.parse(STATEMENTS[-1]))
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_round_trip_random(seed: int):
+    rng = random.Random(seed)
+    for engine in ENGINES:
+        parser = Parser(engine=engine)
+        table = CommandTable()
+        expected = []
+        for _ in range(300):
+            line = "".join(rng.choice(ALPHABET) for _ in range(rng.randint(1, 20)))
+            try:
+                cmd = parser.parse(line)
+            except Exception:
+                continue
+            table.append(cmd)
+            expected.append(cmd)
+        for cmd, expected_cmd in zip(table, expected):
+            assert_same(cmd, expected_cmd)
+
+
+def test_accessors():
+    table = CommandTable()
+    table.append(Parser().parse(STATEMENTS[1]))
+    assert [table.command_name(row) for row in range(table.rows)] == ["cat", "sort", "ls", "x", "y", "z"]
+    assert table.args(0) == ("a b", "x")
+    assert table.args(-1) == ()
+    assert table.command(1) == Parser().parse("sort >> out")
+    with pytest.raises(IndexError):
+        table.command(table.rows)
+
+
+def test_default_descriptors_shared():
+    table = CommandTable()
+    table.append(Parser().parse("a | b"))
+    cmd = table[0]
+    assert cmd.descriptors is cmd.pipe_command.descriptors
+
+
+def test_add_statements():
+    table = CommandTable()
+    failures = table.add_statements(["a b", "a >", "c | d"], workers=1)
+    assert len(table) == 2
+    assert len(failures) == 1
+    assert failures[0][0] == 1
+    assert isinstance(failures[0][1], UnexpectedStatementFinishParserFailure)
+    assert table[1] == Parser().parse("c | d")
+
+
+def test_rejected_statement():
+    table = CommandTable()
+    table.append(Parser().parse("a b"))
+    cmd = Command(command=Word("a"), descriptors=CommandDescriptors(descriptors={}))
+    with pytest.raises(CommandTableException):
+        table.append(cmd)
+    assert len(table) == 1
+    assert table.rows == 1
+    assert table[0] == Parser().parse("a b")
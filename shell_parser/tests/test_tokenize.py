@@ -0,0 +1,128 @@
+import pytest
+
+import random
+from typing import List, Tuple
+
+from shell_parser.parser import Parser, Token, tokenize
+from shell_parser.parser import TOKEN_WORD, TOKEN_REDIRECT, TOKEN_DESCRIPTOR, TOKEN_SEMICOLON
+from shell_parser.parser import TOKEN_AMPERSAND, TOKEN_AND, TOKEN_PIPE, TOKEN_OR
+from shell_parser.parser import UnclosedQuoteParserFailure, UnexpectedStatementFinishParserFailure
+from shell_parser.parser import InvalidRedirectionParserFailure
+
+
+ALPHABET = (" ", "\t", "\\", "'", '"', ";", ">", "<", "&", "|", "-", "$", "0", "1", "2", "12", "a", "b", "cmd", "file")
+
+
+def kinds_and_values(statement: str) -> List[Tuple[str, str]]:
+    return [(token.kind, token.value) for token in tokenize(statement)]
+
+
+@pytest.mark.parametrize("line", ("", " ", " \t \n"))
+def test_empty(line: str):
+    assert list(tokenize(line)) == []
+
+
+def test_offsets():
+    line = "  cmd 'arg 1' 2>&1 >> out.txt | grep -v x && a; b & c || d  "
+    tokens = list(tokenize(line))
+    assert tokens == [
+        Token(TOKEN_WORD, 2, 5, "cmd"),
+        Token(TOKEN_WORD, 6, 13, "arg 1"),
+        Token(TOKEN_DESCRIPTOR, 14, 15, "2"),
+        Token(TOKEN_REDIRECT, 15, 17, ">&"),
+        Token(TOKEN_WORD, 17, 18, "1"),
+        Token(TOKEN_REDIRECT, 19, 21, ">>"),
+        Token(TOKEN_WORD, 22, 29, "out.txt"),
+        Token(TOKEN_PIPE, 30, 31, "|"),
+        Token(TOKEN_WORD, 32, 36, "grep"),
+        Token(TOKEN_WORD, 37, 39, "-v"),
+        Token(TOKEN_WORD, 40, 41, "x"),
+        Token(TOKEN_AND, 42, 44, "&&"),
+        Token(TOKEN_WORD, 45, 46, "a"),
+        Token(TOKEN_SEMICOLON, 46, 47, ";"),
+        Token(TOKEN_WORD, 48, 49, "b"),
+        Token(TOKEN_AMPERSAND, 50, 51, "&"),
+        Token(TOKEN_WORD, 52, 53, "c"),
+        Token(TOKEN_OR, 54, 56, "||"),
+        Token(TOKEN_WORD, 57, 58, "d"),
+    ]
+    for token in tokens:
+        if token.kind != TOKEN_WORD:
+            assert line[token.start:token.end] == token.value
+
+
+@pytest.mark.parametrize("line,expected", (
+    (r"plain\ word", [(TOKEN_WORD, "plain word")]),
+    (r'"one\word" "\$x" "\"q\""', [(TOKEN_WORD, r"one\word"), (TOKEN_WORD, "$x"), (TOKEN_WORD, '"q"')]),
+    (r"'one\word'", [(TOKEN_WORD, r"one\word")]),
+    (r"cmd \> \&\& \|", [(TOKEN_WORD, "cmd"), (TOKEN_WORD, ">"), (TOKEN_WORD, "&&"), (TOKEN_WORD, "|")]),
+    ("cmd '' \"\"", [(TOKEN_WORD, "cmd"), (TOKEN_WORD, ""), (TOKEN_WORD, "")]),
+    ("cmd 12 12>f", [(TOKEN_WORD, "cmd"), (TOKEN_WORD, "12"), (TOKEN_DESCRIPTOR, "12"), (TOKEN_REDIRECT, ">"), (TOKEN_WORD, "f")]),
+    ("cmd a2>f", [(TOKEN_WORD, "cmd"), (TOKEN_WORD, "a2"), (TOKEN_REDIRECT, ">"), (TOKEN_WORD, "f")]),
+    ("cmd 3<&- 4>&-x", [
+        (TOKEN_WORD, "cmd"),
+        (TOKEN_DESCRIPTOR, "3"), (TOKEN_REDIRECT, "<&"), (TOKEN_WORD, "-"),
+        (TOKEN_DESCRIPTOR, "4"), (TOKEN_REDIRECT, ">&"), (TOKEN_WORD, "-"), (TOKEN_WORD, "x"),
+    ]),
+    ("cmd > 2 < 3", [(TOKEN_WORD, "cmd"), (TOKEN_REDIRECT, ">"), (TOKEN_WORD, "2"), (TOKEN_REDIRECT, "<"), (TOKEN_WORD, "3")]),
+    ("cmd -- -x", [(TOKEN_WORD, "cmd"), (TOKEN_WORD, "--"), (TOKEN_WORD, "-x")]),
+))
+def test_words_and_operators(line: str, expected: List[Tuple[str, str]]):
+    assert kinds_and_values(line) == expected
+
+
+@pytest.mark.parametrize("line,failure_class,failure_pos", (
+    ("cmd 'open", UnclosedQuoteParserFailure, 9),
+    (' cmd "open\\"', UnclosedQuoteParserFailure, 12),
+    ("cmd >", UnexpectedStatementFinishParserFailure, 4),
+    ("cmd >>", UnexpectedStatementFinishParserFailure, 5),
+    ("  cmd >&", UnexpectedStatementFinishParserFailure, 7),
+    ("cmd |", UnexpectedStatementFinishParserFailure, 4),
+    ("cmd &", UnexpectedStatementFinishParserFailure, 4),
+    ("cmd >>&1", InvalidRedirectionParserFailure, 5),
+))
+def test_failures(line: str, failure_class, failure_pos: int):
+    with pytest.raises(failure_class) as excinfo:
+        list(tokenize(line))
+    assert excinfo.value.pos == failure_pos
+
+
+def test_syntax_errors_are_not_reported():
+    assert kinds_and_values("; > ;") == [(TOKEN_SEMICOLON, ";"), (TOKEN_REDIRECT, ">"), (TOKEN_SEMICOLON, ";")]
+
+
+def command_words(first_cmd) -> List[str]:
+    words = []
+    stack = [first_cmd]
+    while stack:
+        cmd = stack.pop()
+        words.append(str(cmd.command))
+        words.extend(str(arg) for arg in cmd.args)
+        if cmd.next_command is not None:
+            stack.append(cmd.next_command)
+        if cmd.pipe_command is not None:
+            stack.append(cmd.pipe_command)
+    return words
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_words_agree_with_parser(seed: int):
+    # Every word token that isn't a redirection target must turn up as a
+    # command word or argument, in the same order.
+    rng = random.Random(seed)
+    parser = Parser()
+    checked = 0
+    while checked < 200:
+        line = "".join(rng.choice(ALPHABET) for _ in range(rng.randint(1, 16)))
+        try:
+            first_cmd = parser.parse(line)
+        except Exception:
+            continue
+        tokens = list(tokenize(line))
+        words = [
+            token.value
+            for i, token in enumerate(tokens)
+            if token.kind == TOKEN_WORD and (i == 0 or tokens[i - 1].kind != TOKEN_REDIRECT)
+        ]
+        assert words == command_words(first_cmd), line
+        checked += 1
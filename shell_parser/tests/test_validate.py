@@ -0,0 +1,85 @@
+import pytest
+
+import random
+import re
+
+from shell_parser.ast import BadFileDescriptorException, CommandBuilderCreateException
+from shell_parser.parser import Parser, EmptyInputException
+from shell_parser.parser import UnclosedQuoteParserFailure, EmptyStatementParserFailure, EmptyRedirectParserFailure
+from shell_parser.parser import UnexpectedStatementFinishParserFailure, InvalidRedirectionParserFailure, AmbiguousRedirectParserFailure
+
+
+ALPHABET = (" ", "\t", "\\", "'", '"', ";", ">", "<", "&", "|", "-", "$", "0", "1", "2", "3", "12", "a", "b", "cmd", "file")
+
+
+def make_match(msg: str) -> str:
+    return "^" + re.escape(msg) + "$"
+
+
+def outcome(func, line: str):
+    try:
+        func(line)
+    except Exception as e:
+        return (e.__class__, str(e), getattr(e, "pos", None))
+    return None
+
+
+@pytest.fixture
+def parser() -> Parser:
+    return Parser()
+
+
+@pytest.mark.parametrize("line", (
+    "cmd",
+    "  cmd arg1 arg2  ",
+    "cmd 'a b' \"c d\" e\\ f",
+    "cmd < in > out 2>> err 3>&1 4<&0 5>&- 6>&'-'",
+    "a | b && c || d; e & f;",
+    "'' \"\"",
+))
+def test_valid(parser: Parser, line: str):
+    assert parser.validate(line) is None
+
+
+@pytest.mark.parametrize("line,exception_class,pos", (
+    ("cmd 'arg", UnclosedQuoteParserFailure, 8),
+    ("; cmd", EmptyStatementParserFailure, 0),
+    ("cmd &&", EmptyStatementParserFailure, 6),
+    ("cmd |", UnexpectedStatementFinishParserFailure, 4),
+    ("cmd; && x", EmptyStatementParserFailure, 5),
+    ("cmd > ;", EmptyRedirectParserFailure, 6),
+    ("cmd >> &1", EmptyRedirectParserFailure, 7),
+    ("cmd >>& 1", InvalidRedirectionParserFailure, 5),
+    ("cmd >& file", AmbiguousRedirectParserFailure, 11),
+))
+def test_grammar_failures(parser: Parser, line: str, exception_class, pos: int):
+    with pytest.raises(exception_class) as exc_info:
+        parser.validate(line)
+    assert exc_info.value.pos == pos
+    assert outcome(parser.validate, line) == outcome(parser.parse, line)
+
+
+@pytest.mark.parametrize("line", ("cmd 2>&3", "cmd 3>&- 4>&3", "a 3>f | b 4>&3"))
+def test_bad_file_descriptor(parser: Parser, line: str):
+    with pytest.raises(BadFileDescriptorException):
+        parser.validate(line)
+
+
+@pytest.mark.parametrize("line", (">file", "a; >file", "a | >file; b"))
+def test_command_without_words(parser: Parser, line: str):
+    with pytest.raises(CommandBuilderCreateException, match=make_match("No command words added.")):
+        parser.validate(line)
+
+
+def test_empty(parser: Parser):
+    with pytest.raises(EmptyInputException, match=make_match("Input statement was empty or contained only whitespace.")):
+        parser.validate(" \t ")
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_matches_parse_on_random_input(seed: int):
+    rng = random.Random(seed)
+    parser = Parser()
+    for _ in range(500):
+        line = "".join(rng.choice(ALPHABET) for _ in range(rng.randint(1, 20)))
+        assert outcome(parser.validate, line) == outcome(parser.parse, line), line
@@ -1,11 +1,31 @@
 import pytest
 
 from dataclasses import FrozenInstanceError
+import copy
+import pickle
+import weakref
 
 from shell_parser.ast import DefaultFile, File, Word
 from shell_parser.ast import StdinTarget, StdoutTarget, StderrTarget
 from shell_parser.ast import RedirectionInput, RedirectionOutput, RedirectionAppend
 from shell_parser.ast import OperatorAnd, OperatorOr, DescriptorRead, DescriptorWrite
+from shell_parser.ast import CommandDescriptorClosed, CommandBuilder
+from shell_parser.parser import Parser
+
+
+MARKER_CLASSES = (
+    StdinTarget,
+    StdoutTarget,
+    StderrTarget,
+    RedirectionInput,
+    RedirectionOutput,
+    RedirectionAppend,
+    OperatorAnd,
+    OperatorOr,
+    DescriptorRead,
+    DescriptorWrite,
+    CommandDescriptorClosed,
+)
 
 
 def test_word():
@@ -144,3 +164,29 @@ def test_descriptor_mode_write():
 
     with pytest.raises(FrozenInstanceError):
         test_mode.newattr = "newattr"
+
+
+@pytest.mark.parametrize("marker_class", MARKER_CLASSES)
+def test_marker_singleton(marker_class):
+    marker = marker_class()
+    assert marker_class() is marker
+    assert copy.copy(marker) is marker
+    assert copy.deepcopy(marker) is marker
+    assert pickle.loads(pickle.dumps(marker)) is marker
+    for other_class in MARKER_CLASSES:
+        if other_class is not marker_class:
+            assert other_class() != marker
+
+
+@pytest.mark.parametrize("obj", (
+    Word("word"),
+    File("file.txt"),
+    DefaultFile(target=StdinTarget()),
+    StdinTarget(),
+    CommandDescriptorClosed(),
+    Parser().parse("cat < in.txt"),
+    Parser().parse("cat < in.txt").descriptors,
+    CommandBuilder(),
+))
+def test_weak_references(obj):
+    assert weakref.ref(obj)() is obj